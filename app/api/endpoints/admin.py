@@ -1,5 +1,9 @@
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query
+from app.services import job_runner, resignal, setting_overrides
+from app.db.database import SessionLocal
+from app.services.cache import risk_cache
+from app.services import profiling
 from app.core.config import settings
 import app.schemas.schemas as schemas
 from dotenv import load_dotenv
@@ -18,32 +22,105 @@ logging.basicConfig(filename='risk_service.log', level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
-# Admin endpoint to update configuration settings
-@router.post("/admin/update-config")
-def update_config(new_config: schemas.ConfigUpdate, admin_token: str = Query(..., description="Admin token")):
-
+def verify_admin_token(admin_token: str):
     TOKEN = os.getenv("TOKEN")
     if admin_token != TOKEN:
         logger.warning(f"User Unauthorized : Wrong token! {admin_token}")
         raise HTTPException(status_code=403, detail="Unauthorized User: Wrong token!")
 
-    # Update configuration
-    if new_config.window_size is not None:
-        settings.WINDOW_SIZE = new_config.window_size
-    if new_config.win_ratio_threshold is not None:
-        settings.WIN_RATIO_THRESHOLD = new_config.win_ratio_threshold
-    if new_config.drawdown_threshold is not None:
-        settings.DRAWDOWN_THRESHOLD = new_config.drawdown_threshold
-    if new_config.stop_loss_threshold is not None:
-        settings.STOP_LOSS_THRESHOLD = new_config.stop_loss_threshold
-    if new_config.take_profit_threshold is not None:
-        settings.TAKE_PROFIT_THRESHOLD = new_config.take_profit_threshold
-    if new_config.risk_threshold is not None:
-        settings.RISK_THRESHOLD = new_config.risk_threshold
-    if new_config.initial_balance is not None:
-        settings.INITIAL_BALANCE = new_config.initial_balance
-    if new_config.hft_duration is not None:
-        settings.HFT_DURATION = new_config.hft_duration
-
-    logger.info(f"Configuration updated: {new_config.model_dump()}")
-    return {"message": f"Configuration updated {new_config}"}
+
+# Admin endpoint to update configuration settings
+@router.post("/admin/update-config")
+def update_config(
+    new_config: schemas.ConfigUpdate,
+    background_tasks: BackgroundTasks,
+    admin_token: str = Query(..., description="Admin token")
+):
+
+    verify_admin_token(admin_token)
+
+    # Update configuration, keeping track of what actually changed since another replica's last update
+    setting_overrides.reload()
+    changed = []
+    for field, value in new_config.model_dump(exclude_none=True).items():
+        name = field.upper()
+        if getattr(settings, name) != value:
+            setattr(settings, name, value)
+            changed.append(name)
+
+    # Stored before any run is planned, so replicas that claim its shards score with them
+    with SessionLocal() as db:
+        setting_overrides.save(db, {name: getattr(settings, name) for name in changed})
+        db.commit()
+
+    # Cached reports were computed with the old thresholds
+    risk_cache.clear()
+
+    # Window or metric settings need the trades re-scored; thresholds only the stored metrics
+    recompute = None
+    run_id = None
+    if any(name in resignal.RECOMPUTE_SETTINGS for name in changed):
+        recompute = "full"
+        if settings.RISK_JOB_MODE == "per_account":
+            background_tasks.add_task(job_runner.schedule_run, full_rebuild=True, force=True)
+        else:
+            # Planned here, so a run already in progress cannot swallow the rebuild
+            run_id, queued = job_runner.request_full_rebuild()
+            if queued:
+                recompute = "full_queued"
+            background_tasks.add_task(job_runner.work)
+    elif changed:
+        recompute = "resignal"
+        background_tasks.add_task(resignal.resignal)
+
+    logger.info(f"Configuration updated: {new_config.model_dump()} (changed: {changed}, recompute: {recompute}, run: {run_id})")
+    return {"message": f"Configuration updated {new_config}", "changed": changed, "recompute": recompute, "run_id": run_id}
+
+
+# Admin endpoint to trigger a risk recalculation outside the schedule
+@router.post("/admin/recalculate")
+def recalculate(
+    background_tasks: BackgroundTasks,
+    full_rebuild: bool = Query(False, description="Recompute every account, not only those with new trades"),
+    profile: bool = Query(False, description="Profile this run (see /admin/profiles)"),
+    admin_token: str = Query(..., description="Admin token")
+):
+
+    verify_admin_token(admin_token)
+
+    # Planned like a scheduled run (skipped while one is in progress), whichever replica holds the lease
+    background_tasks.add_task(job_runner.schedule_run, full_rebuild=full_rebuild, profile=profile, force=True)
+    logger.info(f"Risk recalculation requested (full_rebuild={full_rebuild}, profile={profile})")
+    return {"message": "Risk recalculation started", "full_rebuild": full_rebuild, "profile": profile}
+
+
+# Admin endpoint to profile the next scheduled risk run
+@router.post("/admin/profiles/next-run")
+def profile_next_run(admin_token: str = Query(..., description="Admin token")):
+
+    verify_admin_token(admin_token)
+
+    profiling.arm_next_run()
+    logger.info("Next scheduled risk run will be profiled")
+    return {"message": "Next scheduled risk run will be profiled"}
+
+
+# Admin endpoint to list captured profiles, newest first
+@router.get("/admin/profiles")
+def list_profiles(admin_token: str = Query(..., description="Admin token")):
+
+    verify_admin_token(admin_token)
+
+    return profiling.list_profiles()
+
+
+# Admin endpoint to fetch one profile: call stats and SQL timings
+@router.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, admin_token: str = Query(..., description="Admin token")):
+
+    verify_admin_token(admin_token)
+
+    captured = profiling.load_profile(profile_id)
+    if captured is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return captured
@@ -1,5 +1,11 @@
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from app.db.database import get_async_db
+from app.services.cache import risk_cache
+from app.services.telemetry import last_run
+import app.schemas.schemas as schemas
 import logging
 
 router = APIRouter()
@@ -12,13 +18,26 @@ logger = logging.getLogger(__name__)
 
 
 # Health check endpoint to verify service status and scheduled jobs
-@router.get("/health")
-def health_check(request: Request):
+@router.get("/health", response_model=schemas.HealthCheck)
+async def health_check(request: Request, db: AsyncSession = Depends(get_async_db)):
     scheduler = getattr(request.app.state, "scheduler", None)
     jobs = scheduler.get_jobs() if scheduler else []
+
+    try:
+        await db.execute(text("SELECT 1"))
+        db_status = "ok"
+    except Exception as e:
+        logger.error(f"Database check failed: {e}")
+        db_status = "unavailable"
+
     response = {
         "status": "ok",
-        "scheduled_jobs": [job.id for job in jobs]
+        "db_status": db_status,
+        "last_calculation": last_run["finished_at"],
+        "last_calculation_seconds": last_run["duration"],
+        "accounts_processed": last_run["accounts_processed"],
+        "scheduled_jobs": [job.id for job in jobs],
+        "cache": risk_cache.stats()
     }
     logger.info(f"GET /health/  - {response}")
     return response
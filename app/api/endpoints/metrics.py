@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Response
+from app.services import telemetry
+import logging
+
+router = APIRouter()
+
+
+# Setup logging
+logging.basicConfig(filename='risk_service.log', level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+# Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    body, content_type = telemetry.render()
+    return Response(content=body, media_type=content_type)
@@ -1,12 +1,21 @@
-from fastapi import APIRouter, HTTPException, Path
+from fastapi import APIRouter, HTTPException, Path, Query
 from app.models import Account, Trade, RiskMetric
 from fastapi import FastAPI, Depends
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
 import app.models as models
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.core.config import settings
 import app.schemas.schemas as schemas
 import app.risk_utils.calculations as calculations
+import app.risk_utils.horizons as horizons
+from app.risk_utils.columnar import TradeBatch, batch_columns, newest_first
+from app.services.cache import risk_cache, account_key, user_key, challenge_key
+from app.services.history import RESOLUTIONS, bucket_snapshots
+from app.services import report_export
+from datetime import datetime
+from typing import Optional, Union
 import logging
 
 router = APIRouter()
@@ -18,44 +27,201 @@ logging.basicConfig(filename='risk_service.log', level=logging.INFO,
 logger = logging.getLogger(__name__)
 
 
+def metric_response(entity_id: int, risk_metric):
+    return {
+        "trading_account_login": entity_id,
+        "risk_signals": risk_metric.risk_signals.split(",") if risk_metric.risk_signals else [],
+        "risk_score": risk_metric.risk_score,
+        "last_trade_at": risk_metric.last_trade_at
+    }
+
+
+async def get_horizon_report(account_login: int, horizon: str, db: AsyncSession):
+    configured = horizons.configured_horizons()
+    try:
+        minutes = horizons.parse_horizon(horizon)
+    except ValueError:
+        minutes = None
+    if minutes not in configured:
+        labels = ", ".join(horizons.horizon_label(m) for m in configured)
+        raise HTTPException(status_code=422, detail=f"horizon must be one of: {labels or 'none configured'}")
+
+    label = horizons.horizon_label(minutes)
+    cached = risk_cache.get(account_key(account_login, label))
+    if cached is not None:
+        return cached
+
+    horizon_metric = (await db.execute(
+        select(models.RiskMetricHorizon)
+        .where(models.RiskMetricHorizon.account_login == account_login, models.RiskMetricHorizon.horizon_minutes == minutes)
+    )).scalars().first()
+
+    if not horizon_metric:
+        logger.warning(f"Account not found: {account_login} (horizon {label})")
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    response = {
+        **metric_response(account_login, horizon_metric),
+        "horizon": label,
+        "trade_count": horizon_metric.trade_count,
+        "truncated": bool(horizon_metric.truncated),
+    }
+
+    risk_cache.set(account_key(account_login, label), response)
+    logger.info(f"GET /risk-report/{account_login}?horizon={label} - {response}")
+    return response
+
+
 # Endpoint to get risk report for a specific trading account
-@router.get("/risk-report/{account_login}", response_model=schemas.RiskReport)
-def get_risk_report(account_login: int, db: Session = Depends(get_db)):
+@router.get("/risk-report/{account_login}", response_model=Union[schemas.HorizonRiskReport, schemas.RiskReport])
+async def get_risk_report(
+    account_login: int,
+    horizon: Optional[str] = Query(None, description="Time horizon such as 1h, 24h or 7d; the last WINDOW_SIZE trades by default"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    if horizon is not None:
+        return await get_horizon_report(account_login, horizon, db)
+
+    cached = risk_cache.get(account_key(account_login))
+    if cached is not None:
+        return cached
+
     # Get latest risk metric for account
-    risk_metric = (db.query(models.RiskMetric)
-                 .filter(models.RiskMetric.account_login == account_login)
-                 .order_by(models.RiskMetric.timestamp.desc())
-                 .first())
+    risk_metric = (await db.execute(
+        select(models.RiskMetric)
+        .where(models.RiskMetric.account_login == account_login)
+        .order_by(models.RiskMetric.timestamp.desc())
+        .limit(1)
+    )).scalars().first()
 
     if not risk_metric:
         logger.warning(f"Account not found: {account_login}")
         raise HTTPException(status_code=404, detail="Account not found")
 
-    response = {
-        "trading_account_login": account_login,
-        "risk_signals": risk_metric.risk_signals.split(",") if risk_metric.risk_signals else [],
-        "risk_score": risk_metric.risk_score,
-        "last_trade_at": risk_metric.last_trade_at
-    }
+    response = metric_response(account_login, risk_metric)
 
+    risk_cache.set(account_key(account_login), response)
     logger.info(f"GET /risk-report/{account_login} - {response}")
     return response
 
 
+# Endpoint to get the risk reports of many trading accounts at once
+@router.post("/risk-report/batch", response_model=schemas.RiskReportBatch)
+async def get_risk_reports(request: schemas.RiskReportBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    account_logins = list(dict.fromkeys(request.account_logins))
+    if len(account_logins) > settings.RISK_REPORT_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"At most {settings.RISK_REPORT_BATCH_MAX} account logins per request")
+
+    # One IN (…) query per RISK_REPORT_BATCH_CHUNK logins, only the columns of the report
+    found = {}
+    chunk_size = settings.RISK_REPORT_BATCH_CHUNK
+    for start in range(0, len(account_logins), chunk_size):
+        rows = (await db.execute(
+            select(
+                models.RiskMetric.account_login,
+                models.RiskMetric.risk_signals,
+                models.RiskMetric.risk_score,
+                models.RiskMetric.last_trade_at
+            )
+            .where(models.RiskMetric.account_login.in_(account_logins[start:start + chunk_size]))
+        )).all()
+        found.update((row.account_login, metric_response(row.account_login, row)) for row in rows)
+
+    reports = [found[login] for login in account_logins if login in found]
+    not_found = [login for login in account_logins if login not in found]
+
+    logger.info(f"POST /risk-report/batch - {len(reports)} reports, {len(not_found)} not found")
+    return {"reports": reports, "not_found": not_found}
+
+
+# Endpoint to stream every account's risk metric as NDJSON or CSV
+@router.get("/risk-reports/export")
+async def export_risk_reports(
+    export_format: str = Query("ndjson", alias="format", description="ndjson or csv")
+):
+    if export_format not in report_export.FORMATS:
+        raise HTTPException(status_code=422, detail=f"format must be one of {', '.join(report_export.FORMATS)}")
+
+    # Pages open their own sessions: the request's session is closed before the body is streamed
+    logger.info(f"GET /risk-reports/export - {export_format}")
+    return StreamingResponse(
+        report_export.export(export_format, settings.RISK_EXPORT_PAGE_SIZE),
+        media_type=report_export.FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="risk_reports.{export_format}"'}
+    )
+
+
+# Endpoint to get the risk history of a trading account
+@router.get("/risk-report/{account_login}/history", response_model=schemas.RiskHistory)
+async def get_risk_history(
+    account_login: int,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    resolution: str = "raw",
+    db: AsyncSession = Depends(get_async_db)
+):
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=422, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+
+    # Range read on (account_login, timestamp)
+    query = select(models.RiskMetricHistory).where(models.RiskMetricHistory.account_login == account_login)
+    if from_ is not None:
+        query = query.where(models.RiskMetricHistory.timestamp >= from_)
+    if to is not None:
+        query = query.where(models.RiskMetricHistory.timestamp <= to)
+    snapshots = (await db.execute(query.order_by(models.RiskMetricHistory.timestamp))).scalars().all()
+
+    if not snapshots and await db.get(models.Account, account_login) is None:
+        logger.warning(f"Account not found: {account_login}")
+        raise HTTPException(status_code=404, detail="Account not found")
+
+    points = [
+        {
+            "timestamp": snapshot.timestamp,
+            "resolution": snapshot.resolution,
+            "risk_score": snapshot.risk_score,
+            "risk_signals": snapshot.risk_signals.split(",") if snapshot.risk_signals else [],
+            "win_ratio": snapshot.win_ratio,
+            "profit_factor": snapshot.profit_factor,
+            "max_drawdown": snapshot.max_drawdown,
+            "hft_count": snapshot.hft_count,
+            "max_layering": snapshot.max_layering,
+            "last_trade_at": snapshot.last_trade_at,
+        }
+        for snapshot in bucket_snapshots(snapshots, resolution)
+    ]
+
+    logger.info(f"GET /risk-report/{account_login}/history - {len(points)} points ({resolution})")
+    return {"trading_account_login": account_login, "resolution": resolution, "points": points}
+
+
 # Endpoint to get risk report for a user
 @router.get("/risk/user/{user_id}", response_model=schemas.RiskReport)
-def get_user_risk_report(user_id: int = Path(...), db: Session = Depends(get_db)):
-    accounts = db.query(models.Account).filter_by(user_id=user_id).all()
-    if not accounts:
+async def get_user_risk_report(user_id: int = Path(...), db: AsyncSession = Depends(get_async_db)):
+    cached = risk_cache.get(user_key(user_id))
+    if cached is not None:
+        return cached
+
+    # Precomputed by the scheduled job
+    user_metric = await db.get(models.UserRiskMetric, user_id)
+    if user_metric:
+        response = metric_response(user_id, user_metric)
+        risk_cache.set(user_key(user_id), response)
+        logger.info(f"GET /risk/user/{user_id} - {response}")
+        return response
+
+    # Not scored yet: compute from raw trades
+    account_logins = (await db.execute(select(models.Account.login).filter_by(user_id=user_id))).scalars().all()
+    if not account_logins:
         logger.warning(f"User ID not found {user_id}.")
         raise HTTPException(status_code=404, detail="User not found")
 
-    account_logins = [a.login for a in accounts]
-    trades = (db.query(models.Trade)
-                .filter(models.Trade.trading_account_login.in_(account_logins))
-                .order_by(models.Trade.closed_at.desc())
-                .limit(settings.WINDOW_SIZE)
-                .all())
+    trades = TradeBatch.from_rows((await db.execute(
+        select(*batch_columns(models.Trade))
+        .where(models.Trade.trading_account_login.in_(account_logins))
+        .order_by(*newest_first(models.Trade))
+        .limit(settings.WINDOW_SIZE)
+    )).all())
 
     if not trades:
         logger.warning(f"No trades found for User ID {user_id}. Accounts: {account_logins}")
@@ -72,24 +238,38 @@ def get_user_risk_report(user_id: int = Path(...), db: Session = Depends(get_db)
         "last_trade_at": metrics['last_trade_at']
     }
 
+    risk_cache.set(user_key(user_id), response)
     logger.info(f"GET /risk/user/{user_id} - {response}")
     return response
 
 
 # Endpoint to get risk report for a specific challenge
 @router.get("/risk/challenge/{challenge_id}", response_model=schemas.RiskReport)
-def get_challenge_risk_report(challenge_id: int = Path(...), db: Session = Depends(get_db)):
-    accounts = db.query(models.Account).filter_by(challenge_id=challenge_id).all()
-    if not accounts:
+async def get_challenge_risk_report(challenge_id: int = Path(...), db: AsyncSession = Depends(get_async_db)):
+    cached = risk_cache.get(challenge_key(challenge_id))
+    if cached is not None:
+        return cached
+
+    # Precomputed by the scheduled job
+    challenge_metric = await db.get(models.ChallengeRiskMetric, challenge_id)
+    if challenge_metric:
+        response = metric_response(challenge_id, challenge_metric)
+        risk_cache.set(challenge_key(challenge_id), response)
+        logger.info(f"GET /risk/challenge/{challenge_id} - {response}")
+        return response
+
+    # Not scored yet: compute from raw trades
+    account_logins = (await db.execute(select(models.Account.login).filter_by(challenge_id=challenge_id))).scalars().all()
+    if not account_logins:
         logger.warning(f"Challenge ID not found {challenge_id}.")
         raise HTTPException(status_code=404, detail="Challenge not found")
 
-    account_logins = [a.login for a in accounts]
-    trades = (db.query(models.Trade)
-                .filter(models.Trade.trading_account_login.in_(account_logins))
-                .order_by(models.Trade.closed_at.desc())
-                .limit(settings.WINDOW_SIZE)
-                .all())
+    trades = TradeBatch.from_rows((await db.execute(
+        select(*batch_columns(models.Trade))
+        .where(models.Trade.trading_account_login.in_(account_logins))
+        .order_by(*newest_first(models.Trade))
+        .limit(settings.WINDOW_SIZE)
+    )).all())
 
     if not trades:
         logger.warning(f"No trades found for Challenge ID {challenge_id}. Accounts: {account_logins}")
@@ -106,5 +286,6 @@ def get_challenge_risk_report(challenge_id: int = Path(...), db: Session = Depen
         "last_trade_at": metrics['last_trade_at']
     }
 
+    risk_cache.set(challenge_key(challenge_id), response)
     logger.info(f"GET /risk/challenge/{challenge_id} - {response}")
     return response
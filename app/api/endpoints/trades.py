@@ -0,0 +1,36 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import List
+import app.schemas.schemas as schemas
+import logging
+
+router = APIRouter()
+
+
+# Setup logging
+logging.basicConfig(filename='risk_service.log', level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def enqueue_trades(request: Request, trades: List[schemas.TradeCreate]):
+    trade_queue = request.app.state.trade_queue
+    if not trade_queue.offer(trades):
+        logger.warning(f"Trade queue full, rejected {len(trades)} trades")
+        raise HTTPException(status_code=503, detail="Trade queue is full, retry later")
+    return {"message": "Trades queued for risk scoring", "queued": len(trades)}
+
+
+# Endpoint to submit a closed trade for real-time scoring
+@router.post("/trades", status_code=202)
+async def create_trade(trade: schemas.TradeCreate, request: Request):
+    response = enqueue_trades(request, [trade])
+    logger.info(f"POST /trades - {trade.identifier} queued")
+    return response
+
+
+# Endpoint to submit several closed trades at once
+@router.post("/trades/batch", status_code=202)
+async def create_trades(trades: List[schemas.TradeCreate], request: Request):
+    response = enqueue_trades(request, trades)
+    logger.info(f"POST /trades/batch - {len(trades)} trades queued")
+    return response
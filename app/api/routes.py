@@ -1,5 +1,5 @@
 from fastapi import FastAPI
-from app.api.endpoints import root, risk, admin, health
+from app.api.endpoints import root, risk, admin, health, trades, metrics
 
 
 def include_routers(app: FastAPI):
@@ -7,3 +7,5 @@ def include_routers(app: FastAPI):
     app.include_router(risk.router)
     app.include_router(admin.router)
     app.include_router(health.router)
+    app.include_router(trades.router)
+    app.include_router(metrics.router)
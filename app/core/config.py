@@ -7,12 +7,94 @@ load_dotenv()
 class Settings:
     # Risk calculation parameters
     RISK_THRESHOLD = 80
-    RISK_WINDOW_MINUTES = 60  # 1 hour
+    RISK_WINDOW_MINUTES = int(os.getenv("RISK_WINDOW_MINUTES", 60))  # Shortest time horizon (1 hour), 0 = none
     WINDOW_SIZE = 100  # Last N trades for rolling window
     INITIAL_BALANCE = 100000
     HFT_DURATION = 60  # Seconds
     WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 
+    # Webhook delivery
+    WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", 5))  # Seconds per request
+    WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", 8))  # Parallel requests / pooled connections
+    WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 10000))  # Pending webhooks before spilling to outbox
+    WEBHOOK_MAX_RETRIES = int(os.getenv("WEBHOOK_MAX_RETRIES", 3))
+    WEBHOOK_BACKOFF_SECONDS = float(os.getenv("WEBHOOK_BACKOFF_SECONDS", 1))  # Doubles on every retry
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", 1))  # > 1 posts a JSON array of notifications
+    WEBHOOK_OUTBOX_RETRY_SECONDS = int(os.getenv("WEBHOOK_OUTBOX_RETRY_SECONDS", 60))
+    WEBHOOK_OUTBOX_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_OUTBOX_MAX_ATTEMPTS", 20))
+    WEBHOOK_CLAIM_SECONDS = int(os.getenv("WEBHOOK_CLAIM_SECONDS", 300))  # Outbox rows a process is delivering stay claimed this long
+
+    # Alerting: edge-triggered, with hysteresis and a per-account cooldown
+    ALERT_DEDUP_ENABLED = os.getenv("ALERT_DEDUP_ENABLED", "true").lower() == "true"
+    ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", 5))  # Score points below RISK_THRESHOLD to re-arm
+    ALERT_COOLDOWN_MINUTES = int(os.getenv("ALERT_COOLDOWN_MINUTES", 60))
+
+    # Profiling (opt-in per request with the admin token, or per job run)
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(os.getenv("LOG_DIR", "logs"), "profiles"))
+    PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", 50))  # Ring size, oldest profiles are deleted
+    PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", 100))  # Functions kept per profile, by cumulative time
+    PROFILE_JOB_RUNS = os.getenv("PROFILE_JOB_RUNS", "false").lower() == "true"  # Profile every scheduled run
+
+    # Risk metric history
+    RISK_HISTORY_ENABLED = os.getenv("RISK_HISTORY_ENABLED", "true").lower() == "true"
+    RISK_HISTORY_RAW_HOURS = int(os.getenv("RISK_HISTORY_RAW_HOURS", 48))  # Keep every snapshot this long, then hourly
+    RISK_HISTORY_HOURLY_DAYS = int(os.getenv("RISK_HISTORY_HOURLY_DAYS", 30))  # Then one snapshot per day
+    RISK_HISTORY_RETENTION_DAYS = int(os.getenv("RISK_HISTORY_RETENTION_DAYS", 365))  # Then deleted
+    RISK_HISTORY_COMPACTION_HOURS = int(os.getenv("RISK_HISTORY_COMPACTION_HOURS", 24))  # Compaction job interval
+
+    # Database connection pool
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Seconds
+
+    # SQLite connection pragmas
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")  # Safe with WAL, far fewer fsyncs than FULL
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 268435456))  # Bytes (256 MB)
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", -65536))  # Negative = KiB (64 MB)
+    SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+    # Time horizons scored next to the WINDOW_SIZE trade window, ending at each account's newest trade
+    RISK_HORIZONS = os.getenv("RISK_HORIZONS", "24h,7d")  # Horizons besides RISK_WINDOW_MINUTES (m/h/d suffix)
+    RISK_HORIZON_MAX_TRADES = int(os.getenv("RISK_HORIZON_MAX_TRADES", 1000))  # Newest trades a horizon can span
+
+    # Risk job execution
+    RISK_JOB_MODE = os.getenv("RISK_JOB_MODE", "batch")  # "batch" or "per_account"
+    RISK_JOB_WORKERS = int(os.getenv("RISK_JOB_WORKERS", 0))  # Scoring processes, 0/1 = in-process
+    RISK_JOB_SHARD_SIZE = int(os.getenv("RISK_JOB_SHARD_SIZE", 1000))  # Accounts per shard
+    RISK_JOB_INCREMENTAL = os.getenv("RISK_JOB_INCREMENTAL", "true").lower() == "true"  # Only accounts with new trades
+    RISK_WRITE_BATCH_SIZE = int(os.getenv("RISK_WRITE_BATCH_SIZE", 500))  # Rows per upsert statement
+
+    # Risk job scheduling across replicas
+    RISK_JOB_INTERVAL_MINUTES = int(os.getenv("RISK_JOB_INTERVAL_MINUTES", 600))
+    RISK_JOB_CRON = os.getenv("RISK_JOB_CRON", "")  # Crontab expression, overrides the interval when set
+    RISK_JOB_LEASE_SECONDS = int(os.getenv("RISK_JOB_LEASE_SECONDS", 300))  # Scheduler lease and shard claim lifetime
+    RISK_JOB_POLL_SECONDS = int(os.getenv("RISK_JOB_POLL_SECONDS", 30))  # How often replicas look for shards to claim
+    RISK_JOB_CLAIM_SIZE = int(os.getenv("RISK_JOB_CLAIM_SIZE", 5000))  # Accounts per claimable shard of a run
+    RISK_JOB_MAX_ATTEMPTS = int(os.getenv("RISK_JOB_MAX_ATTEMPTS", 3))  # Claims of a shard before it is marked failed
+
+    # Columnar trade store (memory-mapped Arrow files, needs pyarrow) for batch scoring
+    TRADE_STORE_ENABLED = os.getenv("TRADE_STORE_ENABLED", "false").lower() == "true"
+    TRADE_STORE_DIR = os.getenv("TRADE_STORE_DIR", "trade_store")  # Local to the host, shared by its workers
+    TRADE_STORE_MAX_DELTAS = int(os.getenv("TRADE_STORE_MAX_DELTAS", 64))  # Ingested parts before they are merged
+
+    # Live trade ingestion
+    INGEST_STATE_MAX_ACCOUNTS = int(os.getenv("INGEST_STATE_MAX_ACCOUNTS", 10000))  # Rolling windows kept in memory
+    INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 500))  # Max trades per micro-batch
+    INGEST_MAX_LATENCY_MS = int(os.getenv("INGEST_MAX_LATENCY_MS", 20))  # Max wait to fill a micro-batch
+    INGEST_QUEUE_MAX_SIZE = int(os.getenv("INGEST_QUEUE_MAX_SIZE", 100000))  # Queued trades before 503
+    INGEST_AGGREGATE_REFRESH_SECONDS = int(os.getenv("INGEST_AGGREGATE_REFRESH_SECONDS", 60))  # Users/challenges of ingested accounts, 0 = only in risk runs
+
+    # Bulk risk report reads
+    RISK_REPORT_BATCH_MAX = int(os.getenv("RISK_REPORT_BATCH_MAX", 50000))  # Logins per POST /risk-report/batch
+    RISK_REPORT_BATCH_CHUNK = int(os.getenv("RISK_REPORT_BATCH_CHUNK", 1000))  # Logins per IN (…) query
+    RISK_EXPORT_PAGE_SIZE = int(os.getenv("RISK_EXPORT_PAGE_SIZE", 5000))  # Rows per keyset page of /risk-reports/export
+
+    # Risk report cache
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # "memory" or "redis"
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 60))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+
     # Signal thresholds
     WIN_RATIO_THRESHOLD = 0.3
     DRAWDOWN_THRESHOLD = 0.5
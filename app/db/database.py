@@ -1,20 +1,85 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy import create_engine, event
+from app.core.config import settings
 from dotenv import load_dotenv
 import os
 
 
 load_dotenv()
 
-# SQLite database configuration
+# SQLite or Postgres database configuration
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
 
+# Async drivers for the FastAPI endpoints
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def pool_options(url, asynchronous=False):
+    """
+    Pool sizing from Settings; in-memory SQLite uses a single static connection instead.
+    """
+    is_sqlite = url.get_backend_name() == "sqlite"
+    if is_sqlite and url.database in (None, "", ":memory:"):
+        return {}
+    options = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if is_sqlite and asynchronous:
+        # aiosqlite defaults to NullPool, which opens a connection per request
+        options["poolclass"] = AsyncAdaptedQueuePool
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """
+    Per-connection SQLite tuning from Settings (journal_mode=WAL is persistent and set at startup).
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA temp_store={settings.SQLITE_TEMP_STORE}")
+    cursor.close()
+
+
+def connect_args(url):
+    # SQLite connections are shared by FastAPI worker threads and the scheduler
+    return {"check_same_thread": False} if url.get_backend_name() == "sqlite" else {}
+
+
+def async_database_url(url):
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+database_url = make_url(SQLALCHEMY_DATABASE_URL)
+
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False}
+    database_url,
+    connect_args=connect_args(database_url),
+    **pool_options(database_url)
+)
+
+async_engine = create_async_engine(
+    async_database_url(database_url),
+    **pool_options(database_url, asynchronous=True)
 )
 
+is_sqlite = database_url.get_backend_name() == "sqlite"
+
+if is_sqlite:
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+
 # Session factory for database sessions
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -22,6 +87,13 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+# Session factory for async endpoint sessions
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 Base = declarative_base()
 
 
@@ -34,3 +106,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    """
+    Dependency function to provide an async database session
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
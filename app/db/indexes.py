@@ -0,0 +1,162 @@
+from sqlalchemy import text, inspect
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Bump when INDEXES or the migration steps below change
+INDEX_VERSION = 8
+
+# Secondary indexes, created at startup and after bulk loads (DDL valid on SQLite and Postgres)
+INDEXES = {
+    # One latest metric per account; also backs ON CONFLICT(account_login)
+    "uq_risk_metrics_account": "CREATE UNIQUE INDEX IF NOT EXISTS uq_risk_metrics_account ON risk_metrics (account_login)",
+    # At most one unfinished risk run; planning a second one fails on insert
+    "uq_job_runs_active": "CREATE UNIQUE INDEX IF NOT EXISTS uq_job_runs_active ON job_runs ((status <> 'done')) WHERE status <> 'done'",
+    "idx_accounts_user": "CREATE INDEX IF NOT EXISTS idx_accounts_user ON accounts (user_id)",
+    "idx_accounts_challenge": "CREATE INDEX IF NOT EXISTS idx_accounts_challenge ON accounts (challenge_id)",
+    # Covers every column calculate_metrics and the stale account check read, so neither touches
+    # the table; identifier follows closed_at as the tie-break of newest_first()
+    "idx_trades_login_closed_id_covering": """
+        CREATE INDEX IF NOT EXISTS idx_trades_login_closed_id_covering
+        ON trades (trading_account_login, closed_at, identifier, profit, opened_at, price_sl, price_tp, updated_at)
+    """,
+}
+
+# Dialect-specific replacements for entries of INDEXES
+DIALECT_INDEXES = {
+    "postgresql": {
+        # Postgres keeps the payload columns out of the B-tree keys; newest_first() orders identifiers with COLLATE "C"
+        "idx_trades_login_closed_id_covering": """
+            CREATE INDEX IF NOT EXISTS idx_trades_login_closed_id_covering
+            ON trades (trading_account_login, closed_at, identifier COLLATE "C") INCLUDE (profit, opened_at, price_sl, price_tp, updated_at)
+        """,
+    },
+}
+
+# Superseded indexes, dropped by the migration steps
+OBSOLETE_INDEXES = ("idx_trades_login_closed", "idx_trades_login_closed_covering")
+
+# Queries on the request and job paths, checked with EXPLAIN
+HOT_QUERIES = {
+    "risk_report": "SELECT * FROM risk_metrics WHERE account_login = 1 ORDER BY timestamp DESC LIMIT 1",
+    "risk_report_horizon": "SELECT * FROM risk_metric_horizons WHERE account_login = 1 AND horizon_minutes = 60",
+    "risk_export_page": """
+        SELECT * FROM risk_metrics WHERE account_login IS NOT NULL AND account_login > 1
+        ORDER BY account_login LIMIT 5000
+    """,
+    "accounts_by_user": "SELECT login FROM accounts WHERE user_id = 1",
+    "accounts_by_challenge": "SELECT login FROM accounts WHERE challenge_id = 1",
+    "account_window": """
+        SELECT profit, opened_at, closed_at, price_sl, price_tp FROM trades
+        WHERE trading_account_login = 1 ORDER BY closed_at DESC, identifier DESC LIMIT 100
+    """,
+}
+
+
+def index_ddl(dialect_name):
+    return {**INDEXES, **DIALECT_INDEXES.get(dialect_name, {})}
+
+
+def _applied_version(conn):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_meta (key VARCHAR PRIMARY KEY, value VARCHAR)"))
+    value = conn.execute(text("SELECT value FROM schema_meta WHERE key = 'index_version'")).scalar()
+    return int(value) if value is not None else 0
+
+
+def _add_column(conn, table, column, ddl):
+    # Tables created since the column was added already have it
+    inspector = inspect(conn)
+    if inspector.has_table(table) and column not in {c["name"] for c in inspector.get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _migrate(conn, version):
+    if version < 2:
+        # Older runs could leave several rows per account; keep the newest before enforcing uniqueness
+        conn.execute(text("""
+            DELETE FROM risk_metrics
+            WHERE id NOT IN (SELECT MAX(id) FROM risk_metrics GROUP BY account_login)
+        """))
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if version < 3:
+        # Shard attempt counter
+        _add_column(conn, "job_shards", "attempts", "INTEGER DEFAULT 0")
+    if version < 4:
+        # Outbox claims, so replicas do not replay the same rows
+        _add_column(conn, "webhook_outbox", "claimed_by", "VARCHAR")
+        _add_column(conn, "webhook_outbox", "claimed_until", "TIMESTAMP")
+    if version < 5:
+        # Horizons cut short by RISK_HORIZON_MAX_TRADES
+        _add_column(conn, "risk_metric_horizons", "truncated", "BOOLEAN DEFAULT FALSE")
+    if version < 6:
+        # The covering index gained identifier as a tie-break key
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+    if version < 7:
+        # Full rebuilds queued behind a run in progress
+        _add_column(conn, "job_runs", "rebuild_requested", "BOOLEAN DEFAULT FALSE")
+    if version < 8:
+        # Trade change marker; existing rows keep NULL, their accounts are scored from them already.
+        # The covering index is recreated with it
+        _add_column(conn, "trades", "updated_at", "TIMESTAMP")
+        conn.execute(text("DROP INDEX IF EXISTS idx_trades_login_closed_id_covering"))
+
+
+def create_indexes(conn):
+    """
+    Brings the index set up to INDEX_VERSION. Index DDL is idempotent and always
+    re-applied (tables may have been recreated); migration steps run once.
+    """
+    version = _applied_version(conn)
+    if version < INDEX_VERSION:
+        logger.info(f"🔷 Migrating indexes from version {version} to {INDEX_VERSION}")
+        _migrate(conn, version)
+
+    for ddl in index_ddl(conn.dialect.name).values():
+        conn.execute(text(ddl))
+
+    if version != INDEX_VERSION:
+        conn.execute(text("DELETE FROM schema_meta WHERE key = 'index_version'"))
+        conn.execute(
+            text("INSERT INTO schema_meta (key, value) VALUES ('index_version', :version)"),
+            {"version": str(INDEX_VERSION)}
+        )
+
+
+def explain_hot_queries(conn):
+    """
+    Plan lines for every hot query: EXPLAIN QUERY PLAN details on SQLite, EXPLAIN output on Postgres.
+    """
+    if conn.dialect.name == "postgresql":
+        # Small tables always plan as sequential scans; this asks whether an index could serve the query
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        return {
+            name: [row[0].strip() for row in conn.execute(text(f"EXPLAIN {sql}"))]
+            for name, sql in HOT_QUERIES.items()
+        }
+    return {
+        name: [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+        for name, sql in HOT_QUERIES.items()
+    }
+
+
+def _is_full_scan(step):
+    return (step.startswith("SCAN") and "INDEX" not in step) or "Seq Scan" in step
+
+
+def full_scans(plans):
+    """
+    Hot queries whose plan scans a table without an index.
+    """
+    return {
+        name: steps for name, steps in plans.items()
+        if any(_is_full_scan(step) for step in steps)
+    }
+
+
+def verify_query_plans(conn):
+    plans = explain_hot_queries(conn)
+    for name, steps in full_scans(plans).items():
+        logger.warning(f"⚠️ Hot query '{name}' does a full table scan: {steps}")
+    return plans
@@ -0,0 +1,58 @@
+from sqlalchemy import select, insert, update
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session
+
+# Dialects with INSERT … ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {"sqlite": sqlite, "postgresql": postgresql}
+
+
+def upsert_statement(model, key, dialect_name):
+    """
+    INSERT that overwrites every column except `key` and the primary key when `key` already exists.
+    Returns None for dialects without ON CONFLICT support.
+    """
+    dialect = UPSERT_DIALECTS.get(dialect_name)
+    if dialect is None:
+        return None
+
+    table = model.__table__
+    stmt = dialect.insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={
+            col.name: stmt.excluded[col.name]
+            for col in table.columns
+            if col.name != key and not col.primary_key
+        }
+    )
+
+
+def _update_or_insert(db: Session, model, key, rows):
+    # Fallback: one lookup for the batch, then a bulk UPDATE by primary key and a bulk INSERT
+    key_column = getattr(model, key)
+    pk = model.__table__.primary_key.columns.keys()[0]
+    existing = dict(db.execute(select(key_column, getattr(model, pk)).where(key_column.in_([row[key] for row in rows]))).all())
+
+    updates = [{**row, pk: existing[row[key]]} for row in rows if row[key] in existing]
+    inserts = [row for row in rows if row[key] not in existing]
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
+
+
+def bulk_upsert(db: Session, model, key, rows, batch_size=500):
+    """
+    Inserts or overwrites `rows` (dicts with the same keys) on the unique column `key`,
+    one statement per `batch_size` rows. Runs in the caller's transaction.
+    """
+    if not rows:
+        return
+    stmt = upsert_statement(model, key, db.get_bind().dialect.name)
+
+    for start in range(0, len(rows), batch_size):
+        chunk = rows[start:start + batch_size]
+        if stmt is None:
+            _update_or_insert(db, model, key, chunk)
+        else:
+            db.execute(stmt, chunk)
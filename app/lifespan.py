@@ -1,6 +1,10 @@
 from contextlib import asynccontextmanager
 from app.db.database import engine
+from app.db.indexes import create_indexes, verify_query_plans
 from app.scheduler import start_scheduler
+from app.services import job_runner, metrics
+from app.services.trade_queue import TradeQueue
+from app.services.webhook import dispatcher
 from sqlalchemy import text
 from app.models import Base
 import logging
@@ -12,20 +16,27 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app):
     # 🟢 Startup: DB setup
-    logger.info("🔷 Creating tables & index …")
+    logger.info("🔷 Creating tables & indexes …")
     Base.metadata.create_all(bind=engine)
 
     with engine.begin() as conn:
-        conn.execute(text("PRAGMA journal_mode=WAL;"))
-        conn.execute(text("""
-            CREATE INDEX IF NOT EXISTS idx_trades_login_closed
-            ON trades (trading_account_login, closed_at)
-        """))
+        if conn.dialect.name == "sqlite":
+            conn.execute(text("PRAGMA journal_mode=WAL;"))
+        create_indexes(conn)
+        verify_query_plans(conn)
+
+    # 📮 Start webhook dispatcher
+    dispatcher.start()
 
     # 🚀 Start APScheduler
     scheduler = start_scheduler()
     app.state.scheduler = scheduler
 
+    # 📥 Start trade ingestion queue
+    trade_queue = TradeQueue()
+    trade_queue.start()
+    app.state.trade_queue = trade_queue
+
     logger.info("✅ Application is ready to serve")
     logger.info(" → Service running on  http://127.0.0.1:8000/")
     logger.info(" → Swagger Docs on  http://127.0.0.1:8000/docs")
@@ -34,6 +45,13 @@ async def lifespan(app):
 
     # 🛑 Shutdown
     logger.info("🛑 Application shutting down …")
+    if hasattr(app.state, "trade_queue"):
+        await app.state.trade_queue.stop()
+        logger.info("✅ Trade queue drained.")
     if hasattr(app.state, "scheduler"):
         app.state.scheduler.shutdown()
+        # Hand the scheduler lease over without waiting for it to expire
+        job_runner.release_lease()
         logger.info("✅ Scheduler stopped cleanly.")
+    metrics.shutdown_pool()
+    dispatcher.stop()
@@ -2,6 +2,8 @@ from fastapi import FastAPI
 from app.core.logging_config import setup_logging
 from app.api.routes import include_routers
 from app.lifespan import lifespan
+from app.services.telemetry import TimingMiddleware
+from app.services.profiling import ProfilingMiddleware
 
 logger = setup_logging()
 
@@ -19,4 +21,7 @@ app = FastAPI(
     }
 )
 
+app.add_middleware(TimingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+
 include_routers(app)
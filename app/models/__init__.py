@@ -4,4 +4,14 @@ This module initializes the models for the application.
 from .account import Account
 from .trades import Trade
 from .risk_metric import RiskMetric
+from .risk_metric_history import RiskMetricHistory
+from .risk_metric_horizon import RiskMetricHorizon
+from .user_risk_metric import UserRiskMetric
+from .challenge_risk_metric import ChallengeRiskMetric
+from .webhook_outbox import WebhookOutbox
+from .alert_state import AlertState
+from .job_lease import JobLease
+from .job_run import JobRun
+from .job_shard import JobShard
+from .setting_override import SettingOverride
 from app.db.database import Base
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean
+from app.db.database import Base
+
+class AlertState(Base):
+    __tablename__ = 'alert_states'
+
+    account_login = Column(Integer, primary_key=True)
+    alerting = Column(Boolean, default=False)
+    risk_score = Column(Float)
+    risk_signals = Column(String)  # Signals of the last alert sent
+    last_sent_at = Column(DateTime)
+    updated_at = Column(DateTime)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, DateTime
+from app.db.database import Base
+
+class JobLease(Base):
+    __tablename__ = 'job_leases'
+
+    name = Column(String, primary_key=True)  # e.g. risk_metrics_job
+    holder = Column(String, nullable=False)  # host:pid of the replica holding the lease
+    expires_at = Column(DateTime, nullable=False)
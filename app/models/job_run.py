@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index, text
+from app.db.database import Base
+
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+    # At most one unfinished run: concurrent planners cannot both insert one
+    __table_args__ = (
+        Index(
+            'uq_job_runs_active', text("(status <> 'done')"), unique=True,
+            sqlite_where=text("status <> 'done'"), postgresql_where=text("status <> 'done'")
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    status = Column(String, nullable=False, index=True)  # running, finalizing, done
+    full_rebuild = Column(Boolean, default=False)
+    rebuild_requested = Column(Boolean, default=False)  # Settings changed during the run: a full run follows it
+    shard_count = Column(Integer)
+    accounts_processed = Column(Integer, default=0)
+    created_by = Column(String)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from app.db.database import Base
+
+class JobShard(Base):
+    __tablename__ = 'job_shards'
+    __table_args__ = (Index('idx_job_shards_run_status', 'run_id', 'status'),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    run_id = Column(Integer, ForeignKey('job_runs.id'), nullable=False)
+    shard_no = Column(Integer, nullable=False)
+    login_from = Column(Integer, nullable=False)  # Inclusive account login range
+    login_to = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default='pending')  # pending, claimed, done, failed
+    claimed_by = Column(String)
+    claim_expires_at = Column(DateTime)  # Renewed while the shard is being scored
+    attempts = Column(Integer, default=0)  # Claims so far, up to RISK_JOB_MAX_ATTEMPTS
+    accounts_processed = Column(Integer)
+    finished_at = Column(DateTime)
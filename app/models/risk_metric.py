@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Index
 from app.db.database import Base
 
 class RiskMetric(Base):
     __tablename__ = 'risk_metrics'
+    # One row per account; the conflict target of the bulk upsert
+    __table_args__ = (Index('uq_risk_metrics_account', 'account_login', unique=True),)
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     account_login = Column(Integer, ForeignKey('accounts.login'))
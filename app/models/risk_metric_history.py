@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, Date, Index
+from app.db.database import Base
+
+class RiskMetricHistory(Base):
+    __tablename__ = 'risk_metric_history'
+    __table_args__ = (
+        # Time index for the history endpoint
+        Index('idx_risk_history_account_time', 'account_login', 'timestamp'),
+        # Day buckets for retention and compaction
+        Index('idx_risk_history_day', 'day', 'resolution'),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_login = Column(Integer, nullable=False)
+    day = Column(Date, nullable=False)  # Bucket of `timestamp`
+    hour = Column(Integer, nullable=False)  # 0-23, for hourly downsampling
+    resolution = Column(String, nullable=False, default='raw')  # raw, hourly or daily
+    timestamp = Column(DateTime, nullable=False)
+    win_ratio = Column(Float)
+    profit_factor = Column(Float)
+    max_drawdown = Column(Float)
+    stop_loss_used = Column(Float)
+    take_profit_used = Column(Float)
+    hft_count = Column(Integer)
+    max_layering = Column(Integer)
+    risk_score = Column(Float)
+    risk_signals = Column(String)
+    last_trade_at = Column(DateTime)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, ForeignKey, Index
+from app.db.database import Base
+
+class RiskMetricHorizon(Base):
+    __tablename__ = 'risk_metric_horizons'
+    # One row per account and time horizon
+    __table_args__ = (Index('uq_risk_metric_horizons_account', 'account_login', 'horizon_minutes', unique=True),)
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    account_login = Column(Integer, ForeignKey('accounts.login'), nullable=False)
+    horizon_minutes = Column(Integer, nullable=False)
+    trade_count = Column(Integer)  # Trades scored, at most RISK_HORIZON_MAX_TRADES
+    truncated = Column(Boolean, default=False)  # The horizon held more trades; only the newest were scored
+    timestamp = Column(DateTime)
+    win_ratio = Column(Float)
+    profit_factor = Column(Float)
+    max_drawdown = Column(Float)
+    stop_loss_used = Column(Float)
+    take_profit_used = Column(Float)
+    hft_count = Column(Integer)
+    max_layering = Column(Integer)
+    risk_score = Column(Float)
+    risk_signals = Column(String)
+    last_trade_at = Column(DateTime)
@@ -0,0 +1,9 @@
+from sqlalchemy import Column, String, DateTime
+from app.db.database import Base
+
+class SettingOverride(Base):
+    __tablename__ = 'setting_overrides'
+
+    name = Column(String, primary_key=True)  # Settings attribute, e.g. WINDOW_SIZE
+    value = Column(String, nullable=False)  # JSON
+    updated_at = Column(DateTime)
@@ -1,5 +1,6 @@
 from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
 from app.db.database import Base
+from datetime import datetime
 
 class Trade(Base):
     __tablename__ = 'trades'
@@ -23,3 +24,6 @@ class Trade(Base):
     profit_rate = Column(Float)
     platform = Column(Integer)
     trading_account_login = Column(Integer, ForeignKey('accounts.login'))
+    # Set when the row is inserted or overwritten (ingestion, load_data.py); scoring compares it
+    # with RiskMetric.timestamp, so backfilled or corrected trades get their account rescored
+    updated_at = Column(DateTime, default=datetime.now, onupdate=datetime.now)
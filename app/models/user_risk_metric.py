@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, Float, String, DateTime
+from app.db.database import Base
+
+class UserRiskMetric(Base):
+    __tablename__ = 'user_risk_metrics'
+
+    user_id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime)
+    win_ratio = Column(Float)
+    profit_factor = Column(Float)
+    max_drawdown = Column(Float)
+    stop_loss_used = Column(Float)
+    take_profit_used = Column(Float)
+    hft_count = Column(Integer)
+    max_layering = Column(Integer)
+    risk_score = Column(Float)
+    risk_signals = Column(String)
+    last_trade_at = Column(DateTime)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from app.db.database import Base
+
+class WebhookOutbox(Base):
+    __tablename__ = 'webhook_outbox'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    payload = Column(Text)
+    attempts = Column(Integer, default=0)
+    last_error = Column(String)
+    created_at = Column(DateTime)
+    last_attempt_at = Column(DateTime)
+    claimed_by = Column(String)  # host:pid of the process delivering or replaying the row
+    claimed_until = Column(DateTime)  # Other replicas leave the row alone until then
@@ -1,11 +1,64 @@
 from app.core.config import settings
+from app.risk_utils.columnar import TradeBatch, calculate_metrics_columnar, trade_order
+import numpy as np
+
+# Simple weighted average of the normalized metrics
+RISK_WEIGHTS = {
+    'win_ratio': 0.15,
+    'profit_factor': 0.15,
+    'max_drawdown': 0.20,
+    'stop_loss_used': 0.15,
+    'take_profit_used': 0.15,
+    'hft_count': 0.15,
+    'max_layering': 0.20
+}
+
+# Signal names in the order generate_risk_signals emits them
+RISK_SIGNALS = ("low_win_ratio", "high_drawdown", "hft_signal", "low_stop_loss_usage", "low_take_profit_usage")
+
+
+def calculate_max_drawdown(trades):
+    """Largest relative peak-to-valley loss, replaying trades in closing order (identifier breaks ties)"""
+    balance = settings.INITIAL_BALANCE
+    peak = balance
+    max_drawdown = 0
+    for trade in sorted(trades, key=trade_order):
+        balance += trade.profit
+        if balance > peak:
+            peak = balance
+        drawdown = (peak - balance) / peak
+        if drawdown > max_drawdown:
+            max_drawdown = drawdown
+    return max_drawdown
+
+
+def calculate_max_layering(trades):
+    """Maximum number of trades open at the same time; events at the same instant apply in trade order"""
+    events = []
+    for trade in sorted(trades, key=trade_order):
+        events.append((trade.opened_at, 1))   # Trade open
+        events.append((trade.closed_at, -1))  # Trade close
+
+    events.sort(key=lambda x: x[0])
+    current_open = 0
+    max_open = 0
+    for _, change in events:
+        current_open += change
+        if current_open > max_open:
+            max_open = current_open
+    return max_open
 
 
 def calculate_metrics(trades):
-    """Calculate risk metrics for a set of trades"""
+    """Calculate risk metrics for a set of trades (Trade-like objects or a TradeBatch)"""
+    if isinstance(trades, TradeBatch):
+        return calculate_metrics_columnar(trades)
     if not trades:
         return {}
 
+    # Canonical order, so sums and tie-breaks do not depend on how the trades were fetched
+    trades = sorted(trades, key=trade_order)
+
     # 1. Win Ratio
     winning_trades = [t for t in trades if t.profit > 0]
     win_ratio = len(winning_trades) / len(trades) if trades else 0
@@ -16,16 +69,7 @@ def calculate_metrics(trades):
     profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
 
     # 3. Max Drawdown
-    balance = settings.INITIAL_BALANCE
-    peak = balance
-    max_drawdown = 0
-    for trade in sorted(trades, key=lambda t: t.closed_at):
-        balance += trade.profit
-        if balance > peak:
-            peak = balance
-        drawdown = (peak - balance) / peak
-        if drawdown > max_drawdown:
-            max_drawdown = drawdown
+    max_drawdown = calculate_max_drawdown(trades)
 
     # 4. Stop Loss Used
     stop_loss_used = len([t for t in trades if t.price_sl is not None]) / len(trades)
@@ -41,18 +85,7 @@ def calculate_metrics(trades):
             hft_count += 1
 
     # 7. Layering Detection
-    events = []
-    for trade in trades:
-        events.append((trade.opened_at, 1))   # Trade open
-        events.append((trade.closed_at, -1))  # Trade close
-
-    events.sort(key=lambda x: x[0])
-    current_open = 0
-    max_open = 0
-    for _, change in events:
-        current_open += change
-        if current_open > max_open:
-            max_open = current_open
+    max_open = calculate_max_layering(trades)
 
     last_trade = max(t.closed_at for t in trades) if trades else None
 
@@ -70,16 +103,7 @@ def calculate_metrics(trades):
 
 def calculate_risk_score(metrics):
     """Calculate risk score from metrics"""
-    # Simple weighted average
-    weights = {
-        'win_ratio': 0.15,
-        'profit_factor': 0.15,
-        'max_drawdown': 0.20,
-        'stop_loss_used': 0.15,
-        'take_profit_used': 0.15,
-        'hft_count': 0.15,
-        'max_layering': 0.20
-    }
+    weights = RISK_WEIGHTS
 
     # Normalize metrics to 0-100 scale
     normalized = {
@@ -113,3 +137,46 @@ def generate_risk_signals(metrics):
         signals.append("low_take_profit_usage")
 
     return signals
+
+
+def calculate_risk_scores(columns):
+    """Vectorized calculate_risk_score over metric columns (dict of NumPy arrays)"""
+    profit_factor = columns['profit_factor']
+    normalized = {
+        'win_ratio': np.minimum(columns['win_ratio'] * 100, 100),
+        'profit_factor': np.where(profit_factor != float('inf'), np.minimum(profit_factor * 10, 100), 100),
+        'max_drawdown': columns['max_drawdown'] * 100,
+        'stop_loss_used': columns['stop_loss_used'] * 100,
+        'take_profit_used': columns['take_profit_used'] * 100,
+        'hft_count': np.minimum(columns['hft_count'] * 10, 100),
+        'max_layering': np.minimum(columns['max_layering'] * 20, 100)
+    }
+
+    # Summed in the same order as sum() above, so scores match to the last bit
+    score = np.zeros(len(profit_factor))
+    for k in RISK_WEIGHTS:
+        score = score + normalized[k] * RISK_WEIGHTS[k]
+    return np.minimum(score, 100)
+
+
+def generate_risk_signals_columnar(columns):
+    """
+    Vectorized generate_risk_signals: the comma-joined signals of every row, as stored in risk_signals.
+    """
+    masks = (
+        columns['win_ratio'] < settings.WIN_RATIO_THRESHOLD,
+        columns['max_drawdown'] > settings.DRAWDOWN_THRESHOLD,
+        columns['hft_count'] > 0,
+        columns['stop_loss_used'] < settings.STOP_LOSS_THRESHOLD,
+        columns['take_profit_used'] < settings.TAKE_PROFIT_THRESHOLD,
+    )
+    # Each row's signal set as a 5-bit code, mapped to one of the 32 possible strings
+    codes = np.zeros(len(columns['win_ratio']), dtype=np.int64)
+    for bit, mask in enumerate(masks):
+        codes |= mask.astype(np.int64) << bit
+    joined = np.array([
+        ",".join(name for bit, name in enumerate(RISK_SIGNALS) if code >> bit & 1)
+        for code in range(2 ** len(RISK_SIGNALS))
+    ], dtype=object)
+    return joined[codes]
+
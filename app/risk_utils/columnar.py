@@ -0,0 +1,137 @@
+from datetime import datetime
+from typing import NamedTuple
+from app.core.config import settings
+from app.db.database import is_sqlite
+import pandas as pd
+import numpy as np
+
+# The only trade columns the metrics read, in TradeBatch.from_rows order
+BATCH_FIELDS = ("profit", "opened_at", "closed_at", "price_sl", "price_tp")
+
+
+def _datetime_ns(values):
+    # pandas converts datetime objects in C, ~10x faster than np.array(..., dtype="datetime64[ns]")
+    return np.asarray(pd.DatetimeIndex(values), dtype="datetime64[ns]").view(np.int64)
+
+
+def batch_columns(model):
+    """The BATCH_FIELDS columns of a Trade-like model, for a Core select() feeding TradeBatch.from_rows"""
+    return [getattr(model, field) for field in BATCH_FIELDS]
+
+
+def trade_order(trade):
+    """Sort key of a Trade-like object: close time, then identifier for ties (newest_first() reversed)"""
+    return trade.closed_at, trade.identifier
+
+
+def newest_first(model):
+    """
+    ORDER BY terms for the newest trades of a Trade-like model first. The identifier breaks
+    closed_at ties, byte-wise like the trade store sorts it, so every path cuts the same window.
+    """
+    identifier = model.identifier if is_sqlite else model.identifier.collate("C")
+    return model.closed_at.desc(), identifier.desc()
+
+
+class TradeBatch(NamedTuple):
+    """
+    Columnar view of a set of trades (one NumPy array per field), newest first by (closed_at, identifier):
+    from_trades() sorts, from_rows() expects rows ordered by newest_first(), like the windowed queries return them.
+    """
+    profit: np.ndarray     # float64
+    opened_at: np.ndarray  # int64, ns since epoch
+    closed_at: np.ndarray  # int64, ns since epoch
+    has_sl: np.ndarray     # bool, price_sl is not null
+    has_tp: np.ndarray     # bool, price_tp is not null
+
+    @classmethod
+    def from_trades(cls, trades):
+        """Build a batch from Trade objects (or any rows exposing the same attributes, identifier included)"""
+        trades = sorted(trades, key=trade_order, reverse=True)
+        return cls(
+            profit=np.fromiter((t.profit for t in trades), dtype=np.float64, count=len(trades)),
+            opened_at=_datetime_ns([t.opened_at for t in trades]),
+            closed_at=_datetime_ns([t.closed_at for t in trades]),
+            has_sl=np.fromiter((t.price_sl is not None for t in trades), dtype=bool, count=len(trades)),
+            has_tp=np.fromiter((t.price_tp is not None for t in trades), dtype=bool, count=len(trades)),
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a batch from (profit, opened_at, closed_at, price_sl, price_tp) tuples, e.g. a select of batch_columns(Trade)"""
+        profit, opened_at, closed_at, price_sl, price_tp = tuple(zip(*rows)) or ((),) * 5
+        return cls(
+            profit=np.array(profit, dtype=np.float64),
+            opened_at=_datetime_ns(opened_at),
+            closed_at=_datetime_ns(closed_at),
+            has_sl=np.array([value is not None for value in price_sl], dtype=bool),
+            has_tp=np.array([value is not None for value in price_tp], dtype=bool),
+        )
+
+    def __len__(self):
+        return len(self.profit)
+
+    def head(self, n):
+        """The first n trades, as views of this batch"""
+        return TradeBatch(*(column[:n] for column in self))
+
+
+def _sequential_sum(values):
+    # cumsum adds left to right like the builtin sum(), np.sum would use pairwise summation
+    return float(np.cumsum(values)[-1]) if len(values) else 0
+
+
+def _to_datetime(ns):
+    return np.datetime64(int(ns), "ns").astype("datetime64[us]").astype(datetime)
+
+
+def calculate_metrics_columnar(batch: TradeBatch):
+    """Vectorized equivalent of calculations.calculate_metrics for a TradeBatch"""
+    n = len(batch)
+    if not n:
+        return {}
+
+    # Oldest first, the order calculations.calculate_metrics replays and sums Trade objects in
+    oldest_first = TradeBatch(*(column[::-1] for column in batch))
+    profit = oldest_first.profit
+
+    # 1. Win Ratio
+    winning = profit > 0
+    win_ratio = int(np.count_nonzero(winning)) / n
+
+    # 2. Profit Factor
+    total_profit = _sequential_sum(profit[winning])
+    total_loss = abs(_sequential_sum(profit[profit < 0]))
+    profit_factor = total_profit / total_loss if total_loss > 0 else float('inf')
+
+    # 3. Max Drawdown (the batch order already breaks closed_at ties)
+    balance = np.cumsum(np.concatenate(([float(settings.INITIAL_BALANCE)], profit)))
+    peak = np.maximum.accumulate(balance)
+    max_drawdown = max(float(((peak - balance) / peak)[1:].max()), 0)
+
+    # 4. Stop Loss Used / 5. Take Profit Used
+    stop_loss_used = int(np.count_nonzero(batch.has_sl)) / n
+    take_profit_used = int(np.count_nonzero(batch.has_tp)) / n
+
+    # 6. HFT Detection
+    durations = batch.closed_at - batch.opened_at
+    hft_count = int(np.count_nonzero(durations < settings.HFT_DURATION * 1e9))
+
+    # 7. Layering Detection: open/close events interleaved per trade in trade order, then merged by time
+    times = np.empty(2 * n, dtype=np.int64)
+    times[0::2] = oldest_first.opened_at
+    times[1::2] = oldest_first.closed_at
+    changes = np.tile(np.array([1, -1], dtype=np.int64), n)
+    open_counts = np.cumsum(changes[np.argsort(times, kind="stable")])
+    max_open = max(int(open_counts.max()), 0)
+
+    return {
+        'win_ratio': win_ratio,
+        'profit_factor': profit_factor,
+        'max_drawdown': max_drawdown,
+        'stop_loss_used': stop_loss_used,
+        'take_profit_used': take_profit_used,
+        'hft_count': hft_count,
+        'max_layering': max_open,
+        'last_trade_at': _to_datetime(batch.closed_at.max())
+    }
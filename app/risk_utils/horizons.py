@@ -0,0 +1,65 @@
+from app.core.config import settings
+from app.risk_utils.columnar import TradeBatch
+import numpy as np
+
+# Minutes per horizon unit, largest first
+UNITS = {"d": 1440, "h": 60, "m": 1}
+
+NS_PER_MINUTE = 60 * 10 ** 9
+
+
+def parse_horizon(label: str) -> int:
+    """Minutes of a horizon such as "90m", "24h" or "7d"; a bare number is minutes"""
+    label = label.strip().lower()
+    unit = UNITS.get(label[-1:], 1)
+    number = label[:-1] if label[-1:] in UNITS else label
+    if not number.isdigit() or int(number) <= 0:
+        raise ValueError(f"Invalid horizon: {label!r}")
+    return int(number) * unit
+
+
+def horizon_label(minutes: int) -> str:
+    """Label of a horizon in its largest whole unit, e.g. 1d for 1440 minutes or 90m for 90"""
+    for suffix, unit in UNITS.items():
+        if minutes % unit == 0:
+            return f"{minutes // unit}{suffix}"
+
+
+def configured_horizons():
+    """Horizons in minutes, ascending: RISK_WINDOW_MINUTES and RISK_HORIZONS. Empty when neither is set."""
+    horizons = {parse_horizon(label) for label in settings.RISK_HORIZONS.split(",") if label.strip()}
+    if settings.RISK_WINDOW_MINUTES > 0:
+        horizons.add(settings.RISK_WINDOW_MINUTES)
+    return sorted(horizons)
+
+
+def horizon_cap():
+    """Most trades a horizon window holds"""
+    return max(settings.WINDOW_SIZE, settings.RISK_HORIZON_MAX_TRADES)
+
+
+def fetch_size(horizons):
+    """
+    Newest trades to read per account so the trade window and every horizon fit in one read.
+    One trade past the cap tells a horizon that was cut short from one that just fits.
+    """
+    return horizon_cap() + 1 if horizons else settings.WINDOW_SIZE
+
+
+def split_windows(trades: TradeBatch, horizons):
+    """
+    Splits one newest-first batch into the WINDOW_SIZE trade window and a (minutes, window, truncated)
+    triple per horizon: the trades closed less than `minutes` before the newest one, at most
+    horizon_cap() of them; `truncated` is set when the horizon holds more. Every window is a prefix
+    view of the batch, so they all come from the same read and no trade is copied.
+    """
+    window = trades.head(settings.WINDOW_SIZE)
+    if not horizons or not len(trades):
+        return window, []
+
+    # Oldest-first view; one binary search per horizon gives where its window starts
+    closed_at = trades.closed_at[::-1]
+    cutoffs = closed_at[-1] - np.asarray(horizons, dtype=np.int64) * NS_PER_MINUTE
+    sizes = len(closed_at) - np.searchsorted(closed_at, cutoffs, side="right")
+    cap = horizon_cap()
+    return window, [(minutes, trades.head(min(size, cap)), bool(size > cap)) for minutes, size in zip(horizons, sizes)]
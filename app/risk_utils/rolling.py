@@ -0,0 +1,82 @@
+from app.risk_utils.calculations import calculate_max_drawdown, calculate_max_layering
+from app.risk_utils.columnar import trade_order
+from app.core.config import settings
+from bisect import bisect_right
+from collections import deque
+
+
+class RollingMetrics:
+    """
+    Last `window_size` trades of one account with running aggregates.
+    Counters and sums are updated on add/evict; drawdown and layering are
+    recomputed over the bounded buffer only.
+    """
+
+    def __init__(self, window_size, hft_duration):
+        self.window_size = window_size
+        self.hft_duration = hft_duration
+        self.trades = deque()  # Oldest (closed_at, identifier) first
+        self.win_count = 0
+        self.loss_count = 0
+        self.gross_profit = 0.0
+        self.gross_loss = 0.0
+        self.sl_count = 0
+        self.tp_count = 0
+        self.hft_count = 0
+
+    def matches_settings(self):
+        """Whether the buffer was built with the current window size and HFT duration"""
+        return self.window_size == settings.WINDOW_SIZE and self.hft_duration == settings.HFT_DURATION
+
+    def _apply(self, trade, sign):
+        if trade.profit > 0:
+            self.win_count += sign
+            self.gross_profit += sign * trade.profit
+        elif trade.profit < 0:
+            self.loss_count += sign
+            self.gross_loss -= sign * trade.profit
+        if trade.price_sl is not None:
+            self.sl_count += sign
+        if trade.price_tp is not None:
+            self.tp_count += sign
+        if (trade.closed_at - trade.opened_at).total_seconds() < self.hft_duration:
+            self.hft_count += sign
+
+    def add(self, trade):
+        """Adds a closed trade, evicting the oldest one once the window is full"""
+        key = trade_order(trade)
+        if len(self.trades) >= self.window_size and key < trade_order(self.trades[0]):
+            return False  # Older than everything in a full window
+
+        if not self.trades or key >= trade_order(self.trades[-1]):
+            self.trades.append(trade)
+        else:
+            # Late arrival: keep the buffer ordered like the stored window
+            position = bisect_right([trade_order(t) for t in self.trades], key)
+            self.trades.insert(position, trade)
+        self._apply(trade, 1)
+
+        while len(self.trades) > self.window_size:
+            self._apply(self.trades.popleft(), -1)
+        return True
+
+    def metrics(self):
+        """Same dict as calculations.calculate_metrics over the buffered trades"""
+        n = len(self.trades)
+        if not n:
+            return {}
+
+        # Guard against float residue once every win/loss has been evicted
+        total_profit = self.gross_profit if self.win_count else 0.0
+        total_loss = self.gross_loss if self.loss_count else 0.0
+
+        return {
+            'win_ratio': self.win_count / n,
+            'profit_factor': total_profit / total_loss if total_loss > 0 else float('inf'),
+            'max_drawdown': calculate_max_drawdown(self.trades),
+            'stop_loss_used': self.sl_count / n,
+            'take_profit_used': self.tp_count / n,
+            'hft_count': self.hft_count,
+            'max_layering': calculate_max_layering(self.trades),
+            'last_trade_at': self.trades[-1].closed_at
+        }
@@ -1,21 +1,64 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from app.services.metrics import calculate_risk_metrics
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from app.services.history import compact_history
+from app.services.metrics import refresh_stale_aggregates
+from app.services import job_runner
+from app.core.config import settings
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def risk_job_trigger():
+    if settings.RISK_JOB_CRON:
+        return CronTrigger.from_crontab(settings.RISK_JOB_CRON)
+    return IntervalTrigger(minutes=settings.RISK_JOB_INTERVAL_MINUTES)
+
+
 def start_scheduler():
+    """
+    Every replica runs the same jobs; the scheduler lease and shard claims in the
+    database decide which replica plans a run and who scores each shard.
+    """
     scheduler = BackgroundScheduler()
     job = scheduler.add_job(
-        calculate_risk_metrics,
-        'interval',
-        minutes=600,
+        job_runner.schedule_run,
+        risk_job_trigger(),
         id='risk_metrics_job',
         replace_existing=True,
-        next_run_time=datetime.now()  # runs immediately + every interval
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.now()  # runs immediately + on every trigger
+    )
+    scheduler.add_job(
+        job_runner.poll,
+        'interval',
+        seconds=settings.RISK_JOB_POLL_SECONDS,
+        id='risk_shard_worker',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
     )
+    if settings.RISK_HISTORY_ENABLED:
+        scheduler.add_job(
+            job_runner.run_as_leader(compact_history),
+            'interval',
+            hours=settings.RISK_HISTORY_COMPACTION_HOURS,
+            id='risk_history_compaction',
+            replace_existing=True
+        )
+    if settings.INGEST_AGGREGATE_REFRESH_SECONDS > 0:
+        scheduler.add_job(
+            job_runner.run_as_leader(refresh_stale_aggregates),
+            'interval',
+            seconds=settings.INGEST_AGGREGATE_REFRESH_SECONDS,
+            id='aggregate_refresh',
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True
+        )
     scheduler.start()
-    logger.info(f"📅 Scheduler started for job: {job.id} at {job.next_run_time}.")
+    logger.info(f"📅 Scheduler started for job: {job.id} at {job.next_run_time} as {job_runner.HOLDER}.")
     return scheduler
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, field_validator
+from datetime import datetime, timezone
 from typing import List, Optional
 from app.enums.enums import Phase, Action
 
@@ -15,6 +15,45 @@ class RiskReport(BaseModel):
         from_attributes = True
 
 
+# Risk report over a time horizon
+class HorizonRiskReport(RiskReport):
+    horizon: str
+    trade_count: int
+    truncated: bool  # More than RISK_HORIZON_MAX_TRADES trades in the horizon; the newest were scored
+
+
+# Bulk risk report request schema
+class RiskReportBatchRequest(BaseModel):
+    account_logins: List[int]
+
+
+# Bulk risk report response schema
+class RiskReportBatch(BaseModel):
+    reports: List[RiskReport]
+    not_found: List[int]
+
+
+# One point of an account's risk history
+class RiskHistoryPoint(BaseModel):
+    timestamp: datetime
+    resolution: str
+    risk_score: float
+    risk_signals: List[str]
+    win_ratio: float
+    profit_factor: float
+    max_drawdown: float
+    hft_count: int
+    max_layering: int
+    last_trade_at: Optional[datetime] = None
+
+
+# Risk history response schema
+class RiskHistory(BaseModel):
+    trading_account_login: int
+    resolution: str
+    points: List[RiskHistoryPoint]
+
+
 # Webhook notification schema
 class WebhookNotification(BaseModel):
     trading_account_login: int
@@ -57,6 +96,14 @@ class TradeCreate(BaseModel):
     platform: int
     trading_account_login: int
 
+    @field_validator("opened_at", "closed_at")
+    @classmethod
+    def naive_utc(cls, value: datetime):
+        # Stored trades are naive UTC; offset-aware timestamps would not compare with them
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
 
 # Account data schema
 class AccountCreate(BaseModel):
@@ -92,4 +139,7 @@ class HealthCheck(BaseModel):
     status: str
     db_status: str
     last_calculation: Optional[datetime] = None
-    accounts_processed: int
+    last_calculation_seconds: Optional[float] = None
+    accounts_processed: int = 0
+    scheduled_jobs: List[str] = []
+    cache: Optional[dict] = None
@@ -0,0 +1,92 @@
+from app.core.config import settings
+from app.models import AlertState
+from app.db.upsert import bulk_upsert
+from app.services.webhook import stage_webhooks
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _cooled_down(state, now):
+    if state is None or state.last_sent_at is None:
+        return True
+    return now - state.last_sent_at >= timedelta(minutes=settings.ALERT_COOLDOWN_MINUTES)
+
+
+def should_alert(state, risk_score, risk_signals, now):
+    """
+    Edge-triggered alert decision for one account.
+    Returns (send, alerting): fire when the score crosses RISK_THRESHOLD or, while
+    above it, when the signals differ from the last alert; re-arm only once the
+    score drops ALERT_HYSTERESIS below the threshold. ALERT_COOLDOWN_MINUTES
+    limits how often one account can fire; a crossing it blocks is not lost, it fires on
+    the first run after the cooldown.
+    """
+    above = risk_score > settings.RISK_THRESHOLD
+    alerting = bool(state is not None and state.alerting)
+
+    if not alerting:
+        # A crossing blocked by the cooldown stays pending (not alerting) and fires once it has passed
+        send = above and _cooled_down(state, now)
+        return send, send
+
+    if risk_score < settings.RISK_THRESHOLD - settings.ALERT_HYSTERESIS:
+        return False, False
+
+    signals_changed = ",".join(sorted(risk_signals)) != (state.risk_signals or "")
+    return above and signals_changed and _cooled_down(state, now), True
+
+
+def select_alerts(db: Session, candidates):
+    """
+    Filters (account_login, risk_score, risk_signals, last_trade_at) candidates down to
+    the webhooks to send, and stores the new alert state and their outbox rows in the
+    caller's transaction. Returns the staged notifications for send_webhooks.
+    """
+    if not settings.ALERT_DEDUP_ENABLED:
+        return stage_webhooks(db, [c for c in candidates if c[1] > settings.RISK_THRESHOLD])
+
+    now = datetime.now()
+    # Without a URL nothing is staged: crossings stay pending (not alerting, not sent) like
+    # ones blocked by the cooldown, and fire once WEBHOOK_URL is set
+    deliverable = bool(settings.WEBHOOK_URL)
+    held = 0
+    logins = [c[0] for c in candidates]
+    existing = select(AlertState.account_login, AlertState.alerting, AlertState.risk_signals, AlertState.last_sent_at)
+    if len(logins) <= 500:
+        existing = existing.where(AlertState.account_login.in_(logins))
+    states = {state.account_login: state for state in db.execute(existing)}
+
+    to_send, rows = [], []
+    for account_login, risk_score, risk_signals, last_trade_at in candidates:
+        state = states.get(account_login)
+        send, alerting = should_alert(state, risk_score, risk_signals, now)
+        if send and not deliverable:
+            held += 1
+            send, alerting = False, bool(state is not None and state.alerting)
+
+        row = {
+            "account_login": account_login,
+            "alerting": alerting,
+            "risk_score": risk_score,
+            "risk_signals": state.risk_signals if state is not None else None,
+            "last_sent_at": state.last_sent_at if state is not None else None,
+            "updated_at": now,
+        }
+        if send:
+            to_send.append((account_login, risk_score, risk_signals, last_trade_at))
+            row.update(risk_signals=",".join(sorted(risk_signals)), last_sent_at=now)
+
+        rows.append(row)
+
+    bulk_upsert(db, AlertState, "account_login", rows, settings.RISK_WRITE_BATCH_SIZE)
+
+    if held:
+        logger.warning(f"⚠️ WEBHOOK_URL not set, holding {held} alert(s) until it is")
+    suppressed = sum(1 for c in candidates if c[1] > settings.RISK_THRESHOLD) - len(to_send) - held
+    if suppressed:
+        logger.info(f"🔕 Suppressed {suppressed} repeat alerts")
+    return stage_webhooks(db, to_send)
@@ -0,0 +1,156 @@
+from app.core.config import settings
+from collections import OrderedDict
+import threading
+import logging
+import pickle
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    """In-process TTL cache, evicting least recently used entries past `max_entries`"""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():  # Gone after ttl_seconds, like a Redis EX key
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def size(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Redis-compatible backend; any client with get/set/delete/scan_iter works (e.g. fakeredis)"""
+
+    def __init__(self, client, ttl_seconds, prefix="risk-cache:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl_seconds)
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*(self.prefix + key for key in keys))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def size(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class RiskCache:
+    """
+    Read-through cache for risk reports, keyed by entity ("account:1", "user:2", "challenge:3").
+    A failing backend is treated as a miss so the endpoints keep working.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache read failed for {key}: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        try:
+            self.backend.set(key, value)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache write failed for {key}: {e}")
+
+    def invalidate(self, *keys):
+        try:
+            self.backend.delete(*keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Cache invalidation failed: {e}")
+
+    def clear(self):
+        try:
+            self.backend.clear()
+        except Exception as e:
+            logger.warning(f"⚠️ Cache clear failed: {e}")
+
+    def stats(self):
+        try:
+            size = self.backend.size()
+        except Exception:
+            size = None
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": size,
+        }
+
+
+def account_key(account_login, horizon=None):
+    if horizon is not None:
+        return f"account:{account_login}:{horizon}"
+    return f"account:{account_login}"
+
+
+def user_key(user_id):
+    return f"user:{user_id}"
+
+
+def challenge_key(challenge_id):
+    return f"challenge:{challenge_id}"
+
+
+def build_cache():
+    if settings.CACHE_BACKEND == "redis":
+        import redis  # Optional dependency, only needed for the Redis backend
+        client = redis.Redis.from_url(settings.CACHE_REDIS_URL)
+        return RiskCache(RedisBackend(client, settings.CACHE_TTL_SECONDS))
+    return RiskCache(MemoryBackend(settings.CACHE_MAX_ENTRIES, settings.CACHE_TTL_SECONDS))
+
+
+risk_cache = build_cache()
@@ -0,0 +1,97 @@
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import RiskMetricHistory
+from sqlalchemy import select, insert, update, delete, func
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Coarsest first; a snapshot's resolution only ever moves right to left
+RESOLUTIONS = ("daily", "hourly", "raw")
+
+
+def history_row(row):
+    """
+    History snapshot for a risk_metrics row built by build_metric_row.
+    """
+    timestamp = row["timestamp"]
+    return {**row, "day": timestamp.date(), "hour": timestamp.hour, "resolution": "raw"}
+
+
+def append_history(db: Session, rows, batch_size=500):
+    """
+    Appends one snapshot per row in the caller's transaction.
+    """
+    if not settings.RISK_HISTORY_ENABLED or not rows:
+        return
+    snapshots = [history_row(row) for row in rows]
+    for start in range(0, len(snapshots), batch_size):
+        db.execute(insert(RiskMetricHistory), snapshots[start:start + batch_size])
+
+
+def _downsample(db: Session, resolution, cutoff):
+    """
+    Keeps the newest snapshot per account and bucket (hour or day) among finer snapshots older than `cutoff`.
+    """
+    finer = RESOLUTIONS[RESOLUTIONS.index(resolution) + 1:]
+    bucket = [RiskMetricHistory.account_login, RiskMetricHistory.day]
+    if resolution == "hourly":
+        bucket.append(RiskMetricHistory.hour)
+
+    candidates = (
+        RiskMetricHistory.resolution.in_(finer),
+        RiskMetricHistory.timestamp < cutoff,
+    )
+    # Ids grow with time, so the max id of a bucket is its newest snapshot
+    keep = select(func.max(RiskMetricHistory.id)).where(*candidates).group_by(*bucket)
+
+    removed = db.execute(
+        delete(RiskMetricHistory).where(*candidates, RiskMetricHistory.id.not_in(keep))
+    ).rowcount
+    db.execute(update(RiskMetricHistory).where(*candidates).values(resolution=resolution))
+    return removed
+
+
+def compact_history(now: datetime = None):
+    """
+    Retention and downsampling: raw snapshots older than RISK_HISTORY_RAW_HOURS become hourly,
+    hourly ones older than RISK_HISTORY_HOURLY_DAYS become daily, and anything older than
+    RISK_HISTORY_RETENTION_DAYS is deleted.
+    """
+    now = now or datetime.now()
+    day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    # Cutoffs on bucket boundaries, so no hour/day is split between resolutions
+    hourly_cutoff = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=settings.RISK_HISTORY_RAW_HOURS)
+    daily_cutoff = day_start - timedelta(days=settings.RISK_HISTORY_HOURLY_DAYS)
+    retention_cutoff = (day_start - timedelta(days=settings.RISK_HISTORY_RETENTION_DAYS)).date()
+
+    with SessionLocal() as db:
+        expired = db.execute(
+            delete(RiskMetricHistory).where(RiskMetricHistory.day < retention_cutoff)
+        ).rowcount
+        to_daily = _downsample(db, "daily", daily_cutoff)
+        to_hourly = _downsample(db, "hourly", hourly_cutoff)
+        db.commit()
+
+    logger.info(
+        f"🗜️ History compaction: {expired} expired, {to_daily} merged into daily, "
+        f"{to_hourly} merged into hourly snapshots"
+    )
+    return expired, to_daily, to_hourly
+
+
+def bucket_snapshots(snapshots, resolution):
+    """
+    Newest snapshot per hour/day from snapshots ordered by timestamp; "raw" returns them all.
+    """
+    if resolution == "raw":
+        return list(snapshots)
+
+    buckets = {}
+    for snapshot in snapshots:
+        timestamp = snapshot.timestamp
+        key = (timestamp.date(), timestamp.hour) if resolution == "hourly" else timestamp.date()
+        buckets[key] = snapshot  # Later snapshots overwrite earlier ones
+    return list(buckets.values())
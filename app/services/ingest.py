@@ -0,0 +1,169 @@
+from app.core.config import settings
+from app.db.database import get_db
+from app.models import Trade
+from app.services.metrics import build_metric_row, save_metric_rows
+from app.services.webhook import send_webhooks
+from app.services.alerts import select_alerts
+from app.services.cache import risk_cache, account_key
+from app.services import trade_store
+from app.risk_utils import calculations
+from app.risk_utils.rolling import RollingMetrics
+from app.risk_utils.columnar import newest_first
+import app.schemas.schemas as schemas
+from sqlalchemy import select, insert, func
+from sqlalchemy.orm import Session
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Rolling window state per account, least recently used first, with the
+# (trade count, newest closed_at) of the stored trades it was built from
+_states: "OrderedDict[int, tuple[RollingMetrics, tuple]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _load_state(db: Session, account_login: int):
+    """
+    Seeds a rolling window from the account's last WINDOW_SIZE stored trades.
+    """
+    trades = db.execute(
+        select(Trade.identifier, Trade.profit, Trade.opened_at, Trade.closed_at, Trade.price_sl, Trade.price_tp)
+        .where(Trade.trading_account_login == account_login)
+        .order_by(*newest_first(Trade))
+        .limit(settings.WINDOW_SIZE)
+    ).all()
+
+    state = RollingMetrics(settings.WINDOW_SIZE, settings.HFT_DURATION)
+    for trade in reversed(trades):
+        state.add(trade)
+    return state
+
+
+def _stored_markers(db: Session, account_logins):
+    """
+    (trade count, newest closed_at) of the stored trades of each account.
+    """
+    rows = db.execute(
+        select(Trade.trading_account_login, func.count(), func.max(Trade.closed_at))
+        .where(Trade.trading_account_login.in_(account_logins))
+        .group_by(Trade.trading_account_login)
+    )
+    return {login: (count, newest) for login, count, newest in rows}
+
+
+def _get_state(db: Session, account_login: int, marker):
+    """
+    The cached window, re-seeded when the stored trades changed behind it (another
+    replica, load_data, a manual fix) or the window settings did.
+    """
+    cached = _states.get(account_login)
+    if cached is None or cached[1] != marker or not cached[0].matches_settings():
+        cached = (_load_state(db, account_login), marker)
+        _states[account_login] = cached
+    _states.move_to_end(account_login)
+
+    while len(_states) > settings.INGEST_STATE_MAX_ACCOUNTS:
+        _states.popitem(last=False)
+    return cached[0]
+
+
+def _advance_marker(account_login: int, trades):
+    # The window now also reflects these stored trades (unless a large batch already evicted it)
+    if account_login not in _states:
+        return
+    state, (count, newest) = _states[account_login]
+    latest = max(trade.closed_at for trade in trades)
+    _states[account_login] = (state, (count + len(trades), latest if newest is None else max(newest, latest)))
+
+
+def ingest_trades(trades: list[schemas.TradeCreate]):
+    """
+    Persists newly closed trades and refreshes the RiskMetric row of every
+    affected account from its rolling window, without re-reading the window.
+    """
+    if not trades:
+        return []
+
+    db: Session = next(get_db())
+    alerts = []
+    candidates = []
+
+    try:
+        with _lock:
+            # Seed missing or stale windows before the new trades are stored, so they are not counted twice
+            by_account = {}
+            for trade in trades:
+                by_account.setdefault(trade.trading_account_login, []).append(trade)
+            markers = _stored_markers(db, list(by_account))
+            states = {login: _get_state(db, login, markers.get(login, (0, None))) for login in by_account}
+
+            db.execute(insert(Trade), [trade.model_dump() for trade in trades])
+
+            for trade in sorted(trades, key=lambda t: (t.closed_at, t.identifier)):
+                states[trade.trading_account_login].add(trade)
+
+            now = datetime.now()
+            rows = []
+            for account_login, state in states.items():
+                metrics = state.metrics()
+                risk_score = calculations.calculate_risk_score(metrics)
+                risk_signals = calculations.generate_risk_signals(metrics)
+
+                rows.append(build_metric_row(account_login, metrics, risk_score, risk_signals, now))
+                candidates.append((account_login, risk_score, risk_signals, metrics['last_trade_at']))
+
+            save_metric_rows(db, rows)
+            alerts = select_alerts(db, candidates)
+            # A store rebuild must see the new trades either in the table or as a delta
+            with trade_store.commit_lock():
+                db.commit()
+                trade_store.append(trades)
+            for login, account_trades in by_account.items():
+                _advance_marker(login, account_trades)
+
+    except Exception:
+        db.rollback()
+        # Windows may already hold trades that were not stored
+        with _lock:
+            for login in {t.trading_account_login for t in trades}:
+                _states.pop(login, None)
+        raise
+
+    else:
+        logger.info(f"📥 Ingested {len(trades)} trades for {len(rows)} accounts")
+        # The trades are committed: a failure from here on must not reach the caller, whose
+        # retry would only hit their unique identifiers
+        _invalidate_reports(list(states))
+
+        # 🚨 Send webhook on threshold crossings / signal changes
+        try:
+            send_webhooks(alerts)
+        except Exception as e:
+            logger.error(f"🔥 Webhook hand-off failed, the outbox replay delivers them: {e}")
+
+    finally:
+        db.close()
+
+    return rows
+
+
+def _invalidate_reports(account_logins):
+    """
+    Drops the cached reports of the accounts. Their users and challenges are refreshed, and their
+    reports dropped, by the periodic aggregate refresh (refresh_stale_aggregates).
+    """
+    try:
+        risk_cache.invalidate(*(account_key(login) for login in account_logins))
+    except Exception as e:
+        logger.error(f"🔥 Could not invalidate cached reports, clearing the report cache: {e}")
+        risk_cache.clear()
+
+
+def ingest_trade(trade: schemas.TradeCreate):
+    """
+    Persists one closed trade and returns its account's refreshed risk metric row.
+    """
+    return ingest_trades([trade])[0]
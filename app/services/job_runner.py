@@ -0,0 +1,428 @@
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import Account, JobLease, JobRun, JobShard
+from app.services.metrics import calculate_risk_metrics, score_accounts, accounts_in_range, refresh_aggregates
+from app.services.webhook import send_webhooks
+from app.services.cache import risk_cache
+from app.services import telemetry, profiling, setting_overrides
+from sqlalchemy import select, update, insert, delete, func, case, and_, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+import threading
+import logging
+import socket
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Identifies this process in leases and shard claims
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+
+# The replica holding this lease schedules runs and other leader-only jobs
+SCHEDULER_LEASE = "risk_metrics_job"
+
+# One shard loop per process; the scheduler and admin-triggered runs share it
+_work_lock = threading.Lock()
+
+# Shard states that no longer keep a run open
+FINISHED_SHARDS = ("done", "failed")
+
+
+class ClaimLost(Exception):
+    """This process's claim on a shard expired and another replica took it over"""
+
+
+def _lease_ttl():
+    return timedelta(seconds=settings.RISK_JOB_LEASE_SECONDS)
+
+
+def acquire_lease(name: str = SCHEDULER_LEASE) -> bool:
+    """
+    Takes or renews the named lease for RISK_JOB_LEASE_SECONDS. True if this process holds it.
+    """
+    now = datetime.now()
+    with SessionLocal() as db:
+        renewed = db.execute(
+            update(JobLease)
+            .where(JobLease.name == name, or_(JobLease.holder == HOLDER, JobLease.expires_at < now))
+            .values(holder=HOLDER, expires_at=now + _lease_ttl())
+        ).rowcount
+        if not renewed:
+            try:
+                db.execute(insert(JobLease).values(name=name, holder=HOLDER, expires_at=now + _lease_ttl()))
+            except IntegrityError:
+                # Held by another replica
+                db.rollback()
+                return False
+        db.commit()
+    return True
+
+
+def release_lease(name: str = SCHEDULER_LEASE):
+    with SessionLocal() as db:
+        db.execute(delete(JobLease).where(JobLease.name == name, JobLease.holder == HOLDER))
+        db.commit()
+
+
+def _active_run(db: Session):
+    return db.execute(
+        select(JobRun).where(JobRun.status != "done").order_by(JobRun.id).limit(1)
+    ).scalar()
+
+
+def _plan_shards(db: Session, claim_size: int):
+    """
+    Contiguous account login ranges of `claim_size` accounts each.
+    """
+    ranges = []
+    first = last = None
+    logins = db.execute(select(Account.login).order_by(Account.login)).scalars()
+    for i, login in enumerate(logins):
+        if i % claim_size == 0:
+            if first is not None:
+                ranges.append((first, last))
+            first = login
+        last = login
+    if first is not None:
+        ranges.append((first, last))
+    return ranges
+
+
+def _create_run(db: Session, full_rebuild: bool):
+    """
+    Plans a run and its shards. Returns None when another replica planned one first:
+    uq_job_runs_active allows a single unfinished run.
+    """
+    now = datetime.now()
+    ranges = _plan_shards(db, settings.RISK_JOB_CLAIM_SIZE)
+    run = JobRun(
+        status="running", full_rebuild=full_rebuild, shard_count=len(ranges),
+        accounts_processed=0, created_by=HOLDER, started_at=now, updated_at=now
+    )
+    db.add(run)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        logger.warning("⏭️ Another replica planned a risk run first, not starting another")
+        return None
+    if ranges:
+        db.execute(insert(JobShard), [
+            {"run_id": run.id, "shard_no": i, "login_from": login_from, "login_to": login_to, "status": "pending"}
+            for i, (login_from, login_to) in enumerate(ranges)
+        ])
+    db.commit()
+    logger.info(f"🧩 Planned risk run {run.id}: {len(ranges)} shards of up to {settings.RISK_JOB_CLAIM_SIZE} accounts")
+    return run.id
+
+
+def schedule_run(full_rebuild: bool = False, profile: bool = False, force: bool = False):
+    """
+    Scheduled entry point on every replica. Only the lease holder (or a forced admin request)
+    plans a run, and not while another run is unfinished; every caller then works shards.
+    Returns the number of accounts this process scored, None when it did not run.
+    """
+    if not force and not acquire_lease():
+        logger.info("⏭️ Risk run not scheduled here: another replica holds the scheduler lease")
+        return None
+
+    setting_overrides.reload()
+    if settings.RISK_JOB_MODE == "per_account":
+        # Sequential path, not sharded (always every account); the lease keeps it to one replica
+        return calculate_risk_metrics(profile=profile)
+
+    if profile or settings.PROFILE_JOB_RUNS or profiling.take_next_run():
+        with profiling.profile("job", "risk_metrics sharded"):
+            return _schedule_and_work(full_rebuild)
+    return _schedule_and_work(full_rebuild)
+
+
+def _schedule_and_work(full_rebuild):
+    with SessionLocal() as db:
+        active = _active_run(db)
+        if active is not None:
+            logger.warning(f"⏭️ Risk run {active.id} still in progress since {active.started_at}, not starting another")
+        else:
+            _create_run(db, full_rebuild)
+    return work()
+
+
+def request_full_rebuild():
+    """
+    Re-scores every account with the current settings: plans a full run now or, while a run is
+    in progress (its shards may have read the old settings), queues one that its finalizer plans.
+    Returns (run id, queued): the planned run, or the run the full rebuild waits for.
+    """
+    with SessionLocal() as db:
+        while True:
+            active = _active_run(db)
+            if active is None:
+                run_id = _create_run(db, full_rebuild=True)
+                if run_id is not None:
+                    return run_id, False
+                continue  # Another replica planned one first: queue behind it
+
+            # Only while unfinished, so a finalizer that already closed the run does not miss the request
+            queued = db.execute(
+                update(JobRun)
+                .where(JobRun.id == active.id, JobRun.status != "done")
+                .values(rebuild_requested=True)
+            ).rowcount
+            db.commit()
+            if queued:
+                logger.info(f"🔁 Full rebuild queued behind risk run {active.id}")
+                return active.id, True
+
+
+def poll():
+    """
+    Periodic job on every replica: keeps the scheduler lease alive on the leader
+    (or takes it over when the leader is gone) and works shards of the active run.
+    """
+    try:
+        acquire_lease()
+    except Exception as e:
+        logger.error(f"🔥 Could not renew the scheduler lease: {e}")
+    return work()
+
+
+def _claim_shard(db: Session, run_id: int):
+    """
+    Claims the next pending shard of the run, or one whose claim expired (its worker died).
+    A shard already claimed RISK_JOB_MAX_ATTEMPTS times is marked failed instead.
+    """
+    while True:
+        now = datetime.now()
+        claimable = and_(
+            JobShard.run_id == run_id,
+            or_(JobShard.status == "pending", and_(JobShard.status == "claimed", JobShard.claim_expires_at < now))
+        )
+        candidate = db.execute(
+            select(JobShard.id, JobShard.shard_no, JobShard.attempts).where(claimable).order_by(JobShard.shard_no).limit(1)
+        ).first()
+        if candidate is None:
+            return None
+
+        shard_id, shard_no, attempts = candidate
+        if (attempts or 0) >= settings.RISK_JOB_MAX_ATTEMPTS:
+            # Its workers kept dying or timing out; give up on it so the run can finish
+            failed = db.execute(
+                update(JobShard)
+                .where(JobShard.id == shard_id, claimable)
+                .values(status="failed", claimed_by=None, finished_at=now)
+            ).rowcount
+            db.commit()
+            if failed:
+                logger.error(f"🔥 Shard {shard_no} of run {run_id} failed after {attempts} attempts, skipped")
+            continue
+
+        # Compare-and-set: another replica may claim the same shard first
+        claimed = db.execute(
+            update(JobShard)
+            .where(JobShard.id == shard_id, claimable)
+            .values(
+                status="claimed", claimed_by=HOLDER, claim_expires_at=now + _lease_ttl(),
+                attempts=func.coalesce(JobShard.attempts, 0) + 1
+            )
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.get(JobShard, shard_id)
+
+
+def _renew_claim(shard_id: int):
+    """
+    Extends this process's claim on a shard by RISK_JOB_LEASE_SECONDS. Runs in its own
+    transaction so other replicas see it while the shard's metrics are uncommitted.
+    """
+    with SessionLocal() as db:
+        renewed = db.execute(
+            update(JobShard)
+            .where(JobShard.id == shard_id, JobShard.status == "claimed", JobShard.claimed_by == HOLDER)
+            .values(claim_expires_at=datetime.now() + _lease_ttl())
+        ).rowcount
+        db.commit()
+    if not renewed:
+        raise ClaimLost(shard_id)
+
+
+def _release_shard(db: Session, shard_id: int):
+    """
+    Hands a shard whose processing raised back to the pool, or marks it failed once it used
+    up its RISK_JOB_MAX_ATTEMPTS.
+    """
+    db.rollback()
+    db.execute(
+        update(JobShard)
+        .where(JobShard.id == shard_id, JobShard.status == "claimed", JobShard.claimed_by == HOLDER)
+        .values(
+            status=case((JobShard.attempts >= settings.RISK_JOB_MAX_ATTEMPTS, "failed"), else_="pending"),
+            claimed_by=None, claim_expires_at=None,
+            finished_at=case((JobShard.attempts >= settings.RISK_JOB_MAX_ATTEMPTS, datetime.now()), else_=None)
+        )
+    )
+    db.commit()
+
+
+def _store_key(run: JobRun):
+    """Identifies the run to trade_store.snapshot(); ids restart when the tables are recreated"""
+    return f"{run.id}@{run.started_at.isoformat()}"
+
+
+def _process_shard(db: Session, run: JobRun, shard: JobShard):
+    """
+    Scores the shard's accounts and marks it done in the same transaction, so a finished
+    shard is a checkpoint: a crashed run resumes from the shards not yet done.
+    """
+    started = time.perf_counter()
+    now = datetime.now()
+    incremental = settings.RISK_JOB_INCREMENTAL and not run.full_rebuild
+    only = accounts_in_range(shard.login_from, shard.login_to, incremental)
+    shard_id = shard.id
+    try:
+        # Renewed after every sub-shard, so a long shard is not taken over while it is scored
+        count, alerts = score_accounts(
+            db, only, now, settings.RISK_JOB_WORKERS, lambda: _renew_claim(shard_id), store_key=_store_key(run)
+        )
+    except ClaimLost:
+        db.rollback()
+        logger.warning(f"⚠️ Lost the claim on shard {shard.shard_no} of run {run.id} while scoring it, stopped")
+        return 0
+
+    done = db.execute(
+        update(JobShard)
+        .where(JobShard.id == shard.id, JobShard.status == "claimed", JobShard.claimed_by == HOLDER)
+        .values(status="done", accounts_processed=count, finished_at=datetime.now())
+    ).rowcount
+    if not done:
+        # Claim expired and was taken over; that worker writes the same metrics
+        db.rollback()
+        logger.warning(f"⚠️ Lost the claim on shard {shard.shard_no} of run {run.id}, discarded its results")
+        return 0
+
+    db.execute(
+        update(JobRun)
+        .where(JobRun.id == run.id)
+        .values(accounts_processed=JobRun.accounts_processed + count, updated_at=datetime.now())
+    )
+    db.commit()
+    risk_cache.clear()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"✅ Shard {shard.shard_no + 1}/{run.shard_count} of run {run.id} "
+        f"[{shard.login_from}-{shard.login_to}]: {count} accounts in {elapsed:.2f}s"
+    )
+
+    # 🚨 Send webhook on threshold crossings / signal changes
+    with telemetry.stage("webhook"):
+        send_webhooks(alerts)
+    return count
+
+
+def _finalize(db: Session, run_id: int):
+    """
+    Once every shard is done, one replica refreshes the aggregates and closes the run.
+    A finalization that stalls for RISK_JOB_LEASE_SECONDS is taken over.
+    Returns the id of the full run planned after it when one was requested meanwhile.
+    """
+    now = datetime.now()
+    open_shards = select(JobShard.id).where(
+        JobShard.run_id == JobRun.id, JobShard.status.not_in(FINISHED_SHARDS)
+    ).exists()
+    taken = db.execute(
+        update(JobRun)
+        .where(
+            JobRun.id == run_id,
+            ~open_shards,
+            or_(JobRun.status == "running", and_(JobRun.status == "finalizing", JobRun.updated_at < now - _lease_ttl()))
+        )
+        .values(status="finalizing", updated_at=now)
+    ).rowcount
+    db.commit()
+    if not taken:
+        return
+
+    run = db.get(JobRun, run_id)
+    incremental = settings.RISK_JOB_INCREMENTAL and not run.full_rebuild
+
+    # 👥 User and challenge aggregates, once all accounts of the run are scored
+    with telemetry.stage("aggregates"):
+        refresh_aggregates(db, incremental, now, store_key=_store_key(run))
+        run.status = "done"
+        run.finished_at = run.updated_at = datetime.now()
+        db.commit()
+    risk_cache.clear()
+
+    failed = db.scalar(select(func.count()).where(JobShard.run_id == run_id, JobShard.status == "failed"))
+    if failed:
+        telemetry.record_failure()
+        logger.error(f"🔥 Risk run {run.id} finished with {failed} failed shards; their accounts keep their old metrics")
+
+    duration = (run.finished_at - run.started_at).total_seconds()
+    telemetry.record_run(settings.RISK_JOB_MODE, run.accounts_processed, duration)
+    rate = run.accounts_processed / duration if duration > 0 else 0
+    logger.info(
+        f"⏱️ Risk run {run.id}: {run.accounts_processed} accounts in {run.shard_count} shards, "
+        f"{duration:.2f}s ({rate:.1f} accounts/sec)"
+    )
+
+    # Read after closing the run: later requests see it done and plan their own run
+    if db.scalar(select(JobRun.rebuild_requested).where(JobRun.id == run_id)):
+        logger.info(f"🔁 Planning the full rebuild requested during risk run {run_id}")
+        return _create_run(db, full_rebuild=True)
+    return None
+
+
+def work():
+    """
+    Claims and processes shards of the active run until none is left, then tries to finalize it.
+    Returns the number of accounts this process scored.
+    """
+    if not _work_lock.acquire(blocking=False):
+        return 0
+
+    processed = 0
+    try:
+        while True:
+            # Settings changed through another replica apply from its next claim on
+            setting_overrides.reload()
+            with SessionLocal() as db:
+                run = _active_run(db)
+                if run is None:
+                    return processed
+                shard = _claim_shard(db, run.id)
+                if shard is None:
+                    # Remaining shards are claimed elsewhere, or all finished
+                    if _finalize(db, run.id) is None:
+                        return processed
+                    continue  # A queued full rebuild was planned
+
+                shard_id, shard_no = shard.id, shard.shard_no
+                try:
+                    processed += _process_shard(db, run, shard)
+                except Exception as e:
+                    logger.error(f"🔥 Exception scoring shard {shard_no} of run {run.id}: {e}")
+                    telemetry.record_failure()
+                    _release_shard(db, shard_id)
+
+    except Exception as e:
+        logger.error(f"🔥 Exception during sharded risk calculation: {e}")
+        telemetry.record_failure()
+        return processed
+
+    finally:
+        _work_lock.release()
+
+
+def run_as_leader(fn):
+    """
+    Wraps a periodic job so only the scheduler lease holder runs it.
+    """
+    def job(*args, **kwargs):
+        if acquire_lease():
+            return fn(*args, **kwargs)
+        logger.debug(f"⏭️ {fn.__name__} skipped: not the scheduler lease holder")
+    job.__name__ = fn.__name__
+    return job
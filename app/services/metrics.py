@@ -1,93 +1,593 @@
 from app.core.config import settings
-from app.db.database import get_db
-from app.models import Account, Trade, RiskMetric
-from app.services.webhook import send_webhook
-from app.risk_utils import calculations
+from app.db.database import get_db, SessionLocal
+from app.db.upsert import bulk_upsert
+from app.models import Account, Trade, RiskMetric, RiskMetricHorizon, UserRiskMetric, ChallengeRiskMetric
+from app.services.webhook import send_webhooks
+from app.services.alerts import select_alerts
+from app.services.cache import risk_cache, user_key, challenge_key
+from app.services.history import append_history
+from app.services import telemetry, profiling, trade_store
+from app.risk_utils import calculations, horizons
+from app.risk_utils.columnar import TradeBatch, batch_columns, newest_first
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import select, insert, delete, func, or_
 from sqlalchemy.orm import Session
+from itertools import groupby
 from datetime import datetime
 from tqdm import tqdm
+import multiprocessing
+import threading
+import numpy as np
 import logging
+import math
+import time
 
 logger = logging.getLogger(__name__)
 
+# Full-book scans: server-side cursor (Postgres) fetched 10k rows at a time
+STREAM_OPTIONS = {"stream_results": True, "yield_per": 10000}
 
-def calculate_risk_metrics():
+# Scoring processes of this process as (worker count, pool), started on first use and kept
+# for every later claim and run: starting spawn workers takes about a second
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def calculate_risk_metrics(profile: bool = False):
+    """
+    Computes and stores risk metrics for all accounts, one account at a time (RISK_JOB_MODE=per_account).
+    Batch runs are planned as shards and scored by job_runner.
+    With `profile`, PROFILE_JOB_RUNS or an armed profile request, the run is profiled.
+    """
+    if profile or settings.PROFILE_JOB_RUNS or profiling.take_next_run():
+        with profiling.profile("job", f"risk_metrics {settings.RISK_JOB_MODE}"):
+            return _run_risk_metrics()
+    return _run_risk_metrics()
+
+
+def _run_risk_metrics():
+    started = time.perf_counter()
+    count = calculate_risk_metrics_per_account()
+
+    if count is None:
+        telemetry.record_failure()
+    else:
+        telemetry.record_run(settings.RISK_JOB_MODE, count, time.perf_counter() - started)
+    return count
+
+
+def _log_throughput(label, count, started):
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0
+    logger.info(f"⏱️ {label}: {count} accounts in {elapsed:.2f}s ({rate:.1f} accounts/sec)")
+
+
+def _stale_accounts_query(login_from: int, login_to: int):
+    """
+    Accounts in [login_from, login_to] whose newest closed trade is newer than their stored metric,
+    with trades inserted or overwritten since it was computed (backfills, load_data.py --mode upsert),
+    or that have no metric yet. With time horizons, also accounts whose horizon rows are missing or
+    older (live ingestion only refreshes the trade window). Both groupings are limited to the range,
+    so a shard reads only its own accounts' trades.
+    """
+    latest = (
+        select(
+            Trade.trading_account_login.label("account_login"),
+            func.max(Trade.closed_at).label("max_closed_at"),
+            func.max(Trade.updated_at).label("max_updated_at")
+        )
+        .where(Trade.trading_account_login.between(login_from, login_to))
+        .group_by(Trade.trading_account_login)
+        .subquery()
+    )
+    joined = latest.outerjoin(RiskMetric, RiskMetric.account_login == latest.c.account_login)
+    stale = [
+        RiskMetric.last_trade_at.is_(None),
+        latest.c.max_closed_at > RiskMetric.last_trade_at,
+        latest.c.max_updated_at > RiskMetric.timestamp
+    ]
+
+    horizon_minutes = horizons.configured_horizons()
+    if horizon_minutes:
+        scored = (
+            select(
+                RiskMetricHorizon.account_login,
+                func.min(RiskMetricHorizon.last_trade_at).label("last_trade_at"),
+                func.count().label("horizons")
+            )
+            .where(
+                RiskMetricHorizon.account_login.between(login_from, login_to),
+                RiskMetricHorizon.horizon_minutes.in_(horizon_minutes)
+            )
+            .group_by(RiskMetricHorizon.account_login)
+            .subquery()
+        )
+        joined = joined.outerjoin(scored, scored.c.account_login == latest.c.account_login)
+        stale += [
+            scored.c.last_trade_at.is_(None),
+            scored.c.horizons < len(horizon_minutes),
+            latest.c.max_closed_at > scored.c.last_trade_at
+        ]
+
+    return select(latest.c.account_login).select_from(joined).where(or_(*stale))
+
+
+# Aggregate tables refreshed after the account pass: (grouping column, table, key column name)
+_AGGREGATES = (
+    (Account.user_id, UserRiskMetric, "user_id"),
+    (Account.challenge_id, ChallengeRiskMetric, "challenge_id"),
+)
+
+_AGGREGATE_CACHE_KEYS = {"user_id": user_key, "challenge_id": challenge_key}
+
+
+def _stale_groups_query(group_column, model, key):
+    """
+    Users/challenges with an account scored after their stored aggregate, or without one.
+    Scoring time rather than last_trade_at, so late trades ingested for an account count too.
+    """
+    latest = (
+        select(
+            group_column.label("group_id"),
+            func.max(RiskMetric.timestamp).label("timestamp")
+        )
+        .join(RiskMetric, RiskMetric.account_login == Account.login)
+        .group_by(group_column)
+        .subquery()
+    )
+    return (
+        select(latest.c.group_id)
+        .select_from(latest.outerjoin(model, getattr(model, key) == latest.c.group_id))
+        .where(or_(
+            model.timestamp.is_(None),
+            latest.c.timestamp > model.timestamp
+        ))
+    )
+
+
+def _window_trades_query(window_size, group_column=Trade.trading_account_login, only=None):
+    """
+    Last `window_size` trades of every group (account by default), ordered by group then newest first.
+    `only` restricts the groups to the ids returned by a subquery.
+    """
+    trades = select(
+        group_column.label("group_id"),
+        Trade.profit,
+        Trade.opened_at,
+        Trade.closed_at,
+        Trade.price_sl,
+        Trade.price_tp,
+        func.row_number().over(
+            partition_by=group_column,
+            order_by=newest_first(Trade)
+        ).label("rn")
+    ).join(Account, Account.login == Trade.trading_account_login).where(group_column.is_not(None))
+
+    if only is not None:
+        trades = trades.where(group_column.in_(only))
+
+    ranked = trades.subquery()
+    return (
+        select(ranked)
+        .where(ranked.c.rn <= window_size)
+        .order_by(ranked.c.group_id, ranked.c.rn)
+    )
+
+
+def _store_shards(db: Session, path, window_size, shard_size, group_column, only=None):
+    """
+    Trade store counterpart of _window_trades_query: shards of `shard_size` groups' last `window_size`
+    trades as row ranges of the memory-mapped store. `group_column` is an Account column (login, user_id, challenge_id).
+    """
+    members = select(group_column.label("group_id"), Account.login).where(group_column.is_not(None))
+    if only is not None:
+        members = members.where(group_column.in_(only))
+    result = db.execute(members.order_by(group_column, Account.login), execution_options=STREAM_OPTIONS)
+    groups = (
+        (group_id, [row.login for row in rows])
+        for group_id, rows in groupby(result, key=lambda r: r.group_id)
+    )
+    return trade_store.iter_shards(path, groups, window_size, shard_size)
+
+
+def build_metric_row(entity_id, metrics, risk_score, risk_signals, timestamp, key="account_login"):
+    return {
+        key: entity_id,
+        "timestamp": timestamp,
+        "win_ratio": metrics['win_ratio'],
+        "profit_factor": metrics['profit_factor'],
+        "max_drawdown": metrics['max_drawdown'],
+        "stop_loss_used": metrics['stop_loss_used'],
+        "take_profit_used": metrics['take_profit_used'],
+        "hft_count": metrics['hft_count'],
+        "max_layering": metrics['max_layering'],
+        "risk_score": risk_score,
+        "risk_signals": ",".join(risk_signals),
+        "last_trade_at": metrics['last_trade_at'],
+    }
+
+
+def build_horizon_row(account_login, minutes, trade_count, truncated, metrics, risk_score, risk_signals, timestamp):
+    return {
+        **build_metric_row(account_login, metrics, risk_score, risk_signals, timestamp),
+        "horizon_minutes": minutes,
+        "trade_count": trade_count,
+        "truncated": truncated,
+    }
+
+
+def _warn_truncated(horizon_rows):
+    truncated = sum(1 for row in horizon_rows if row["truncated"])
+    if truncated:
+        logger.warning(
+            f"⚠️ {truncated} account horizons hold more than {horizons.horizon_cap()} trades "
+            f"(RISK_HORIZON_MAX_TRADES): scored over their newest trades and flagged truncated"
+        )
+
+
+def save_horizon_rows(db: Session, logins, rows):
+    """
+    Replaces the horizon rows of the accounts in `logins` (DELETE, then INSERT), RISK_WRITE_BATCH_SIZE
+    accounts or rows per statement. Runs in the caller's transaction.
+    """
+    batch_size = settings.RISK_WRITE_BATCH_SIZE
+    for start in range(0, len(logins), batch_size):
+        db.execute(delete(RiskMetricHorizon).where(RiskMetricHorizon.account_login.in_(logins[start:start + batch_size])))
+    for start in range(0, len(rows), batch_size):
+        db.execute(insert(RiskMetricHorizon), rows[start:start + batch_size])
+    _warn_truncated(rows)
+
+
+def save_metric_rows(db: Session, rows):
+    """
+    Writes computed account rows with INSERT … ON CONFLICT(account_login) DO UPDATE, RISK_WRITE_BATCH_SIZE rows per statement,
+    and appends them to the risk metric history.
+    """
+    bulk_upsert(db, RiskMetric, "account_login", rows, settings.RISK_WRITE_BATCH_SIZE)
+    append_history(db, rows, settings.RISK_WRITE_BATCH_SIZE)
+
+
+def _settings_snapshot():
+    return {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+
+
+def _pack_shard(accounts):
+    """
+    Packs [(group id, trades), …] into plain lists/arrays so a shard pickles compactly.
+    """
+    logins = [account_login for account_login, _ in accounts]
+    offsets = np.cumsum([0] + [len(trades) for _, trades in accounts])
+    # Rows are (group_id, *BATCH_FIELDS, rn)
+    batch = TradeBatch.from_rows([trade[1:6] for _, trades in accounts for trade in trades])
+    return logins, offsets, batch
+
+
+def _iter_shards(result, shard_size):
+    accounts = []
+    for group_id, trades in groupby(result, key=lambda r: r.group_id):
+        accounts.append((group_id, list(trades)))
+        if len(accounts) >= shard_size:
+            yield _pack_shard(accounts)
+            accounts = []
+    if accounts:
+        yield _pack_shard(accounts)
+
+
+def _shard_windows(shard):
+    if isinstance(shard, trade_store.StoreShard):
+        return trade_store.shard_windows(shard, settings.WINDOW_SIZE)
+    logins, offsets, batch = shard
+    return (
+        (account_login, TradeBatch(*(column[offsets[i]:offsets[i + 1]] for column in batch)))
+        for i, account_login in enumerate(logins)
+    )
+
+
+def score_windows(trades: TradeBatch, horizon_minutes=()):
+    """
+    Scores the trade window and every time horizon of a newest-first batch.
+    Returns (metrics, risk score, risk signals, [(minutes, trade count, truncated, metrics, risk score, risk signals)]).
     """
-    Computes and stores risk metrics for all accounts.
+    window, horizon_windows = horizons.split_windows(trades, horizon_minutes)
+
+    # Windows are prefixes of the same batch: equal sizes hold the same trades, scored once
+    scored = {}
+    for batch in (window, *(batch for _, batch, _ in horizon_windows)):
+        if len(batch) not in scored:
+            metrics = calculations.calculate_metrics(batch)
+            scored[len(batch)] = (metrics, calculations.calculate_risk_score(metrics), calculations.generate_risk_signals(metrics))
+
+    metrics, risk_score, risk_signals = scored[len(window)]
+    return metrics, risk_score, risk_signals, [
+        (minutes, len(batch), truncated, *scored[len(batch)])
+        for minutes, batch, truncated in horizon_windows
+    ]
+
+
+def _score_shard(shard, config, horizon_minutes=()):
+    """
+    Worker entry point: scores every group of a packed shard or trade store shard.
+    """
+    for key, value in config.items():
+        setattr(settings, key, value)
+
+    return [
+        (group_id, *score_windows(trades, horizon_minutes))
+        for group_id, trades in _shard_windows(shard)
+    ]
+
+
+def _shard_size(workers):
+    """
+    Groups per shard: RISK_JOB_SHARD_SIZE, or fewer with a pool, so a claim of RISK_JOB_CLAIM_SIZE
+    accounts is split into about four shards per worker.
+    """
+    if workers <= 1:
+        return settings.RISK_JOB_SHARD_SIZE
+    return max(1, min(settings.RISK_JOB_SHARD_SIZE, math.ceil(settings.RISK_JOB_CLAIM_SIZE / (4 * workers))))
+
+
+def _scoring_pool(workers):
+    """
+    This process's pool of `workers` scoring processes, started on first use; replaced when
+    RISK_JOB_WORKERS changes.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool[0] != workers:
+            _pool[1].shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            # spawn: forking a process that runs uvicorn and scheduler threads is unsafe
+            context = multiprocessing.get_context("spawn")
+            _pool = (workers, ProcessPoolExecutor(max_workers=workers, mp_context=context))
+            logger.info(f"🔷 Started {workers} scoring processes")
+        return _pool[1]
+
+
+def shutdown_pool():
+    """
+    Stops the scoring processes, e.g. on application shutdown.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool[1].shutdown(cancel_futures=True)
+            _pool = None
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool[1] is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _run_shards(shards, workers, horizon_minutes=()):
+    """
+    Scores shards in-process, or fans them out to this process's scoring pool when `workers` > 1.
+    """
+    config = _settings_snapshot()
+    if workers <= 1:
+        for shard in shards:
+            yield _score_shard(shard, config, horizon_minutes)
+        return
+
+    pool = _scoring_pool(workers)
+    pending = set()
+    try:
+        for shard in shards:
+            pending.add(pool.submit(_score_shard, shard, config, horizon_minutes))
+            # Keep a bounded number of shards in flight
+            if len(pending) >= 2 * workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+    except BrokenProcessPool:
+        # A scoring process died; the next call starts a new pool
+        _discard_pool(pool)
+        raise
+    finally:
+        # Abandoned (claim lost, error): do not leave its shards queued in the shared pool
+        for future in pending:
+            future.cancel()
+
+
+def refresh_aggregates(db: Session, incremental: bool, timestamp, use_store: bool = True, store_key=None):
+    """
+    Recomputes user and challenge metrics from their combined last WINDOW_SIZE trades.
+    Returns the cache keys of the refreshed users and challenges.
+    `store_key` is passed to trade_store.snapshot(), see score_accounts().
+    """
+    store = trade_store.snapshot(db, store_key) if settings.TRADE_STORE_ENABLED and use_store else None
+    workers = settings.RISK_JOB_WORKERS
+    refreshed = []
+    for group_column, model, key in _AGGREGATES:
+        only = _stale_groups_query(group_column, model, key) if incremental else None
+        if store is not None:
+            shards = _store_shards(db, store, settings.WINDOW_SIZE, _shard_size(workers), group_column, only)
+        else:
+            query = _window_trades_query(settings.WINDOW_SIZE, group_column, only)
+            result = db.execute(query, execution_options=STREAM_OPTIONS)
+            shards = _iter_shards(result, _shard_size(workers))
+
+        rows = [
+            build_metric_row(group_id, metrics, risk_score, risk_signals, timestamp, key=key)
+            for shard_results in _run_shards(shards, workers)
+            for group_id, metrics, risk_score, risk_signals, _ in shard_results
+        ]
+        bulk_upsert(db, model, key, rows, settings.RISK_WRITE_BATCH_SIZE)
+        refreshed.extend(_AGGREGATE_CACHE_KEYS[key](row[key]) for row in rows)
+        logger.info(f"📋 Refreshed {len(rows)} rows of {model.__tablename__}")
+    return refreshed
+
+
+def refresh_stale_aggregates():
+    """
+    Periodic job: refreshes the users and challenges whose accounts were rescored since their
+    aggregate (mostly by live ingestion) and drops their cached reports. Reads the trades table,
+    so the trade store is not compacted on every pass.
+    """
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        try:
+            refreshed = refresh_aggregates(db, True, datetime.now(), use_store=False)
+            db.commit()
+        except Exception as e:
+            logger.error(f"🔥 Exception during aggregate refresh: {e}")
+            db.rollback()
+            return None
+
+    risk_cache.invalidate(*refreshed)
+    if refreshed:
+        logger.info(f"👥 Refreshed {len(refreshed)} stale user and challenge metrics in {time.perf_counter() - started:.2f}s")
+    return len(refreshed)
+
+
+def accounts_in_range(login_from: int, login_to: int, incremental: bool):
+    """
+    Subquery of the account logins in [login_from, login_to], limited to stale accounts when `incremental`.
+    """
+    logins = select(Account.login).where(Account.login.between(login_from, login_to))
+    if incremental:
+        logins = logins.where(Account.login.in_(_stale_accounts_query(login_from, login_to)))
+    return logins
+
+
+def score_accounts(db: Session, only, timestamp, workers, on_progress=None, store_key=None):
+    """
+    Scores the accounts selected by the `only` subquery (all when None) and writes their
+    metrics and alert state in the caller's transaction. Returns (row count, alerts to send).
+    Every time horizon is scored from the same read as the trade window.
+    `on_progress` is called after every shard scored (see _shard_size()) and before writing.
+    `store_key` identifies the job run, so the trade store is checked against the trades table
+    once per run rather than once per shard.
+    """
+    rows = []
+    horizon_rows = []
+    candidates = []
+    horizon_minutes = horizons.configured_horizons()
+    fetch_size = horizons.fetch_size(horizon_minutes)
+    shard_size = _shard_size(workers)
+
+    if settings.TRADE_STORE_ENABLED:
+        with telemetry.stage("trade_store"):
+            store = trade_store.snapshot(db, store_key)
+        scan_started = time.perf_counter()
+        shards = telemetry.TimedIterator(_store_shards(db, store, fetch_size, shard_size, Account.login, only))
+    else:
+        query = _window_trades_query(fetch_size, only=only)
+        scan_started = time.perf_counter()
+        result = db.execute(query, execution_options=STREAM_OPTIONS)
+        # Rows are fetched lazily while scoring; the time spent pulling shards is the fetch stage
+        shards = telemetry.TimedIterator(_iter_shards(result, shard_size))
+
+    # 👉 Calculate metrics
+    for shard_results in _run_shards(shards, workers, horizon_minutes):
+        for account_login, metrics, risk_score, risk_signals, horizon_scores in shard_results:
+            rows.append(build_metric_row(account_login, metrics, risk_score, risk_signals, timestamp))
+            horizon_rows.extend(build_horizon_row(account_login, *scores, timestamp) for scores in horizon_scores)
+            candidates.append((account_login, risk_score, risk_signals, metrics['last_trade_at']))
+        if on_progress is not None:
+            on_progress()
+
+    telemetry.observe_stage("fetch", shards.elapsed)
+    telemetry.observe_stage("compute", time.perf_counter() - scan_started - shards.elapsed)
+
+    logger.info(f"📋 Computed risk metrics for {len(rows)} accounts, writing…")
+    with telemetry.stage("persist"):
+        save_metric_rows(db, rows)
+        save_horizon_rows(db, [row["account_login"] for row in rows], horizon_rows)
+        alerts = select_alerts(db, candidates)
+    return len(rows), alerts
+
+
+def calculate_risk_metrics_per_account():
+    """
+    Original path: one trade query per account, metrics upserted every RISK_WRITE_BATCH_SIZE accounts.
     """
     db: Session = next(get_db())
+    started = time.perf_counter()
 
     try:
-        accounts = db.query(Account).all()
-        logger.info(f"📋 Processing {len(accounts)} accounts…")
+        logins = db.execute(select(Account.login)).scalars().all()
+        logger.info(f"📋 Processing {len(logins)} accounts…")
 
-        batch_size = 500
+        batch_size = settings.RISK_WRITE_BATCH_SIZE
+        horizon_minutes = horizons.configured_horizons()
+        fetch_size = horizons.fetch_size(horizon_minutes)
         count = 0
+        rows = []
+        horizon_rows = []
+        candidates = []
+        fetch_seconds = compute_seconds = persist_seconds = 0.0
 
-        for account in tqdm(accounts, desc="Processing Accounts", unit="acc"):
-            trades = (
-                db.query(Trade)
-                .filter(Trade.trading_account_login == account.login)
-                .order_by(Trade.closed_at.desc())
-                .limit(settings.WINDOW_SIZE)
-                .all()
-            )
+        for login in tqdm(logins, desc="Processing Accounts", unit="acc"):
+            step_started = time.perf_counter()
+            # Plain column tuples, no ORM instances
+            trades = TradeBatch.from_rows(db.execute(
+                select(*batch_columns(Trade))
+                .where(Trade.trading_account_login == login)
+                .order_by(*newest_first(Trade))
+                .limit(fetch_size)
+            ).all())
 
             if not trades:
                 continue
 
+            fetched = time.perf_counter()
+            fetch_seconds += fetched - step_started
+
             # 👉 Calculate metrics
-            metrics = calculations.calculate_metrics(trades)
-            risk_score = calculations.calculate_risk_score(metrics)
-            risk_signals = calculations.generate_risk_signals(metrics)
-
-            # TODO: cHEck this
-            # Check if risk metric already exists for this account
-            existing_metric = db.query(RiskMetric).filter(RiskMetric.account_login == account.login).first()
-
-            if existing_metric:
-                # Update existing record
-                existing_metric.timestamp = datetime.now()
-                existing_metric.win_ratio = metrics['win_ratio']
-                existing_metric.profit_factor = metrics['profit_factor']
-                existing_metric.max_drawdown = metrics['max_drawdown']
-                existing_metric.stop_loss_used = metrics['stop_loss_used']
-                existing_metric.take_profit_used = metrics['take_profit_used']
-                existing_metric.hft_count = metrics['hft_count']
-                existing_metric.max_layering = metrics['max_layering']
-                existing_metric.risk_score = risk_score
-                existing_metric.risk_signals = ",".join(risk_signals)
-                existing_metric.last_trade_at = metrics['last_trade_at']
-            else:
-                # Insert a new record
-                risk_metric = RiskMetric(
-                    account_login=account.login,
-                    timestamp=datetime.now(),
-                    win_ratio=metrics['win_ratio'],
-                    profit_factor=metrics['profit_factor'],
-                    max_drawdown=metrics['max_drawdown'],
-                    stop_loss_used=metrics['stop_loss_used'],
-                    take_profit_used=metrics['take_profit_used'],
-                    hft_count=metrics['hft_count'],
-                    max_layering=metrics['max_layering'],
-                    risk_score=risk_score,
-                    risk_signals=",".join(risk_signals),
-                    last_trade_at=metrics['last_trade_at']
-                )
-                db.add(risk_metric)
+            metrics, risk_score, risk_signals, horizon_scores = score_windows(trades, horizon_minutes)
+
+            now = datetime.now()
+            rows.append(build_metric_row(login, metrics, risk_score, risk_signals, now))
+            horizon_rows.extend(build_horizon_row(login, *scores, now) for scores in horizon_scores)
+            candidates.append((login, risk_score, risk_signals, metrics['last_trade_at']))
+            compute_seconds += time.perf_counter() - fetched
 
             count += 1
-            if count % batch_size == 0:
+            if len(rows) >= batch_size:
+                persist_started = time.perf_counter()
+                save_metric_rows(db, rows)
+                save_horizon_rows(db, [row["account_login"] for row in rows], horizon_rows)
                 db.commit()
+                rows = []
+                horizon_rows = []
+                persist_seconds += time.perf_counter() - persist_started
                 logger.info(f"🔷 Committed {count} risk metrics")
 
-            # 🚨 Send webhook if risk_score > threshold
-            if risk_score > settings.RISK_THRESHOLD:
-                send_webhook(account.login, risk_score, risk_signals, metrics['last_trade_at'])
-
+        persist_started = time.perf_counter()
+        save_metric_rows(db, rows)
+        save_horizon_rows(db, [row["account_login"] for row in rows], horizon_rows)
+        alerts = select_alerts(db, candidates)
         db.commit()
+        persist_seconds += time.perf_counter() - persist_started
         logger.info("✅ All risk metrics committed.")
 
+        # 👥 User and challenge aggregates, in the same run
+        with telemetry.stage("aggregates"):
+            refresh_aggregates(db, False, datetime.now())
+            db.commit()
+        logger.info("✅ User and challenge metrics committed.")
+        risk_cache.clear()
+        _log_throughput("Per-account risk run", count, started)
+
+        telemetry.observe_stage("fetch", fetch_seconds)
+        telemetry.observe_stage("compute", compute_seconds)
+        telemetry.observe_stage("persist", persist_seconds)
+
+        # 🚨 Send webhook on threshold crossings / signal changes
+        with telemetry.stage("webhook"):
+            send_webhooks(alerts)
+
+        return count
+
     except Exception as e:
         logger.error(f"🔥 Exception during risk calculation: {e}")
         db.rollback()
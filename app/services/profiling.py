@@ -0,0 +1,217 @@
+from app.core.config import settings
+from app.db.database import engine, async_engine
+from starlette.datastructures import Headers, QueryParams
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from datetime import datetime
+import threading
+import cProfile
+import pstats
+import logging
+import uuid
+import json
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Per-statement SQL timings of the profile running in this context, None otherwise
+_sql_timings: ContextVar = ContextVar("sql_timings", default=None)
+
+# cProfile hooks the interpreter globally per thread; one capture at a time keeps call trees unmixed
+_capture_lock = threading.Lock()
+
+# SQL listeners are attached only while a profile runs, so disabled profiling costs nothing
+_listeners_lock = threading.Lock()
+_active_profiles = 0
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if _sql_timings.get() is not None:
+        conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = _sql_timings.get()
+    if timings is None or not conn.info.get("profile_started"):
+        return
+    elapsed = time.perf_counter() - conn.info["profile_started"].pop()
+    entry = timings.setdefault(statement, {"count": 0, "seconds": 0.0})
+    entry["count"] += 1
+    entry["seconds"] += elapsed
+
+
+def _engines():
+    return engine, async_engine.sync_engine
+
+
+def _attach_sql_listeners():
+    global _active_profiles
+    with _listeners_lock:
+        if _active_profiles == 0:
+            for target in _engines():
+                event.listen(target, "before_cursor_execute", _before_execute)
+                event.listen(target, "after_cursor_execute", _after_execute)
+        _active_profiles += 1
+
+
+def _detach_sql_listeners():
+    global _active_profiles
+    with _listeners_lock:
+        _active_profiles -= 1
+        if _active_profiles == 0:
+            for target in _engines():
+                event.remove(target, "before_cursor_execute", _before_execute)
+                event.remove(target, "after_cursor_execute", _after_execute)
+
+
+def _function_stats(profiler, limit):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({function})",
+            "calls": ncalls,
+            "tottime": tottime,
+            "cumtime": cumtime,
+        })
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:limit]
+
+
+def _write_profile(profile):
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(settings.PROFILE_DIR, f"{profile['id']}.json")
+    with open(path, "w") as f:
+        json.dump(profile, f, default=str)
+
+    # Bounded ring: drop the oldest files past PROFILE_MAX_FILES
+    files = sorted(name for name in os.listdir(settings.PROFILE_DIR) if name.endswith(".json"))
+    for name in files[:-settings.PROFILE_MAX_FILES]:
+        os.remove(os.path.join(settings.PROFILE_DIR, name))
+
+
+# Set by the admin API to profile the next scheduled run only
+_next_run_armed = threading.Event()
+
+
+def arm_next_run():
+    _next_run_armed.set()
+
+
+def take_next_run():
+    """Whether the next run was armed for profiling; disarms it"""
+    armed = _next_run_armed.is_set()
+    _next_run_armed.clear()
+    return armed
+
+
+class Capture:
+    """Handle of a running profile; `id` is set when the capture starts, the file is written when it ends"""
+
+    def __init__(self):
+        self.id = None
+
+
+@contextmanager
+def profile(kind: str, name: str):
+    """
+    Captures a cProfile call profile and SQL statement timings of the wrapped block
+    and stores them in the profile ring. Only the current thread is profiled; if
+    another capture is running, the block runs unprofiled and `capture.id` stays None.
+    """
+    capture = Capture()
+    if not _capture_lock.acquire(blocking=False):
+        logger.warning(f"⏭️ Profile of {kind} {name} skipped: another capture is running")
+        yield capture
+        return
+
+    started_at = datetime.now()
+    capture.id = f"{started_at:%Y%m%dT%H%M%S%f}-{kind}-{uuid.uuid4().hex[:8]}"
+    timings = {}
+    token = _sql_timings.set(timings)
+    _attach_sql_listeners()
+    profiler = cProfile.Profile()
+    started = time.perf_counter()
+    profiler.enable()
+    try:
+        yield capture
+    finally:
+        profiler.disable()
+        duration = time.perf_counter() - started
+        _detach_sql_listeners()
+        _sql_timings.reset(token)
+        try:
+            sql = sorted(
+                ({"statement": statement, **entry} for statement, entry in timings.items()),
+                key=lambda entry: entry["seconds"], reverse=True
+            )
+            _write_profile({
+                "id": capture.id,
+                "kind": kind,
+                "name": name,
+                "started_at": started_at,
+                "duration": duration,
+                "sql_seconds": sum(entry["seconds"] for entry in sql),
+                "sql": sql,
+                "functions": _function_stats(profiler, settings.PROFILE_TOP_FUNCTIONS),
+            })
+            logger.info(f"🔬 Profile {capture.id} captured ({duration:.3f}s, {len(sql)} distinct statements)")
+        finally:
+            _capture_lock.release()
+
+
+def list_profiles():
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    summaries = []
+    for name in sorted(os.listdir(settings.PROFILE_DIR), reverse=True):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(settings.PROFILE_DIR, name)) as f:
+            profile = json.load(f)
+        summaries.append({key: profile[key] for key in ("id", "kind", "name", "started_at", "duration", "sql_seconds")})
+    return summaries
+
+
+def load_profile(profile_id: str):
+    # Ids are generated here; anything with a path separator is not one of ours
+    if os.path.basename(profile_id) != profile_id:
+        return None
+    path = os.path.join(settings.PROFILE_DIR, f"{profile_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def requested(scope):
+    """Whether a request asks to be profiled: X-Profile header or ?profile= carrying the admin token"""
+    token = Headers(scope=scope).get("x-profile") or QueryParams(scope["query_string"]).get("profile")
+    return token is not None and token == os.getenv("TOKEN")
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests that ask for it and returns the profile id in X-Profile-Id.
+    Pure ASGI, so other requests pass straight through and streamed bodies are not buffered.
+    Other coroutines running on the event loop meanwhile show up in the call profile;
+    SQL timings only include this request's statements.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        with profile("request", f"{scope['method']} {scope['path']}") as capture:
+            async def send_with_id(message):
+                if message["type"] == "http.response.start" and capture.id:
+                    message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", capture.id.encode())]}
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
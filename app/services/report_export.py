@@ -0,0 +1,79 @@
+from app.db.database import AsyncSessionLocal
+from app.models import RiskMetric
+from sqlalchemy import select
+from datetime import datetime
+import math
+import json
+import csv
+import io
+
+# Exported RiskMetric columns, in CSV column order
+EXPORT_COLUMNS = (
+    "account_login", "timestamp", "win_ratio", "profit_factor", "max_drawdown", "stop_loss_used",
+    "take_profit_used", "hft_count", "max_layering", "risk_score", "risk_signals", "last_trade_at"
+)
+
+# Export formats and their media types
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+async def iter_pages(page_size: int):
+    """
+    Every RiskMetric row as pages of up to `page_size` column tuples, in account_login order.
+    Keyset pagination: each page is a short range read on the unique account_login index after
+    the last login seen, in its own session, so no transaction stays open for the whole export
+    and memory is bounded by one page.
+    """
+    query = (
+        select(*(getattr(RiskMetric, column) for column in EXPORT_COLUMNS))
+        .where(RiskMetric.account_login.is_not(None))
+        .order_by(RiskMetric.account_login)
+        .limit(page_size)
+    )
+    last_login = None
+    while True:
+        page_query = query if last_login is None else query.where(RiskMetric.account_login > last_login)
+        async with AsyncSessionLocal() as db:
+            page = (await db.execute(page_query)).all()
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        last_login = page[-1].account_login
+
+
+def _json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # JSON has no infinity (profit_factor without losses); null like the JSON endpoints
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def ndjson_page(page):
+    lines = []
+    for row in page:
+        record = {column: _json_value(value) for column, value in zip(EXPORT_COLUMNS, row)}
+        record["risk_signals"] = row.risk_signals.split(",") if row.risk_signals else []
+        lines.append(json.dumps(record))
+    return "\n".join(lines) + "\n"
+
+
+def csv_page(page, header=False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(page)
+    return buffer.getvalue()
+
+
+async def export(export_format: str, page_size: int):
+    """
+    Streams every RiskMetric as NDJSON lines or CSV rows, one chunk per page.
+    """
+    if export_format == "csv":
+        yield csv_page([], header=True)
+    async for page in iter_pages(page_size):
+        yield csv_page(page) if export_format == "csv" else ndjson_page(page)
@@ -0,0 +1,114 @@
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import RiskMetric, RiskMetricHorizon, UserRiskMetric, ChallengeRiskMetric
+from app.services.alerts import select_alerts
+from app.services.history import append_history
+from app.services.webhook import send_webhooks
+from app.services.cache import risk_cache
+from app.risk_utils import calculations
+from sqlalchemy import select, update
+from datetime import datetime
+import numpy as np
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Settings that change which trades are scored or how metrics are computed; anything else
+# (signal thresholds, RISK_THRESHOLD) only needs the stored metrics re-evaluated
+RECOMPUTE_SETTINGS = ("WINDOW_SIZE", "INITIAL_BALANCE", "HFT_DURATION")
+
+METRIC_COLUMNS = (
+    "win_ratio", "profit_factor", "max_drawdown", "stop_loss_used",
+    "take_profit_used", "hft_count", "max_layering"
+)
+
+# (table, primary key, entity id column); only the account trade window keeps history and alerts
+_TABLES = (
+    (RiskMetric, "id", "account_login"),
+    (RiskMetricHorizon, "id", "account_login"),
+    (UserRiskMetric, "user_id", "user_id"),
+    (ChallengeRiskMetric, "challenge_id", "challenge_id"),
+)
+
+
+def _resignal_table(db, model, pk, key, now):
+    """
+    Re-derives risk_score and risk_signals of every row from its stored metrics and updates
+    the rows that changed. Returns (rows, changed rows, alert candidates for accounts).
+    """
+    names = (*dict.fromkeys((pk, key)), *METRIC_COLUMNS, "risk_score", "risk_signals", "last_trade_at")
+    rows = db.execute(select(*(getattr(model, name) for name in names))).all()
+    if not rows:
+        return 0, 0, []
+
+    stored = dict(zip(names, zip(*rows)))
+    columns = {name: np.array(stored[name], dtype=np.float64) for name in (*METRIC_COLUMNS, "risk_score")}
+
+    scores = calculations.calculate_risk_scores(columns)
+    signals = calculations.generate_risk_signals_columnar(columns)
+    stored_signals = np.array([value or "" for value in stored["risk_signals"]], dtype=object)
+    changed = np.flatnonzero((scores != columns["risk_score"]) | (signals != stored_signals))
+
+    # One executemany UPDATE keyed by primary key, only for rows whose score or signals moved
+    updates = [
+        {pk: stored[pk][i], "risk_score": float(scores[i]), "risk_signals": signals[i], "timestamp": now}
+        for i in changed
+    ]
+    if updates:
+        db.execute(update(model), updates)
+
+    if model is RiskMetric:
+        append_history(db, [
+            {
+                "account_login": stored["account_login"][i],
+                "timestamp": now,
+                **{name: stored[name][i] for name in METRIC_COLUMNS},
+                "risk_score": float(scores[i]),
+                "risk_signals": signals[i],
+                "last_trade_at": stored["last_trade_at"][i],
+            }
+            for i in changed
+        ], settings.RISK_WRITE_BATCH_SIZE)
+
+    candidates = []
+    if model is RiskMetric:
+        # Every account: a new RISK_THRESHOLD can cross it without the score moving
+        candidates = [
+            (login, float(score), signal.split(",") if signal else [], last_trade_at)
+            for login, score, signal, last_trade_at
+            in zip(stored["account_login"], scores, signals, stored["last_trade_at"])
+        ]
+    return len(rows), len(updates), candidates
+
+
+def resignal():
+    """
+    Re-evaluates scores, signals and alerting for the whole book from the stored metrics,
+    after a change of thresholds. Trades are not read. Returns the number of rows changed.
+    """
+    started = time.perf_counter()
+    now = datetime.now()
+    changed_total = 0
+    alerts = []
+
+    with SessionLocal() as db:
+        try:
+            for model, pk, key in _TABLES:
+                count, changed, candidates = _resignal_table(db, model, pk, key, now)
+                changed_total += changed
+                if candidates:
+                    alerts = select_alerts(db, candidates)
+                logger.info(f"🔁 Re-signalled {model.__tablename__}: {changed} of {count} rows changed")
+            db.commit()
+        except Exception as e:
+            logger.error(f"🔥 Exception during re-signal pass: {e}")
+            db.rollback()
+            return None
+
+    risk_cache.clear()
+    logger.info(f"⏱️ Re-signal pass: {changed_total} rows changed in {time.perf_counter() - started:.2f}s")
+
+    # 🚨 Send webhook on threshold crossings / signal changes
+    send_webhooks(alerts)
+    return changed_total
@@ -0,0 +1,45 @@
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.upsert import bulk_upsert
+from app.models import SettingOverride
+from app.services.cache import risk_cache
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from datetime import datetime
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+
+def save(db: Session, values):
+    """
+    Stores settings changed through /admin/update-config ({name: value}) in the caller's
+    transaction, so every replica applies them with reload().
+    """
+    now = datetime.now()
+    rows = [{"name": name, "value": json.dumps(value), "updated_at": now} for name, value in values.items()]
+    bulk_upsert(db, SettingOverride, "name", rows, settings.RISK_WRITE_BATCH_SIZE)
+
+
+def reload():
+    """
+    Applies the stored overrides to this process's settings. Called before claiming shards
+    and on every poll, so replicas score with the settings changed on another one.
+    Returns the names of the settings that changed here.
+    """
+    with SessionLocal() as db:
+        overrides = db.execute(select(SettingOverride.name, SettingOverride.value)).all()
+
+    changed = []
+    for name, value in overrides:
+        value = json.loads(value)
+        if hasattr(settings, name) and getattr(settings, name) != value:
+            setattr(settings, name, value)
+            changed.append(name)
+
+    if changed:
+        # Cached reports were computed with the old thresholds
+        risk_cache.clear()
+        logger.info(f"🔧 Applied settings changed on another replica: {changed}")
+    return changed
@@ -0,0 +1,187 @@
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.db.database import engine, async_engine
+from app.services.cache import risk_cache
+from contextlib import contextmanager
+from sqlalchemy import event
+from datetime import datetime
+import time
+
+# Own registry, so only service metrics are exported
+registry = CollectorRegistry()
+
+# Job runs take minutes on a full book, requests milliseconds
+JOB_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+JOB_DURATION = Histogram(
+    "risk_job_duration_seconds", "Duration of risk metric runs",
+    ["mode"], buckets=JOB_BUCKETS, registry=registry
+)
+JOB_STAGE_DURATION = Histogram(
+    "risk_job_stage_duration_seconds", "Time spent per stage of a risk metric run",
+    ["stage"], buckets=STAGE_BUCKETS, registry=registry
+)
+JOB_RUNS = Counter("risk_job_runs_total", "Risk metric runs by outcome", ["status"], registry=registry)
+ACCOUNTS_PROCESSED = Counter("risk_job_accounts_processed_total", "Accounts scored by risk runs", registry=registry)
+LAST_RUN_TIMESTAMP = Gauge(
+    "risk_job_last_success_timestamp_seconds", "Unix time the last successful run finished", registry=registry
+)
+LAST_RUN_DURATION = Gauge("risk_job_last_duration_seconds", "Duration of the last successful run", registry=registry)
+LAST_RUN_ACCOUNTS = Gauge("risk_job_last_accounts_processed", "Accounts scored by the last successful run", registry=registry)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route",
+    ["method", "route", "status"], buckets=REQUEST_BUCKETS, registry=registry
+)
+
+WEBHOOK_DELIVERIES = Counter(
+    "webhook_deliveries_total", "Webhook notifications by outcome (sent, retried, outbox)",
+    ["outcome"], registry=registry
+)
+WEBHOOK_DURATION = Histogram(
+    "webhook_request_duration_seconds", "Latency of webhook POST attempts",
+    buckets=REQUEST_BUCKETS, registry=registry
+)
+
+DB_POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool", ["engine"], registry=registry
+)
+DB_POOL_OVERFLOW_CHECKOUTS = Counter(
+    "db_pool_overflow_checkouts_total", "Checkouts beyond pool_size (the pool was saturated)",
+    ["engine"], registry=registry
+)
+
+# Last successful run, for /health
+last_run = {"finished_at": None, "duration": None, "accounts_processed": 0}
+
+
+def record_run(mode, accounts, duration):
+    JOB_RUNS.labels(status="success").inc()
+    JOB_DURATION.labels(mode=mode).observe(duration)
+    ACCOUNTS_PROCESSED.inc(accounts)
+    LAST_RUN_TIMESTAMP.set_to_current_time()
+    LAST_RUN_DURATION.set(duration)
+    LAST_RUN_ACCOUNTS.set(accounts)
+    last_run.update(finished_at=datetime.now(), duration=duration, accounts_processed=accounts)
+
+
+def record_failure():
+    JOB_RUNS.labels(status="failure").inc()
+
+
+def observe_stage(name, seconds):
+    JOB_STAGE_DURATION.labels(stage=name).observe(seconds)
+
+
+@contextmanager
+def stage(name):
+    """Times one stage of a risk run"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+class TimingMiddleware:
+    """
+    Request latency labelled by route template, so ids do not explode the label set.
+    Pure ASGI: the response is passed through untouched and timed until its last body chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"],
+                route=route.path if route is not None else "unmatched",
+                status=str(status)
+            ).observe(time.perf_counter() - started)
+
+
+class TimedIterator:
+    """
+    Wraps an iterator and accumulates the time spent producing its items,
+    e.g. fetching rows from a streamed query while the consumer scores them.
+    """
+
+    def __init__(self, iterable):
+        self._iterator = iter(iterable)
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self._iterator)
+        finally:
+            self.elapsed += time.perf_counter() - started
+
+
+def instrument_pool(target, name):
+    pool = target.pool
+
+    @event.listens_for(target, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        DB_POOL_CHECKOUTS.labels(engine=name).inc()
+        # Only QueuePool has a size; checkouts past it use overflow or wait for a connection
+        if hasattr(pool, "overflow") and pool.checkedout() > pool.size():
+            DB_POOL_OVERFLOW_CHECKOUTS.labels(engine=name).inc()
+
+
+class StateCollector:
+    """
+    Scrape-time values owned by other components: pool occupancy and cache counters.
+    """
+
+    def __init__(self, pools, cache):
+        self.pools = pools
+        self.cache = cache
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections currently checked out", labels=["engine"])
+        for name, pool in self.pools.items():
+            if hasattr(pool, "checkedout"):
+                checked_out.add_metric([name], pool.checkedout())
+        yield checked_out
+
+        if self.cache is not None:
+            stats = self.cache.stats()
+            requests = CounterMetricFamily("risk_cache_requests", "Risk cache lookups by result", labels=["result"])
+            requests.add_metric(["hit"], stats["hits"])
+            requests.add_metric(["miss"], stats["misses"])
+            yield requests
+            if stats["size"] is not None:
+                yield GaugeMetricFamily("risk_cache_entries", "Entries in the risk cache", value=stats["size"])
+
+
+instrument_pool(engine, "sync")
+instrument_pool(async_engine.sync_engine, "async")
+registry.register(StateCollector({"sync": engine.pool, "async": async_engine.sync_engine.pool}, risk_cache))
+
+
+def render():
+    return generate_latest(registry), CONTENT_TYPE_LATEST
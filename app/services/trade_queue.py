@@ -0,0 +1,84 @@
+from app.core.config import settings
+from app.services.ingest import ingest_trades
+import app.schemas.schemas as schemas
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TradeQueue:
+    """
+    In-process queue of incoming trades, drained by a background task that
+    coalesces them into micro-batches (by size or latency) for ingest_trades.
+    """
+
+    def __init__(self, max_batch_size=None, max_latency_ms=None, max_size=None):
+        self.max_batch_size = max_batch_size or settings.INGEST_BATCH_SIZE
+        self.max_latency = (max_latency_ms or settings.INGEST_MAX_LATENCY_MS) / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_size or settings.INGEST_QUEUE_MAX_SIZE)
+        self._task = None
+
+    def offer(self, trades: list[schemas.TradeCreate]):
+        """Enqueues all trades, or none of them if the queue cannot take them"""
+        if self.queue.maxsize and self.queue.qsize() + len(trades) > self.queue.maxsize:
+            return False
+        for trade in trades:
+            self.queue.put_nowait(trade)
+        return True
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_latency
+
+        while len(batch) < self.max_batch_size:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _ingest(self, batch):
+        try:
+            await asyncio.to_thread(ingest_trades, batch)
+        except Exception as e:
+            # One bad trade (e.g. a duplicate identifier) must not drop the whole batch
+            logger.warning(f"⚠️ Batch of {len(batch)} trades failed ({e}), retrying one by one")
+            for trade in batch:
+                try:
+                    await asyncio.to_thread(ingest_trades, [trade])
+                except Exception as e:
+                    logger.error(f"🔥 Trade {trade.identifier} rejected: {e}")
+
+    async def _consume(self):
+        while True:
+            batch = await self._next_batch()
+            await self._ingest(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def start(self):
+        self._task = asyncio.create_task(self._consume())
+        logger.info(
+            f"📥 Trade queue started (batch size {self.max_batch_size}, "
+            f"max latency {self.max_latency * 1000:.0f} ms)"
+        )
+
+    async def stop(self):
+        """Drains queued trades, then stops the consumer"""
+        if self._task is None:
+            return
+        await self.queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
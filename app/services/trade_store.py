@@ -0,0 +1,401 @@
+from app.core.config import settings
+from app.db.database import engine, is_sqlite
+from app.models import Trade
+from app.risk_utils.columnar import TradeBatch, batch_columns, trade_order
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain
+from typing import NamedTuple
+import calendar
+from sqlalchemy import select, func, cast, extract, BigInteger
+from sqlalchemy.orm import Session
+import numpy as np
+import logging
+import fcntl
+import json
+import uuid
+import time
+import os
+
+logger = logging.getLogger(__name__)
+
+# Store files hold one Arrow record batch sorted by (trading_account_login, closed_at, identifier).
+# Times are int64 ns since epoch and flags uint8, so those columns map to NumPy without a copy;
+# identifier stays an Arrow string array, read only to break closed_at ties.
+COLUMNS = ("trading_account_login", "closed_at", "opened_at", "profit", "has_sl", "has_tp", "identifier")
+NUMERIC_COLUMNS = COLUMNS[:-1]
+
+# Store order, the reverse of newest_first() within an account
+SORT_KEYS = [("trading_account_login", "ascending"), ("closed_at", "ascending"), ("identifier", "ascending")]
+
+MANIFEST = "manifest.json"
+
+# Bump when COLUMNS, their order or the manifest change; stores written by an older version are rebuilt
+STORE_VERSION = 3
+
+# Rows fetched per round trip when rebuilding from the trades table
+REBUILD_CHUNK = 100_000
+
+
+def _arrow():
+    import pyarrow as pa  # Optional dependency, only needed with TRADE_STORE_ENABLED
+    import pyarrow.ipc
+    import pyarrow.compute
+    return pa
+
+
+def _schema(pa):
+    return pa.schema([
+        ("trading_account_login", pa.int64()),
+        ("closed_at", pa.int64()),
+        ("opened_at", pa.int64()),
+        ("profit", pa.float64()),
+        ("has_sl", pa.uint8()),
+        ("has_tp", pa.uint8()),
+        ("identifier", pa.string()),
+    ])
+
+
+def _epoch_seconds(column):
+    if is_sqlite:
+        return cast(func.strftime("%s", column), BigInteger)
+    return cast(func.floor(extract("epoch", column)), BigInteger)
+
+
+def _cents(column):
+    # CAST truncates on SQLite but rounds on Postgres; int() in Python truncates
+    return cast(column * 100 if is_sqlite else func.trunc(column * 100), BigInteger)
+
+
+def _sum(expression):
+    # Postgres sums BIGINT into NUMERIC
+    return cast(func.coalesce(func.sum(expression), 0), BigInteger)
+
+
+def _table_marker(conn):
+    """
+    Change marker of the trades table: row count plus integer sums over the columns the store
+    holds (profit in truncated cents, times in whole seconds), so rows updated, deleted or
+    inserted behind the store change it even when the count does not. Exact, unlike float sums,
+    so ingestion can add its trades' share without reading the table back.
+    """
+    return list(conn.execute(select(
+        func.count(),
+        _sum(Trade.trading_account_login),
+        _sum(_cents(Trade.profit)),
+        _sum(_epoch_seconds(Trade.opened_at)),
+        _sum(_epoch_seconds(Trade.closed_at)),
+        func.count(Trade.price_sl),
+        func.count(Trade.price_tp),
+    )).one())
+
+
+def _trades_marker(trades):
+    """_table_marker() share of Trade-like objects, computed the same way"""
+    def total(values):
+        return sum(value for value in values if value is not None)
+
+    def seconds(at):
+        return None if at is None else calendar.timegm(at.utctimetuple())
+
+    return [
+        len(trades),
+        total(t.trading_account_login for t in trades),
+        total(None if t.profit is None else int(t.profit * 100) for t in trades),
+        total(seconds(t.opened_at) for t in trades),
+        total(seconds(t.closed_at) for t in trades),
+        sum(t.price_sl is not None for t in trades),
+        sum(t.price_tp is not None for t in trades),
+    ]
+
+
+def _path(name):
+    return os.path.join(settings.TRADE_STORE_DIR, name)
+
+
+@contextmanager
+def _locked():
+    """
+    Exclusive lock on the store across threads and processes of this host.
+    """
+    os.makedirs(settings.TRADE_STORE_DIR, exist_ok=True)
+    with open(_path(".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _read_manifest():
+    try:
+        with open(_path(MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(manifest, previous):
+    """
+    Swaps in a new manifest. Files it no longer lists are kept for one more swap, so runs
+    that already planned shards on them can still open them, then deleted.
+    """
+    if previous is not None:
+        listed = {manifest["base"], *manifest["deltas"]}
+        replaced = {previous["base"], *previous["deltas"]} - listed
+        manifest["retired"] = sorted(replaced)
+        for name in previous.get("retired", []):
+            if name not in listed and os.path.exists(_path(name)):
+                os.remove(_path(name))
+
+    tmp = _path(MANIFEST + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, _path(MANIFEST))
+
+
+def _columns(logins, batch: TradeBatch, identifiers):
+    pa = _arrow()
+    return {
+        "trading_account_login": np.asarray(logins, dtype=np.int64),
+        "closed_at": batch.closed_at,
+        "opened_at": batch.opened_at,
+        "profit": batch.profit,
+        "has_sl": batch.has_sl.view(np.uint8),
+        "has_tp": batch.has_tp.view(np.uint8),
+        "identifier": pa.array(identifiers, type=pa.string()),
+    }
+
+
+def _concat_sorted(parts):
+    pa = _arrow()
+    columns = {name: np.concatenate([part[name] for part in parts]) for name in NUMERIC_COLUMNS}
+    columns["identifier"] = pa.concat_arrays([part["identifier"] for part in parts])
+    keys = pa.table({name: columns[name] for name, _ in SORT_KEYS})
+    order = pa.compute.sort_indices(keys, sort_keys=SORT_KEYS).to_numpy()
+    sorted_columns = {name: columns[name][order] for name in NUMERIC_COLUMNS}
+    sorted_columns["identifier"] = columns["identifier"].take(order)
+    return sorted_columns
+
+
+def _write_file(prefix, columns):
+    pa = _arrow()
+    name = f"{prefix}-{uuid.uuid4().hex}.arrow"
+    arrays = [pa.array(columns[column]) for column in NUMERIC_COLUMNS] + [columns["identifier"]]
+    batch = pa.record_batch(arrays, schema=_schema(pa))
+    tmp = _path(name + ".tmp")
+    with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    os.replace(tmp, _path(name))
+    return name
+
+
+@lru_cache(maxsize=4)
+def _open_file(path):
+    """
+    Memory-maps a store file; the returned arrays are read-only views of the mapping.
+    """
+    pa = _arrow()
+    batch = pa.ipc.open_file(pa.memory_map(path, "r")).get_batch(0)
+    columns = {name: batch.column(name).to_numpy(zero_copy_only=True) for name in NUMERIC_COLUMNS}
+    columns["identifier"] = batch.column("identifier")
+    columns["has_sl"] = columns["has_sl"].view(bool)
+    columns["has_tp"] = columns["has_tp"].view(bool)
+    return columns
+
+
+def _read_file(name):
+    return _open_file(_path(name))
+
+
+def _rebuild_locked(previous, verified_for=None):
+    started = time.perf_counter()
+    parts = [_columns(np.empty(0, dtype=np.int64), TradeBatch.from_rows([]), [])]
+
+    # One read transaction, so the marker matches the rows read
+    with engine.connect() as conn:
+        db_marker = _table_marker(conn)
+        result = conn.execute(
+            select(Trade.trading_account_login, Trade.identifier, *batch_columns(Trade))
+            .where(Trade.trading_account_login.is_not(None)),
+            execution_options={"stream_results": True, "yield_per": REBUILD_CHUNK}
+        )
+        for rows in result.partitions():
+            parts.append(_columns(
+                [row[0] for row in rows], TradeBatch.from_rows([row[2:] for row in rows]), [row[1] for row in rows]
+            ))
+
+    # Sorted in memory rather than by the database, which may order NULLs differently
+    columns = _concat_sorted(parts)
+    manifest = {
+        "version": STORE_VERSION,
+        "base": _write_file("base", columns),
+        "deltas": [],
+        "rows": len(columns["trading_account_login"]),
+        "db_marker": db_marker,
+        "verified_for": verified_for,
+    }
+    _write_manifest(manifest, previous)
+    logger.info(f"🗃️ Trade store rebuilt: {manifest['rows']} trades in {time.perf_counter() - started:.2f}s")
+    return manifest
+
+
+def _compact_locked(manifest):
+    """
+    Merges the delta parts into a new base file.
+    """
+    started = time.perf_counter()
+    parts = [_read_file(name) for name in (manifest["base"], *manifest["deltas"])]
+    columns = _concat_sorted(parts)
+    compacted = {**manifest, "base": _write_file("base", columns), "deltas": []}
+    _write_manifest(compacted, manifest)
+    logger.info(
+        f"🗃️ Trade store compacted {len(manifest['deltas'])} deltas: "
+        f"{compacted['rows']} trades in {time.perf_counter() - started:.2f}s"
+    )
+    return compacted
+
+
+def rebuild():
+    """
+    Rewrites the store from the trades table, e.g. after a bulk load.
+    """
+    with _locked():
+        return _rebuild_locked(_read_manifest())
+
+
+def snapshot(db: Session, verified_for=None):
+    """
+    Path of an up-to-date base file for a scoring run. Pending deltas are compacted first;
+    the store is rebuilt when missing, written by an older version, or when its change marker
+    disagrees with the trades table (trades inserted, updated or deleted by something other than
+    ingestion, e.g. load_data on another host or a manual fix).
+    The marker is a scan of the whole table, so `verified_for` (a job run key) checks it once per
+    run: later snapshots of the same run trust the store, which ingestion keeps in step.
+    """
+    with _locked():
+        manifest = _read_manifest()
+        if manifest is None or manifest.get("version") != STORE_VERSION:
+            manifest = _rebuild_locked(manifest, verified_for)
+        elif verified_for is None or manifest.get("verified_for") != verified_for:
+            db_marker = _table_marker(db.connection())
+            if manifest["db_marker"] != db_marker:
+                logger.warning(
+                    f"⚠️ Trade store is out of date with the trades table "
+                    f"({manifest['db_marker'][0]} vs {db_marker[0]} trades), rebuilding"
+                )
+                manifest = _rebuild_locked(manifest, verified_for)
+            elif verified_for is not None:
+                manifest = {**manifest, "verified_for": verified_for}
+                _write_manifest(manifest, None)
+        if manifest["deltas"]:
+            manifest = _compact_locked(manifest)
+    return _path(manifest["base"])
+
+
+@contextmanager
+def commit_lock():
+    """
+    Held by ingestion around committing new trades and appending them, so a concurrent
+    rebuild sees them either in the table or as a delta, never both.
+    """
+    if not settings.TRADE_STORE_ENABLED:
+        yield
+        return
+    with _locked():
+        yield
+
+
+def append(trades):
+    """
+    Appends committed trades (Trade-like objects) as a delta part. Call under commit_lock().
+    A failed append only costs a rebuild at the next snapshot.
+    """
+    if not settings.TRADE_STORE_ENABLED or not trades:
+        return
+    try:
+        manifest = _read_manifest()
+        if manifest is None or manifest.get("version") != STORE_VERSION:
+            # Not built yet (or by an older version), the next snapshot reads the table
+            return
+        # In TradeBatch.from_trades order, so logins and identifiers line up with the batch
+        stored = sorted((t for t in trades if t.trading_account_login is not None), key=trade_order, reverse=True)
+        delta = _concat_sorted([_columns(
+            [t.trading_account_login for t in stored], TradeBatch.from_trades(stored), [t.identifier for t in stored]
+        )])
+        updated = {
+            **manifest,
+            "deltas": [*manifest["deltas"], _write_file("delta", delta)],
+            "rows": manifest["rows"] + len(stored),
+            "db_marker": [stored + added for stored, added in zip(manifest["db_marker"], _trades_marker(trades))],
+        }
+
+        # Many small parts: merge them into one, the base is left to the next snapshot
+        if len(updated["deltas"]) > settings.TRADE_STORE_MAX_DELTAS:
+            merged = _concat_sorted([_read_file(name) for name in updated["deltas"]])
+            updated["deltas"] = [_write_file("delta", merged)]
+        _write_manifest(updated, manifest)
+
+    except Exception as e:
+        logger.error(f"🔥 Could not append {len(trades)} trades to the trade store: {e}")
+
+
+class StoreShard(NamedTuple):
+    """Trade windows of a shard of groups as row ranges of a store file; pickles without the trades"""
+    path: str
+    ids: list              # group ids (account logins, user or challenge ids)
+    offsets: np.ndarray    # member ranges of group i are starts/ends[offsets[i]:offsets[i + 1]]
+    starts: np.ndarray
+    ends: np.ndarray
+
+
+def _store_shard(path, logins_column, ids, members, window_size):
+    logins = np.fromiter(chain.from_iterable(members), dtype=np.int64)
+    starts = np.searchsorted(logins_column, logins, "left")
+    ends = np.searchsorted(logins_column, logins, "right")
+    # Each account contributes at most its own last window_size trades
+    starts = np.maximum(starts, ends - window_size)
+    offsets = np.concatenate(([0], np.cumsum([len(group) for group in members])))
+    return StoreShard(path, ids, offsets, starts, ends)
+
+
+def iter_shards(path, groups, window_size, shard_size):
+    """
+    StoreShards of `shard_size` groups from (group id, [account logins]) pairs.
+    """
+    logins_column = _open_file(path)["trading_account_login"]
+    ids, members = [], []
+    for group_id, logins in groups:
+        ids.append(group_id)
+        members.append(logins)
+        if len(ids) >= shard_size:
+            yield _store_shard(path, logins_column, ids, members, window_size)
+            ids, members = [], []
+    if ids:
+        yield _store_shard(path, logins_column, ids, members, window_size)
+
+
+def shard_windows(shard: StoreShard, window_size):
+    """
+    (group id, TradeBatch) per group with trades, newest trade first like the windowed SQL query.
+    Single-account windows are views of the mapped file; groups gather their accounts' trades.
+    """
+    columns = _open_file(shard.path)
+    names = ("profit", "opened_at", "closed_at", "has_sl", "has_tp")
+    for i, group_id in enumerate(shard.ids):
+        lo, hi = shard.offsets[i], shard.offsets[i + 1]
+        starts, ends = shard.starts[lo:hi], shard.ends[lo:hi]
+        if hi - lo == 1:
+            if ends[0] == starts[0]:
+                continue
+            yield group_id, TradeBatch(*(columns[name][starts[0]:ends[0]][::-1] for name in names))
+            continue
+
+        rows = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+        if not len(rows):
+            continue
+        pa = _arrow()
+        keys = pa.table({"closed_at": columns["closed_at"][rows], "identifier": columns["identifier"].take(rows)})
+        order = pa.compute.sort_indices(keys, sort_keys=[("closed_at", "descending"), ("identifier", "descending")])
+        newest = rows[order.to_numpy()[:window_size]]
+        yield group_id, TradeBatch(*(columns[name][newest] for name in names))
@@ -1,23 +1,328 @@
 import requests
 import logging
+import asyncio
+import threading
+import json
+import socket
+import time
+import os
+import httpx
 from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import WebhookOutbox
 from app.schemas.schemas import WebhookNotification
-from datetime import datetime
+from app.services.telemetry import WEBHOOK_DELIVERIES, WEBHOOK_DURATION
+from sqlalchemy import select, delete, update, or_
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 
-def send_webhook(account_login: int, score: float, signals: list[str], last_trade: datetime):
+# Identifies this process in outbox claims
+HOLDER = f"{socket.gethostname()}:{os.getpid()}"
 
-    payload = WebhookNotification(
+
+def _claim_ttl():
+    return timedelta(seconds=settings.WEBHOOK_CLAIM_SECONDS)
+
+
+def _unclaimed(now):
+    return or_(WebhookOutbox.claimed_until.is_(None), WebhookOutbox.claimed_until < now)
+
+
+def _payload(account_login: int, score: float, signals: list[str], last_trade: datetime):
+    return WebhookNotification(
         trading_account_login=account_login,
         risk_signals=signals,
         risk_score=score,
         last_trade_at=last_trade.isoformat() if last_trade else None,
-    )
-    try:
-        response = requests.post(settings.WEBHOOK_URL, json=payload.model_dump(), timeout=5)
+    ).model_dump(mode="json")
+
+
+def stage_webhooks(db: Session, alerts) -> list[tuple[int, dict]]:
+    """
+    Writes one outbox row per alert in the caller's transaction, so a notification is
+    stored exactly when its alert state is. The rows are claimed by this process for
+    WEBHOOK_CLAIM_SECONDS; pass the result to send_webhooks once committed.
+    """
+    if not alerts:
+        return []
+    if not settings.WEBHOOK_URL:
+        logger.warning(f"WEBHOOK_URL not set, skipping webhooks for {len(alerts)} account(s)")
+        return []
+
+    now = datetime.now()
+    rows = [
+        WebhookOutbox(
+            payload=json.dumps(_payload(*alert)), attempts=0, created_at=now,
+            claimed_by=HOLDER, claimed_until=now + _claim_ttl()
+        )
+        for alert in alerts
+    ]
+    db.add_all(rows)
+    db.flush()
+    return [(row.id, json.loads(row.payload)) for row in rows]
+
+
+def _claim_outbox(limit: int):
+    """
+    Claims up to `limit` unclaimed (or expired) outbox rows for this process and returns them.
+    The claim is a conditional update, so replicas replaying at the same time never share a row.
+    """
+    now = datetime.now()
+    until = now + _claim_ttl()
+    with SessionLocal() as db:
+        ids = db.execute(
+            select(WebhookOutbox.id)
+            .where(WebhookOutbox.attempts < settings.WEBHOOK_OUTBOX_MAX_ATTEMPTS, _unclaimed(now))
+            .order_by(WebhookOutbox.id)
+            .limit(limit)
+        ).scalars().all()
+        if not ids:
+            return []
+        db.execute(
+            update(WebhookOutbox)
+            .where(WebhookOutbox.id.in_(ids), _unclaimed(now))
+            .values(claimed_by=HOLDER, claimed_until=until)
+        )
+        db.commit()
+        rows = db.execute(
+            select(WebhookOutbox.id, WebhookOutbox.payload)
+            .where(WebhookOutbox.id.in_(ids), WebhookOutbox.claimed_by == HOLDER, WebhookOutbox.claimed_until == until)
+            .order_by(WebhookOutbox.id)
+        ).all()
+    return [(row_id, json.loads(payload)) for row_id, payload in rows]
+
+
+def _mark_outbox(delivered: list[int], failed: list[int], error: str = None):
+    """
+    Deletes delivered rows; failed rows count an attempt and are released for the next replay.
+    """
+    with SessionLocal() as db:
+        if delivered:
+            db.execute(delete(WebhookOutbox).where(WebhookOutbox.id.in_(delivered)))
+        if failed:
+            db.execute(
+                update(WebhookOutbox)
+                .where(WebhookOutbox.id.in_(failed))
+                .values(
+                    attempts=WebhookOutbox.attempts + 1, last_error=error, last_attempt_at=datetime.now(),
+                    claimed_by=None, claimed_until=None
+                )
+            )
+        db.commit()
+
+
+def _release_outbox(ids: list[int] = None):
+    """
+    Drops this process's claims (all of them, or on `ids`) so the next replay picks the rows up
+    without waiting for WEBHOOK_CLAIM_SECONDS.
+    """
+    with SessionLocal() as db:
+        query = update(WebhookOutbox).where(WebhookOutbox.claimed_by == HOLDER)
+        if ids is not None:
+            query = query.where(WebhookOutbox.id.in_(ids))
+        released = db.execute(query.values(claimed_by=None, claimed_until=None)).rowcount
+        db.commit()
+    return released
+
+
+class WebhookDispatcher:
+    """
+    Delivers webhooks off the hot path: a bounded queue drained by async workers
+    sharing one pooled keep-alive HTTP client, with exponential-backoff retries.
+    Every notification already has a webhook_outbox row (see stage_webhooks); it is
+    deleted once delivered, and rows left behind are claimed and replayed.
+    Runs its own event loop in a background thread so sync callers can submit.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._client = None
+        self._tasks = []
+
+    @property
+    def running(self):
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="webhook-dispatcher", daemon=True)
+        self._thread.start()
+        ready.wait()
+        logger.info(
+            f"📮 Webhook dispatcher started ({settings.WEBHOOK_CONCURRENCY} workers, "
+            f"batch size {settings.WEBHOOK_BATCH_SIZE})"
+        )
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._setup())
+        ready.set()
+        self._loop.run_forever()
+
+    async def _setup(self):
+        self._queue = asyncio.Queue(maxsize=settings.WEBHOOK_QUEUE_SIZE)
+        self._client = httpx.AsyncClient(
+            timeout=settings.WEBHOOK_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.WEBHOOK_CONCURRENCY,
+                max_keepalive_connections=settings.WEBHOOK_CONCURRENCY
+            )
+        )
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(settings.WEBHOOK_CONCURRENCY)]
+        self._tasks.append(asyncio.create_task(self._replay_outbox()))
+
+    def submit(self, row_id: int, payload: dict):
+        """Thread-safe, non-blocking enqueue of a staged outbox row"""
+        self._loop.call_soon_threadsafe(self._enqueue, (row_id, payload))
+
+    def _enqueue(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # The row stays in the outbox; releasing it lets the next replay send it
+            WEBHOOK_DELIVERIES.labels(outcome="outbox").inc()
+            self._loop.create_task(asyncio.to_thread(_release_outbox, [item[0]]))
+
+    async def _post(self, payloads: list[dict]):
+        # Batching receivers get a JSON array, others one notification per request
+        body = payloads if settings.WEBHOOK_BATCH_SIZE > 1 else payloads[0]
+        started = time.perf_counter()
+        try:
+            response = await self._client.post(settings.WEBHOOK_URL, json=body)
+        finally:
+            WEBHOOK_DURATION.observe(time.perf_counter() - started)
         response.raise_for_status()
-        logger.info("✅ Webhook sent - account %s (HTTP %s)", account_login, response.status_code)
-    except Exception as e:
-        logger.error(f"🚨 Webhook FAILED for account {account_login}: {e}")
+        WEBHOOK_DELIVERIES.labels(outcome="sent").inc(len(payloads))
+        return response
+
+    async def _deliver(self, items: list[tuple[int, dict]]):
+        ids = [row_id for row_id, _ in items]
+        payloads = [payload for _, payload in items]
+        error = None
+        for attempt in range(settings.WEBHOOK_MAX_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(settings.WEBHOOK_BACKOFF_SECONDS * 2 ** (attempt - 1))
+            try:
+                response = await self._post(payloads)
+                accounts = [p["trading_account_login"] for p in payloads]
+                logger.info("✅ Webhook sent - accounts %s (HTTP %s)", accounts, response.status_code)
+                await asyncio.to_thread(_mark_outbox, ids, [])
+                return
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                logger.warning(f"⚠️ Webhook attempt {attempt + 1} failed: {error}")
+                if attempt < settings.WEBHOOK_MAX_RETRIES:
+                    WEBHOOK_DELIVERIES.labels(outcome="retried").inc(len(payloads))
+
+        logger.error(f"🚨 Webhook FAILED after {settings.WEBHOOK_MAX_RETRIES + 1} attempts, left in the outbox")
+        WEBHOOK_DELIVERIES.labels(outcome="outbox").inc(len(payloads))
+        await asyncio.to_thread(_mark_outbox, [], ids, error)
+
+    async def _worker(self):
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < settings.WEBHOOK_BATCH_SIZE and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._deliver(batch)
+            except Exception as e:
+                logger.error(f"🔥 Webhook worker error: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def replay_once(self):
+        """
+        Claims a page of outbox rows and posts them. Returns (delivered, failed) counts.
+        """
+        rows = await asyncio.to_thread(_claim_outbox, settings.WEBHOOK_BATCH_SIZE * 100)
+        delivered, failed, error = [], [], None
+        size = settings.WEBHOOK_BATCH_SIZE
+        for chunk in (rows[i:i + size] for i in range(0, len(rows), size)):
+            ids = [row_id for row_id, _ in chunk]
+            try:
+                await self._post([payload for _, payload in chunk])
+                delivered.extend(ids)
+            except Exception as e:
+                failed.extend(ids)
+                error = f"{type(e).__name__}: {e}"
+        if rows:
+            await asyncio.to_thread(_mark_outbox, delivered, failed, error)
+            logger.info(f"📦 Outbox replay: {len(delivered)} delivered, {len(failed)} still pending")
+        return len(delivered), len(failed)
+
+    async def _replay_outbox(self):
+        while True:
+            await asyncio.sleep(settings.WEBHOOK_OUTBOX_RETRY_SECONDS)
+            try:
+                await self.replay_once()
+            except Exception as e:
+                logger.error(f"🔥 Outbox replay error: {e}")
+
+    async def _shutdown(self, timeout):
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Webhook queue not drained before shutdown")
+
+        # Queued, in-flight and backing-off notifications are all still in the outbox
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self._client.aclose()
+        released = await asyncio.to_thread(_release_outbox)
+        if released:
+            WEBHOOK_DELIVERIES.labels(outcome="outbox").inc(released)
+            logger.warning(f"📦 {released} undelivered webhook(s) released to the outbox")
+
+    def stop(self, timeout: float = 10):
+        """Flushes queued webhooks (up to `timeout` seconds), then stops the loop"""
+        if not self.running:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(timeout), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        logger.info("✅ Webhook dispatcher stopped.")
+
+
+dispatcher = WebhookDispatcher()
+
+
+def send_webhooks(staged: list[tuple[int, dict]]):
+    """
+    Delivers notifications staged with stage_webhooks, after their transaction committed.
+    """
+    if not staged:
+        return
+
+    if dispatcher.running:
+        for row_id, payload in staged:
+            dispatcher.submit(row_id, payload)
+        return
+
+    # No dispatcher (e.g. scripts): deliver inline
+    delivered, failed, error = [], [], None
+    for row_id, payload in staged:
+        account_login = payload["trading_account_login"]
+        started = time.perf_counter()
+        try:
+            response = requests.post(settings.WEBHOOK_URL, json=payload, timeout=settings.WEBHOOK_TIMEOUT)
+            WEBHOOK_DURATION.observe(time.perf_counter() - started)
+            response.raise_for_status()
+            WEBHOOK_DELIVERIES.labels(outcome="sent").inc()
+            logger.info("✅ Webhook sent - account %s (HTTP %s)", account_login, response.status_code)
+            delivered.append(row_id)
+        except Exception as e:
+            logger.error(f"🚨 Webhook FAILED for account {account_login}: {e}")
+            WEBHOOK_DELIVERIES.labels(outcome="outbox").inc()
+            failed.append(row_id)
+            error = str(e)
+    _mark_outbox(delivered, failed, error)
@@ -0,0 +1,5 @@
+"""
+Benchmark harness: synthetic trade books, metric microbenchmarks, end-to-end job
+and HTTP load benchmarks. Every benchmark writes a JSON report that
+`python -m benchmarks.compare` checks against a baseline.
+"""
@@ -0,0 +1,55 @@
+"""
+Compares a benchmark report with a baseline and fails on regressions.
+
+    python -m benchmarks.compare bench_results/baseline/job.json bench_results/job.json --threshold 0.1
+
+Exits with status 1 when any shared result is worse than the baseline by more
+than --threshold (relative), so CI can gate on it.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(baseline, current, threshold):
+    """
+    [(name, baseline value, current value, relative change, regressed)] for results in both reports.
+    The relative change is positive when the result got worse.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (result["value"] - base["value"]) / abs(base["value"])
+        if result.get("higher_is_better"):
+            change = -change
+        rows.append((name, base["value"], result["value"], change, change > threshold))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flag benchmark regressions against a baseline report")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    baseline, current = load(args.baseline), load(args.current)
+    if baseline["suite"] != current["suite"]:
+        sys.exit(f"Suite mismatch: {baseline['suite']} vs {current['suite']}")
+
+    rows = compare(baseline, current, args.threshold)
+    width = max((len(row[0]) for row in rows), default=0)
+    for name, base, value, change, regressed in rows:
+        flag = "❌ REGRESSION" if regressed else "✅"
+        print(f"  {name:<{width}}  {base:>14.6g} → {value:<14.6g} {change:+7.1%} worse  {flag}")
+
+    regressions = [row for row in rows if row[4]]
+    print(f"{len(regressions)} regression(s) over {args.threshold:.0%} in {len(rows)} results")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,196 @@
+"""
+Seeded synthetic trade books for benchmarks.
+
+    python -m benchmarks.generate --trades 1000000 --accounts 20000 --out bench_data
+    python -m benchmarks.generate --trades 100000 --out bench_data --db sqlite:///bench_data/bench.db
+
+Trades per account follow a Pareto distribution (a few accounts own most of the
+book). Each account gets a trading profile: "normal", "hft" (bursts of trades
+closed within seconds) or "layering" (many long positions opened together).
+"""
+from datetime import datetime
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+import argparse
+import os
+
+PROFILES = ("normal", "hft", "layering")
+
+START = np.datetime64(datetime(2024, 1, 1), "s")
+SYMBOLS = np.array(["EURUSD", "GBPUSD", "USDJPY", "XAUUSD", "US30", "BTCUSD"])
+
+# Rows buffered before a CSV append, bounds memory at 10M trades
+WRITE_BUFFER = 250_000
+
+
+def account_frame(accounts, rng, users_per_account=3, accounts_per_challenge=100):
+    logins = np.arange(100_000, 100_000 + accounts)
+    return pd.DataFrame({
+        "login": logins,
+        "account_size": rng.choice([10_000.0, 50_000.0, 100_000.0, 200_000.0], accounts),
+        "platform": rng.integers(1, 3, accounts),
+        "phase": rng.integers(0, 4, accounts),
+        "user_id": np.arange(accounts) // users_per_account,
+        "challenge_id": rng.integers(0, max(1, accounts // accounts_per_challenge), accounts),
+    })
+
+
+def trade_counts(accounts, trades, rng, skew=1.2):
+    """
+    Splits `trades` over `accounts` with Pareto weights; lower `skew` means a heavier tail.
+    """
+    weights = rng.pareto(skew, accounts) + 1
+    return rng.multinomial(trades, weights / weights.sum())
+
+
+def _timings(profile, n, rng):
+    """
+    Open offsets and durations (seconds) for one account's trades.
+    """
+    if profile == "hft":
+        # Bursts of ~20 trades a few seconds apart, closed within HFT_DURATION
+        gaps = np.where(rng.random(n) < 0.05, rng.exponential(6 * 3600, n), rng.exponential(3, n))
+        durations = rng.integers(1, 50, n)
+    elif profile == "layering":
+        # Positions stacked within minutes and held for hours
+        gaps = np.where(rng.random(n) < 0.1, rng.exponential(12 * 3600, n), rng.exponential(60, n))
+        durations = rng.integers(3600, 8 * 3600, n)
+    else:
+        gaps = rng.exponential(2 * 3600, n)
+        durations = np.maximum(rng.lognormal(7, 1.2, n), 1).astype(np.int64)
+    return np.cumsum(gaps).astype(np.int64), durations
+
+
+def account_trades(login, profile, n, rng, first_id):
+    offsets, durations = _timings(profile, n, rng)
+    opened_at = START + np.timedelta64(int(rng.integers(0, 30 * 86400)), "s") + offsets.astype("timedelta64[s]")
+    closed_at = opened_at + durations.astype("timedelta64[s]")
+
+    open_price = rng.uniform(1, 2, n)
+    lot_size = rng.choice([0.01, 0.1, 0.5, 1.0, 2.0], n)
+    # Fat-tailed P&L with a small per-account edge
+    profit = (rng.standard_t(3, n) * 300 + rng.normal(0, 50)).round(2)
+    sl_rate, tp_rate = rng.uniform(0, 1, 2)
+
+    return {
+        "identifier": np.char.add("T", np.arange(first_id, first_id + n).astype(str)),
+        "action": rng.integers(0, 2, n),
+        "reason": rng.integers(0, 5, n),
+        "open_price": open_price,
+        "close_price": open_price + rng.normal(0, 0.01, n),
+        "commission": -lot_size * 7,
+        "lot_size": lot_size,
+        "opened_at": opened_at,
+        "closed_at": closed_at,
+        "pips": rng.normal(0, 20, n).round(1),
+        "price_sl": np.where(rng.random(n) < sl_rate, open_price - 0.01, np.nan),
+        "price_tp": np.where(rng.random(n) < tp_rate, open_price + 0.01, np.nan),
+        "profit": profit,
+        "swap": np.zeros(n),
+        "symbol": rng.choice(SYMBOLS, n),
+        "contract_size": np.full(n, 100_000.0),
+        "profit_rate": np.ones(n),
+        "platform": np.ones(n, dtype=np.int64),
+        "trading_account_login": np.full(n, login),
+    }
+
+
+def iter_trade_frames(accounts, trades, seed=42, hft_ratio=0.05, layering_ratio=0.05, skew=1.2):
+    """
+    Yields the accounts DataFrame, then trade DataFrames of roughly WRITE_BUFFER rows.
+    """
+    rng = np.random.default_rng(seed)
+    account_df = account_frame(accounts, rng)
+    counts = trade_counts(accounts, trades, rng, skew)
+    profiles = rng.choice(PROFILES, accounts, p=[1 - hft_ratio - layering_ratio, hft_ratio, layering_ratio])
+    yield account_df
+
+    buffered, size, next_id = [], 0, 0
+    for login, profile, n in zip(account_df["login"], profiles, counts):
+        if not n:
+            continue
+        buffered.append(pd.DataFrame(account_trades(login, profile, n, rng, next_id)))
+        size += n
+        next_id += n
+        if size >= WRITE_BUFFER:
+            yield pd.concat(buffered, ignore_index=True)
+            buffered, size = [], 0
+    if buffered:
+        yield pd.concat(buffered, ignore_index=True)
+
+
+def write_csvs(out_dir, accounts, trades, **options):
+    """
+    Writes accounts.csv and trades.csv; returns their paths.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    accounts_path = os.path.join(out_dir, "accounts.csv")
+    trades_path = os.path.join(out_dir, "trades.csv")
+
+    frames = iter_trade_frames(accounts, trades, **options)
+    next(frames).to_csv(accounts_path, index=False)
+
+    written = 0
+    with open(trades_path, "w", newline="") as f:
+        for i, frame in enumerate(frames):
+            frame.to_csv(f, index=False, header=i == 0)
+            written += len(frame)
+            print(f"   … trades: {written} rows")
+
+    print(f"✅ Wrote {accounts} accounts and {written} trades to {out_dir}")
+    return accounts_path, trades_path
+
+
+def build_database(url, accounts_path, trades_path):
+    """
+    Loads the CSVs into `url` with load_data (replace mode) and creates the indexes.
+    """
+    os.environ["SQLALCHEMY_DATABASE_URL"] = url
+    os.environ["ACCOUNTS_CSV_PATH"] = accounts_path
+    os.environ["TRADES_CSV_PATH"] = trades_path
+    import load_data  # Binds the engine to SQLALCHEMY_DATABASE_URL on import
+
+    load_data.load_data(mode="replace")
+    print(f"✅ Database fixture ready at {url}")
+
+
+def trade_objects(n, profile="normal", seed=42):
+    """
+    In-memory trades (attribute access like Trade rows) for microbenchmarks.
+    """
+    rng = np.random.default_rng(seed)
+    columns = account_trades(100_000, profile, n, rng, 0)
+    frame = pd.DataFrame(columns).sort_values(["closed_at", "identifier"], ascending=False)
+    return [
+        SimpleNamespace(
+            identifier=row.identifier,
+            profit=row.profit,
+            opened_at=row.opened_at.to_pydatetime(),
+            closed_at=row.closed_at.to_pydatetime(),
+            price_sl=None if pd.isna(row.price_sl) else row.price_sl,
+            price_tp=None if pd.isna(row.price_tp) else row.price_tp,
+        )
+        for row in frame.itertuples()
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic trade book for benchmarks")
+    parser.add_argument("--accounts", type=int, default=None, help="Default: one per 50 trades")
+    parser.add_argument("--trades", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hft-ratio", type=float, default=0.05, help="Share of accounts trading in HFT bursts")
+    parser.add_argument("--layering-ratio", type=float, default=0.05, help="Share of accounts stacking positions")
+    parser.add_argument("--skew", type=float, default=1.2, help="Pareto shape of trades per account")
+    parser.add_argument("--out", default="bench_data")
+    parser.add_argument("--db", default=None, help="Also load into this database URL, e.g. sqlite:///bench_data/bench.db")
+    args = parser.parse_args()
+
+    accounts = args.accounts or max(1, args.trades // 50)
+    paths = write_csvs(
+        args.out, accounts, args.trades, seed=args.seed,
+        hft_ratio=args.hft_ratio, layering_ratio=args.layering_ratio, skew=args.skew
+    )
+    if args.db:
+        build_database(args.db, *paths)
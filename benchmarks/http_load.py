@@ -0,0 +1,167 @@
+"""
+HTTP load test of the read endpoints against a local uvicorn.
+
+    python -m benchmarks.http_load --db sqlite:///bench_data/bench.db --duration 30 --concurrency 32 \
+        --output bench_results/http.json
+
+Starts uvicorn on the fixture database (or targets --url), then runs closed-loop
+clients for --duration seconds, reporting throughput and latency percentiles per
+endpoint. The server's first scheduled risk run starts with it; --warmup requests
+are sent (and discarded) for that many seconds before measuring.
+"""
+from benchmarks.report import metric, print_results, write_report
+from sqlalchemy import create_engine, text
+import numpy as np
+import subprocess
+import tempfile
+import argparse
+import asyncio
+import random
+import httpx
+import time
+import sys
+import os
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = {
+    "risk_report": "/risk-report/{login}",
+    "risk_history": "/risk-report/{login}/history",
+    "user_risk": "/risk/user/{user_id}",
+    "challenge_risk": "/risk/challenge/{challenge_id}",
+    "health": "/health",
+}
+
+
+def sample_ids(db, limit=10_000):
+    engine = create_engine(db)
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"SELECT login, user_id, challenge_id FROM accounts LIMIT {int(limit)}")).all()
+    engine.dispose()
+    if not rows:
+        raise RuntimeError(f"No accounts in {db}, build a fixture with benchmarks.generate --db")
+    return rows
+
+
+def start_server(db, port, cache):
+    workdir = tempfile.mkdtemp(prefix="risk-bench-")
+    env = {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URL": db,
+        "LOG_DIR": os.path.join(workdir, "logs"),
+        "PYTHONPATH": REPO_ROOT,
+        "WEBHOOK_URL": "",
+    }
+    if not cache:
+        env["CACHE_MAX_ENTRIES"] = "0"
+    log = open(os.path.join(workdir, "server.log"), "w")
+    print(f"🚀 Starting uvicorn on port {port} (output in {log.name})")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def stop_server(server, timeout=30):
+    server.terminate()
+    try:
+        server.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        # e.g. a scheduled risk run still in progress
+        server.kill()
+        server.wait()
+
+
+def wait_ready(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} not ready after {timeout}s")
+
+
+async def _client(client, ids, endpoints, deadline, samples, errors):
+    while time.monotonic() < deadline:
+        name = random.choice(endpoints)
+        login, user_id, challenge_id = random.choice(ids)
+        path = ENDPOINTS[name].format(login=login, user_id=user_id, challenge_id=challenge_id)
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            # 404s are valid answers (e.g. an account without trades)
+            failed = response.status_code >= 500
+        except httpx.HTTPError:
+            failed = True
+        samples[name].append(time.perf_counter() - started)
+        if failed:
+            errors[name] += 1
+
+
+async def load(url, ids, endpoints, duration, concurrency):
+    samples = {name: [] for name in endpoints}
+    errors = {name: 0 for name in endpoints}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            _client(client, ids, endpoints, deadline, samples, errors) for _ in range(concurrency)
+        ))
+    return samples, errors
+
+
+def summarize(samples, errors, duration):
+    results = {}
+    total = sum(len(latencies) for latencies in samples.values())
+    results["total_rps"] = metric(total / duration, "req/s", True, requests=total)
+
+    for name, latencies in samples.items():
+        if not latencies:
+            continue
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        results[f"{name}_rps"] = metric(len(latencies) / duration, "req/s", True, errors=errors[name])
+        results[f"{name}_p50"] = metric(float(p50), "s", False)
+        results[f"{name}_p95"] = metric(float(p95), "s", False)
+        results[f"{name}_p99"] = metric(float(p99), "s", False)
+    return results
+
+
+def run(db, url, port, endpoints, duration, concurrency, warmup, cache):
+    ids = sample_ids(db)
+    server = None
+    if url is None:
+        url = f"http://127.0.0.1:{port}"
+        server = start_server(db, port, cache)
+    try:
+        wait_ready(url)
+        if warmup:
+            asyncio.run(load(url, ids, endpoints, warmup, concurrency))
+        samples, errors = asyncio.run(load(url, ids, endpoints, duration, concurrency))
+    finally:
+        if server is not None:
+            stop_server(server)
+    return summarize(samples, errors, duration)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP load test for the risk endpoints")
+    parser.add_argument("--db", required=True, help="Fixture database URL, also used to pick ids")
+    parser.add_argument("--url", default=None, help="Target a running server instead of starting uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+    parser.add_argument("--duration", type=float, default=20, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds first")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the server's response cache")
+    parser.add_argument("--output", default=None, help="JSON report path")
+    args = parser.parse_args()
+
+    results = run(
+        args.db, args.url, args.port, args.endpoints, args.duration,
+        args.concurrency, args.warmup, cache=not args.no_cache
+    )
+    print_results(results)
+    write_report(args.output, "http", results, vars(args))
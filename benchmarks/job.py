@@ -0,0 +1,87 @@
+"""
+End-to-end benchmark of the scheduled risk job against a database fixture.
+
+    python -m benchmarks.generate --trades 1000000 --out bench_data --db sqlite:///bench_data/bench.db
+    python -m benchmarks.job --db sqlite:///bench_data/bench.db --workers 4 --output bench_results/job.json
+    python -m benchmarks.job --db sqlite:///bench_data/bench.db --trade-store bench_data/trade_store
+
+Each repetition is a full rebuild planned and worked through job_runner, as the scheduler
+does it, so every account is scored. Run it in a fresh process: settings are read from
+the environment when the app is imported.
+With --trade-store, runs read the memory-mapped trade store; building it is timed
+separately (store_build_seconds) and not part of the job timings.
+"""
+from benchmarks.report import metric, peak_rss_mb, print_results, write_report
+import argparse
+import logging
+import time
+import os
+
+
+def run(db, mode, workers, shard_size, repeat, store_dir=None):
+    if store_dir:
+        os.environ.update({"TRADE_STORE_ENABLED": "true", "TRADE_STORE_DIR": store_dir})
+    os.environ.update({
+        "SQLALCHEMY_DATABASE_URL": db,
+        "RISK_JOB_MODE": mode,
+        "RISK_JOB_WORKERS": str(workers),
+        "RISK_JOB_SHARD_SIZE": str(shard_size),
+        "WEBHOOK_URL": "",
+    })
+    from app.db.database import engine
+    from app.db.indexes import create_indexes
+    from app.models import Base, JobRun, JobShard
+    from app.services import job_runner
+    from sqlalchemy import select, func
+
+    # Job bookkeeping tables; fixtures only hold accounts and trades
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        create_indexes(conn)
+
+    results = {}
+    if store_dir:
+        from app.services import trade_store
+        started = time.perf_counter()
+        trade_store.rebuild()
+        results["store_build_seconds"] = metric(time.perf_counter() - started, "s", False)
+
+    timings, accounts = [], 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        accounts = job_runner.schedule_run(full_rebuild=True, force=True)
+        timings.append(time.perf_counter() - started)
+        if accounts is None:
+            raise RuntimeError("Risk job failed, see the log above")
+        if mode != "per_account":
+            with engine.connect() as conn:
+                run_id, status = conn.execute(select(JobRun.id, JobRun.status).order_by(JobRun.id.desc()).limit(1)).one()
+                failed = conn.scalar(select(func.count()).where(JobShard.run_id == run_id, JobShard.status == "failed"))
+            if status != "done" or failed:
+                raise RuntimeError(f"Risk run {run_id} is {status} with {failed} failed shards, see the log above")
+
+    best = min(timings)
+    return {
+        **results,
+        "job_seconds": metric(best, "s", False, runs=timings),
+        "accounts_per_sec": metric(accounts / best if best else 0.0, "accounts/s", True, accounts=accounts),
+        "peak_rss_mb": metric(peak_rss_mb(), "MB", False),
+        "peak_rss_workers_mb": metric(peak_rss_mb(children=True), "MB", False),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end risk job benchmark")
+    parser.add_argument("--db", required=True, help="Fixture database URL (see benchmarks.generate --db)")
+    parser.add_argument("--mode", choices=("batch", "per_account"), default="batch")
+    parser.add_argument("--workers", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--trade-store", default=None, help="Score from a trade store in this directory")
+    parser.add_argument("--output", default=None, help="JSON report path")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run(args.db, args.mode, args.workers, args.shard_size, args.repeat, args.trade_store)
+    print_results(results)
+    write_report(args.output, "job", results, vars(args))
@@ -0,0 +1,65 @@
+"""
+Microbenchmarks for the metric functions on synthetic trade windows.
+
+    python -m benchmarks.micro --sizes 100 1000 10000 --output bench_results/micro.json
+"""
+from benchmarks.generate import trade_objects, PROFILES
+from benchmarks.report import measure, print_results, write_report
+from app.core.config import settings
+from app.risk_utils import calculations
+from app.risk_utils.columnar import TradeBatch, calculate_metrics_columnar
+from app.risk_utils.rolling import RollingMetrics
+import argparse
+
+
+def _rolling_replay(trades):
+    # Streams the window oldest-first through the ingestion buffer
+    rolling = RollingMetrics(settings.WINDOW_SIZE, settings.HFT_DURATION)
+    for trade in reversed(trades):
+        rolling.add(trade)
+    return rolling.metrics()
+
+
+def benchmarks_for(trades):
+    """
+    Named zero-argument callables over one trade window.
+    """
+    metrics = calculations.calculate_metrics(trades)
+    batch = TradeBatch.from_trades(trades)
+    rows = [(t.profit, t.opened_at, t.closed_at, t.price_sl, t.price_tp) for t in trades]
+    return {
+        "calculate_metrics": lambda: calculations.calculate_metrics(trades),
+        "max_drawdown": lambda: calculations.calculate_max_drawdown(trades),
+        "max_layering": lambda: calculations.calculate_max_layering(trades),
+        "risk_score": lambda: calculations.calculate_risk_score(metrics),
+        "risk_signals": lambda: calculations.generate_risk_signals(metrics),
+        "trade_batch_from_trades": lambda: TradeBatch.from_trades(trades),
+        "trade_batch_from_rows": lambda: TradeBatch.from_rows(rows),
+        "calculate_metrics_columnar": lambda: calculate_metrics_columnar(batch),
+        "rolling_replay": lambda: _rolling_replay(trades),
+    }
+
+
+def run(sizes, profiles, rounds, min_time, seed=42):
+    results = {}
+    for profile in profiles:
+        for size in sizes:
+            trades = trade_objects(size, profile, seed)
+            for name, fn in benchmarks_for(trades).items():
+                results[f"{name}[{profile}-{size}]"] = measure(fn, rounds=rounds, min_time=min_time)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Metric microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000], help="Trades per window")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--rounds", type=int, default=15)
+    parser.add_argument("--min-time", type=float, default=0.01, help="Minimum seconds per round")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="JSON report path")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.profiles, args.rounds, args.min_time, args.seed)
+    print_results(results)
+    write_report(args.output, "micro", results, vars(args))
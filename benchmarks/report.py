@@ -0,0 +1,99 @@
+from datetime import datetime
+import statistics
+import platform
+import resource
+import json
+import time
+import sys
+import os
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+    }
+
+
+def peak_rss_mb(children=False):
+    """
+    Peak resident set size of this process (or of its finished children), in MB.
+    """
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return usage.ru_maxrss / divisor
+
+
+def measure(fn, rounds=20, warmup=2, min_time=0.0):
+    """
+    pytest-benchmark style timing of `fn()`: per-call stats in seconds over `rounds` rounds.
+    Each round repeats the call until it takes at least `min_time` seconds.
+    """
+    for _ in range(warmup):
+        fn()
+
+    iterations = 1
+    if min_time:
+        started = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - started
+        iterations = max(1, int(min_time / elapsed)) if elapsed > 0 else 1000
+
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        samples.append((time.perf_counter() - started) / iterations)
+
+    return {
+        "value": statistics.median(samples),
+        "unit": "s",
+        "higher_is_better": False,
+        "min": min(samples),
+        "max": max(samples),
+        "mean": statistics.fmean(samples),
+        "stddev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "iterations": iterations,
+    }
+
+
+def metric(value, unit, higher_is_better, **extra):
+    """A single measured value in the report format understood by benchmarks.compare"""
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better, **extra}
+
+
+def write_report(path, suite, results, parameters=None):
+    report = {
+        "suite": suite,
+        "environment": environment(),
+        "parameters": parameters or {},
+        "results": results,
+    }
+    if path:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"📝 Report written to {path}")
+    return report
+
+
+def print_results(results):
+    width = max((len(name) for name in results), default=0)
+    for name, result in results.items():
+        value = result["value"]
+        if result["unit"] == "s":
+            if value >= 1:
+                shown = f"{value:.3f} s"
+            elif value >= 1e-3:
+                shown = f"{value * 1e3:.3f} ms"
+            else:
+                shown = f"{value * 1e6:.2f} µs"
+        else:
+            shown = f"{value:,.2f} {result['unit']}"
+        print(f"  {name:<{width}}  {shown}")
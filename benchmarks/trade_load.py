@@ -0,0 +1,106 @@
+"""
+Load time and memory of a trade window as ORM objects vs a TradeBatch.
+
+    python -m benchmarks.generate --trades 1000000 --out bench_data --db sqlite:///bench_data/bench.db
+    python -m benchmarks.trade_load --db sqlite:///bench_data/bench.db --trades 1000000 \
+        --output bench_results/trade_load.json
+
+Each variant loads the newest --trades trades in a fresh spawned process, so
+peak RSS is not inherited from the previous one. "orm" hydrates Trade instances
+(the compute path before TradeBatch), "rows" fetches only the columns the metrics read and
+"batch" packs those tuples into a TradeBatch. Memory is reported per 1M trades:
+`retained` is what stays allocated after the load, `peak` includes transient rows.
+Timing and memory come from two separate loads, as tracemalloc slows allocations.
+"""
+from benchmarks.report import metric, peak_rss_mb, print_results, write_report
+import multiprocessing
+import tracemalloc
+import argparse
+import gc
+import time
+import os
+
+VARIANTS = ("orm", "rows", "batch")
+
+
+def _fetch(variant, limit):
+    from app.db.database import SessionLocal
+    from app.models import Trade
+    from app.risk_utils.columnar import TradeBatch, batch_columns, newest_first
+    from sqlalchemy import select
+
+    if variant == "orm":
+        query = select(Trade)
+    else:
+        query = select(*batch_columns(Trade))
+    query = query.order_by(*newest_first(Trade)).limit(limit)
+
+    # The session stays open while the result is held, like in the compute path
+    db = SessionLocal()
+    if variant == "orm":
+        return db, db.execute(query).scalars().all()
+    if variant == "rows":
+        return db, db.execute(query).all()
+    return db, TradeBatch.from_rows(db.execute(query).all())
+
+
+def _load(variant, limit):
+    started = time.perf_counter()
+    db, loaded = _fetch(variant, limit)
+    seconds = time.perf_counter() - started
+    trades = len(loaded)
+    db.close()
+    del db, loaded
+    gc.collect()
+
+    tracemalloc.start()
+    db, loaded = _fetch(variant, limit)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.close()
+    return {
+        "trades": trades,
+        "seconds": seconds,
+        "retained_mb": retained / 2 ** 20,
+        "peak_mb": peak / 2 ** 20,
+        "rss_mb": peak_rss_mb(),
+    }
+
+
+def _child(db, variant, limit, queue):
+    os.environ["SQLALCHEMY_DATABASE_URL"] = db
+    import app.models  # Binds the engine; imports are not part of the measurement
+    queue.put(_load(variant, limit))
+
+
+def run(db, variants, limit):
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for variant in variants:
+        queue = context.Queue()
+        process = context.Process(target=_child, args=(db, variant, limit, queue))
+        process.start()
+        loaded = queue.get()
+        process.join()
+
+        per_million = 1_000_000 / loaded["trades"] if loaded["trades"] else 0
+        results[f"{variant}_load_seconds_per_1m"] = metric(
+            loaded["seconds"] * per_million, "s", False, trades=loaded["trades"]
+        )
+        results[f"{variant}_retained_mb_per_1m"] = metric(loaded["retained_mb"] * per_million, "MB", False)
+        results[f"{variant}_peak_mb_per_1m"] = metric(loaded["peak_mb"] * per_million, "MB", False)
+        results[f"{variant}_peak_rss_mb"] = metric(loaded["rss_mb"], "MB", False)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trade loading benchmark: ORM objects vs TradeBatch")
+    parser.add_argument("--db", required=True, help="Fixture database URL (see benchmarks.generate --db)")
+    parser.add_argument("--trades", type=int, default=1_000_000, help="Newest trades to load")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument("--output", default=None, help="JSON report path")
+    args = parser.parse_args()
+
+    results = run(args.db, args.variants, args.trades)
+    print_results(results)
+    write_report(args.output, "trade_load", results, vars(args))
@@ -1,7 +1,13 @@
-from app.models import Base
+from app.models import Base, Account, Trade
 from dotenv import load_dotenv
 from app.db.database import engine
+from app.db.indexes import create_indexes
+from app.core.config import settings
+from app.services import trade_store
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy import insert, text
 import pandas as pd
+import argparse
 import os
 
 load_dotenv(".env")
@@ -9,7 +15,41 @@ load_dotenv(".env")
 ACCOUNTS_CSV = os.getenv("ACCOUNTS_CSV_PATH")
 TRADES_CSV = os.getenv("TRADES_CSV_PATH")
 
-REPLACE_TABLES = True  # set to False if you want to only append
+CHUNK_SIZE = 50_000
+
+# replace: drop and recreate tables; append: skip rows whose key exists; upsert: overwrite them
+LOAD_MODES = ("replace", "append", "upsert")
+
+ACCOUNT_DTYPES = {
+    "login": "int64",
+    "account_size": "float64",
+    "platform": "Int64",
+    "phase": "Int64",
+    "user_id": "Int64",
+    "challenge_id": "Int64",
+}
+
+TRADE_DTYPES = {
+    "identifier": "string",
+    "action": "Int64",
+    "reason": "Int64",
+    "open_price": "float64",
+    "close_price": "float64",
+    "commission": "float64",
+    "lot_size": "float64",
+    "pips": "float64",
+    "price_sl": "float64",
+    "price_tp": "float64",
+    "profit": "float64",
+    "swap": "float64",
+    "symbol": "string",
+    "contract_size": "float64",
+    "profit_rate": "float64",
+    "platform": "Int64",
+    "trading_account_login": "int64",
+}
+
+TRADE_DATES = ["opened_at", "closed_at"]
 
 
 def validate_columns(df, required_cols, name):
@@ -18,55 +58,121 @@ def validate_columns(df, required_cols, name):
         raise ValueError(f"{name} CSV missing columns: {missing}")
 
 
-def load_data():
-    # Recreate tables cleanly if needed
-    if REPLACE_TABLES:
-        Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+def read_chunks(path, dtypes, parse_dates=(), chunk_size=CHUNK_SIZE):
+    """
+    Streams a CSV or Parquet file in DataFrame chunks with explicit dtypes.
+    """
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq  # Optional dependency, only needed for Parquet input
+        chunks = (
+            batch.to_pandas() for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size)
+        )
+    else:
+        chunks = pd.read_csv(path, chunksize=chunk_size, dtype=dtypes)
+
+    for df in chunks:
+        df = df.astype({col: dtype for col, dtype in dtypes.items() if col in df.columns})
+        for col in parse_dates:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors="coerce")
+        yield df
+
+
+def insert_statement(table, key, mode):
+    """
+    INSERT with a dialect-native conflict clause on `key`: the first row wins for
+    replace/append (like drop_duplicates), the last one for upsert.
+    """
+    dialects = {"sqlite": sqlite, "postgresql": postgresql}
+    dialect = dialects.get(engine.dialect.name)
+    if dialect is None:
+        if mode != "replace":
+            raise ValueError(f"{mode} is not supported for {engine.dialect.name}, use --mode replace")
+        return insert(table)
+
+    stmt = dialect.insert(table)
+    if mode in ("replace", "append"):
+        return stmt.on_conflict_do_nothing(index_elements=[key])
+    return stmt.on_conflict_do_update(
+        index_elements=[key],
+        set_={col.name: stmt.excluded[col.name] for col in table.columns if col.name != key}
+    )
+
+
+def to_records(df):
+    # NaN/NaT -> None so the driver writes NULL
+    return df.astype(object).where(df.notna(), None).to_dict("records")
+
+
+def load_table(path, model, key, dtypes, required_cols, name, mode, parse_dates=(), chunk_size=CHUNK_SIZE):
+    if not path or not os.path.exists(path):
+        raise FileNotFoundError(f"{name} CSV path not found: {path}")
+
+    table = model.__table__
+    # updated_at is the load's own change marker (the column default), never read from the file
+    columns = [col.name for col in table.columns if col.name != "updated_at"]
+    stmt = insert_statement(table, key, mode)
+    total = 0
 
-    # Load accounts
-    if not ACCOUNTS_CSV or not os.path.exists(ACCOUNTS_CSV):
-        raise FileNotFoundError(f"Accounts CSV path not found: {ACCOUNTS_CSV}")
-    accounts_df = pd.read_csv(ACCOUNTS_CSV)
+    for chunk in read_chunks(path, dtypes, parse_dates, chunk_size):
+        validate_columns(chunk, required_cols, name)
 
-    validate_columns(accounts_df, ["login", "account_size", "platform", "phase", "user_id", "challenge_id"], "Accounts")
+        # Keep only mapped columns (drops e.g. "Unnamed: 0")
+        chunk = chunk[[col for col in columns if col in chunk.columns]]
+        chunk = chunk.dropna(subset=[key]).drop_duplicates(subset=key)
 
-    accounts_df.drop_duplicates(subset="login", inplace=True)
+        with engine.begin() as conn:
+            conn.execute(stmt, to_records(chunk))
 
-    accounts_df.to_sql("accounts", engine, if_exists="replace" if REPLACE_TABLES else "append", index=False)
-    print(f"✅ Loaded {len(accounts_df)} accounts")
+        total += len(chunk)
+        print(f"   … {name}: {total} rows")
 
-    # Load trades
-    if not TRADES_CSV or not os.path.exists(TRADES_CSV):
-        raise FileNotFoundError(f"Trades CSV path not found: {TRADES_CSV}")
-    trades_df = pd.read_csv(TRADES_CSV)
+    print(f"✅ Loaded {total} {name.lower()}")
+    return total
 
-    # Clean up trades
-    if "Unnamed: 0" in trades_df.columns:
-        trades_df.drop(columns=["Unnamed: 0"], inplace=True)
-    trades_df.drop_duplicates(subset="identifier", inplace=True)
 
-    validate_columns(
-        trades_df,
+def load_data(mode="upsert", chunk_size=CHUNK_SIZE):
+    if mode == "replace":
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            conn.execute(text("PRAGMA journal_mode=WAL;"))
+
+    load_table(
+        ACCOUNTS_CSV, Account, "login", ACCOUNT_DTYPES,
+        ["login", "account_size", "platform", "phase", "user_id", "challenge_id"],
+        "Accounts", mode, chunk_size=chunk_size
+    )
+
+    load_table(
+        TRADES_CSV, Trade, "identifier", TRADE_DTYPES,
         [
             "identifier", "trading_account_login", "opened_at", "closed_at",
             "action", "open_price", "close_price", "lot_size", "profit", "symbol"
         ],
-        "Trades"
+        "Trades", mode, parse_dates=TRADE_DATES, chunk_size=chunk_size
     )
-    
-    # Dates
-    for col in ["opened_at", "closed_at"]:
-        trades_df[col] = pd.to_datetime(trades_df[col], errors="coerce")
 
-    # Types
-    trades_df["identifier"] = trades_df["identifier"].astype(str)
-    trades_df["trading_account_login"] = trades_df["trading_account_login"].astype(str)
+    # After a replace the tables are new, so building the secondary indexes last saves maintaining
+    # them row by row; append and upsert load into tables that already have them and this only
+    # adds missing ones (and runs pending index migrations)
+    with engine.begin() as conn:
+        create_indexes(conn)
+    print("✅ Indexes created")
 
-    trades_df.to_sql("trades", engine, if_exists="replace" if REPLACE_TABLES else "append", index=False)
-    print(f"✅ Loaded {len(trades_df)} trades")
+    if settings.TRADE_STORE_ENABLED:
+        manifest = trade_store.rebuild()
+        print(f"✅ Trade store rebuilt with {manifest['rows']} trades")
 
 
 if __name__ == "__main__":
-    load_data()
+    parser = argparse.ArgumentParser(description="Load accounts and trades (CSV or Parquet) into the database")
+    parser.add_argument("--mode", choices=LOAD_MODES, default="upsert",
+                        help="replace: recreate tables; append: skip existing keys; upsert: overwrite existing keys")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per insert batch")
+    args = parser.parse_args()
+
+    load_data(mode=args.mode, chunk_size=args.chunk_size)
     print("🚀 Initial data loaded successfully")
@@ -0,0 +1,69 @@
+import os
+import tempfile
+
+# The app reads its database URL at import time
+os.environ.setdefault("SQLALCHEMY_DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.db.database import engine, async_engine
+from app.models import Base
+
+# Tests marked "postgres" run against this server and are skipped without it
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "postgres: needs a Postgres server at TEST_POSTGRES_URL")
+
+
+def _postgres_available():
+    if not POSTGRES_URL:
+        return False
+    try:
+        with create_engine(POSTGRES_URL).connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return True
+    except Exception:
+        return False
+
+
+def pytest_collection_modifyitems(config, items):
+    marked = [item for item in items if "postgres" in item.keywords]
+    if marked and not _postgres_available():
+        skip = pytest.mark.skip(reason="Postgres not available (set TEST_POSTGRES_URL)")
+        for item in marked:
+            item.add_marker(skip)
+
+
+@pytest.fixture
+def tables():
+    """Fresh tables for one test"""
+    Base.metadata.create_all(bind=engine)
+    yield
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def risk_client(tables):
+    """TestClient for the risk report routes"""
+    from app.api.endpoints import risk
+
+    app = FastAPI()
+    app.include_router(risk.router)
+    with TestClient(app) as client:
+        yield client
+        # Pooled aiosqlite connections belong to this client's event loop
+        client.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def postgres_engine():
+    """Fresh tables on the TEST_POSTGRES_URL server for one test"""
+    pg_engine = create_engine(POSTGRES_URL)
+    Base.metadata.create_all(bind=pg_engine)
+    yield pg_engine
+    Base.metadata.drop_all(bind=pg_engine)
+    pg_engine.dispose()
@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import AlertState, WebhookOutbox
+from app.services.alerts import select_alerts, should_alert
+
+NOW = datetime(2024, 3, 1, 12)
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    monkeypatch.setattr(settings, "ALERT_DEDUP_ENABLED", True)
+    monkeypatch.setattr(settings, "RISK_THRESHOLD", 70.0)
+    monkeypatch.setattr(settings, "ALERT_HYSTERESIS", 5.0)
+    monkeypatch.setattr(settings, "ALERT_COOLDOWN_MINUTES", 60)
+
+
+def state(alerting=True, signals="high_drawdown", sent_minutes_ago=5):
+    return SimpleNamespace(alerting=alerting, risk_signals=signals, last_sent_at=NOW - timedelta(minutes=sent_minutes_ago))
+
+
+def test_first_crossing_alerts():
+    assert should_alert(None, 71.0, ["high_drawdown"], NOW) == (True, True)
+    assert should_alert(None, 70.0, ["high_drawdown"], NOW) == (False, False)
+
+
+def test_repeats_are_suppressed_while_alerting():
+    assert should_alert(state(), 90.0, ["high_drawdown"], NOW) == (False, True)
+    # Dipping below the threshold but inside the hysteresis band does not re-arm
+    assert should_alert(state(), 66.0, ["high_drawdown"], NOW) == (False, True)
+
+
+def test_recrossing_after_dropping_below_the_hysteresis_band():
+    assert should_alert(state(), 64.9, ["high_drawdown"], NOW) == (False, False)
+
+    # Re-armed: the next crossing fires once the cooldown has passed
+    rearmed = state(alerting=False, sent_minutes_ago=61)
+    assert should_alert(rearmed, 75.0, ["high_drawdown"], NOW) == (True, True)
+
+
+def test_crossings_inside_the_cooldown_wait_for_it():
+    rearmed = state(alerting=False, sent_minutes_ago=30)
+    assert should_alert(rearmed, 75.0, ["high_drawdown"], NOW) == (False, False)
+    # Still pending after the cooldown, so the crossing is not lost
+    assert should_alert(rearmed, 75.0, ["high_drawdown"], NOW + timedelta(minutes=30)) == (True, True)
+
+
+def test_new_signal_alerts_again_after_the_cooldown():
+    signals = ["high_drawdown", "hft_signal"]
+    assert should_alert(state(sent_minutes_ago=30), 80.0, signals, NOW) == (False, True)
+    assert should_alert(state(sent_minutes_ago=60), 80.0, signals, NOW) == (True, True)
+    # Same signals in another order are no change
+    assert should_alert(state(signals="hft_signal,high_drawdown", sent_minutes_ago=60), 80.0, signals[::-1], NOW) == (False, True)
+
+
+def test_alert_state_is_kept_between_runs(tables, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_URL", "http://127.0.0.1:9/hook")
+
+    def run(score, signals):
+        with SessionLocal() as db:
+            staged = select_alerts(db, [(1, score, signals, NOW)])
+            db.commit()
+        return len(staged)
+
+    assert run(80.0, ["high_drawdown"]) == 1
+    assert run(85.0, ["high_drawdown"]) == 0
+    assert run(85.0, ["high_drawdown", "hft_signal"]) == 0  # Inside the cooldown
+
+    # An hour later the changed signals go out
+    with SessionLocal() as db:
+        sent_at = db.scalar(select(AlertState.last_sent_at))
+        db.execute(update(AlertState).values(last_sent_at=sent_at - timedelta(minutes=60)))
+        db.commit()
+    assert run(85.0, ["high_drawdown", "hft_signal"]) == 1
+
+    with SessionLocal() as db:
+        assert db.scalar(select(AlertState.risk_signals)) == "hft_signal,high_drawdown"
+        assert len(db.execute(select(WebhookOutbox.id)).all()) == 2
+
+
+def test_alerts_wait_for_a_webhook_url(tables, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_URL", None)
+
+    def run():
+        with SessionLocal() as db:
+            staged = select_alerts(db, [(1, 80.0, ["high_drawdown"], NOW)])
+            db.commit()
+        return len(staged)
+
+    assert run() == 0
+    with SessionLocal() as db:
+        assert db.execute(select(AlertState.alerting, AlertState.last_sent_at)).one() == (False, None)
+
+    monkeypatch.setattr(settings, "WEBHOOK_URL", "http://127.0.0.1:9/hook")
+    assert run() == 1
@@ -0,0 +1,121 @@
+from fnmatch import fnmatchcase
+
+import pytest
+
+from app.services import cache
+from app.services.cache import MemoryBackend, RedisBackend, RiskCache, account_key, user_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """The part of the redis-py client RedisBackend uses: bytes values, `ex` expiry, glob scans"""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.values = {}
+
+    def _live(self, key):
+        value, expires_at = self.values.get(key, (None, None))
+        if expires_at is not None and expires_at <= self.clock():
+            del self.values[key]
+            return None
+        return value
+
+    def get(self, key):
+        return self._live(key)
+
+    def set(self, key, value, ex=None):
+        assert isinstance(value, bytes)
+        self.values[key] = (value, None if ex is None else self.clock() + ex)
+        return True
+
+    def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+    def scan_iter(self, match="*"):
+        return iter([key for key in list(self.values) if self._live(key) is not None and fnmatchcase(key, match)])
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, clock):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=3, ttl_seconds=60)
+    return RedisBackend(FakeRedis(clock), ttl_seconds=60)
+
+
+def test_entries_expire_after_the_ttl(backend, clock):
+    backend.set(account_key(1), {"risk_score": 42.0})
+    clock.now += 59
+    assert backend.get(account_key(1)) == {"risk_score": 42.0}
+
+    clock.now += 1
+    assert backend.get(account_key(1)) is None
+    assert backend.size() == 0
+
+
+def test_invalidation_drops_only_the_given_keys(backend):
+    for key in (account_key(1), account_key(1, 60), user_key(1)):
+        backend.set(key, key)
+
+    backend.delete(account_key(1), account_key(1, 60), account_key(2))
+    assert [backend.get(key) for key in (account_key(1), account_key(1, 60), user_key(1))] == [None, None, user_key(1)]
+
+    backend.delete()
+    backend.clear()
+    assert backend.size() == 0
+
+
+def test_memory_backend_evicts_the_least_recently_used(clock):
+    backend = MemoryBackend(max_entries=2, ttl_seconds=60)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")  # "b" is now the least recently used
+    backend.set("c", 3)
+
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+
+
+def test_redis_backend_leaves_other_keys_alone(clock):
+    client = FakeRedis(clock)
+    client.set("sessions:1", b"x")
+    backend = RedisBackend(client, ttl_seconds=60)
+    backend.set(user_key(1), 1)
+
+    assert list(client.values) == ["sessions:1", "risk-cache:user:1"]
+    backend.clear()
+    assert list(client.values) == ["sessions:1"]
+
+
+def test_risk_cache_counts_hits_and_treats_failures_as_misses(clock):
+    class Down:
+        def __getattr__(self, name):
+            def fail(*args):
+                raise ConnectionError("redis is down")
+            return fail
+
+    risk_cache = RiskCache(MemoryBackend(max_entries=3, ttl_seconds=60))
+    risk_cache.set(user_key(1), {"risk_score": 1.0})
+    assert risk_cache.get(user_key(1)) == {"risk_score": 1.0}
+    assert risk_cache.get(user_key(2)) is None
+    assert risk_cache.stats() == {"backend": "MemoryBackend", "hits": 1, "misses": 1, "size": 1}
+
+    failing = RiskCache(Down())
+    failing.set(user_key(1), 1)
+    failing.invalidate(user_key(1))
+    failing.clear()
+    assert failing.get(user_key(1)) is None
+    assert failing.stats() == {"backend": "Down", "hits": 0, "misses": 1, "size": None}
@@ -0,0 +1,52 @@
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.risk_utils import calculations
+from app.risk_utils.columnar import TradeBatch
+
+START = datetime(2024, 3, 1, 10)
+
+
+def random_trades(rng, n):
+    # Few distinct instants, so open and close times tie within and across trades
+    instants = [START + timedelta(seconds=30 * i) for i in range(6)]
+    trades = []
+    for i in range(n):
+        opened_at = rng.choice(instants)
+        trades.append(SimpleNamespace(
+            identifier=f"T{rng.randrange(10_000):05d}-{i}",
+            profit=rng.choice([-250.5, -100.0, -0.1, 0.0, 0.2, 75.25, 300.0]),
+            opened_at=opened_at,
+            closed_at=opened_at + timedelta(seconds=30 * rng.randrange(3)),
+            price_sl=rng.choice([None, 1.05]),
+            price_tp=rng.choice([None, 1.25]),
+        ))
+    return trades
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_object_and_columnar_paths_return_the_same_dict(seed):
+    rng = random.Random(seed)
+    trades = random_trades(rng, rng.randrange(1, 40))
+    expected = calculations.calculate_metrics(trades)
+
+    for _ in range(3):
+        rng.shuffle(trades)
+        assert calculations.calculate_metrics(trades) == expected
+        assert calculations.calculate_metrics(TradeBatch.from_trades(trades)) == expected
+
+
+def test_ties_are_replayed_in_identifier_order():
+    closed = START + timedelta(minutes=5)
+    loss, gain = (
+        SimpleNamespace(identifier=identifier, profit=profit, opened_at=START, closed_at=closed, price_sl=None, price_tp=None)
+        for identifier, profit in (("A", -1000.0), ("B", 2000.0))
+    )
+
+    # The loss replays first from the initial balance, whatever the input order
+    for trades in ([loss, gain], [gain, loss]):
+        assert calculations.calculate_max_drawdown(trades) == pytest.approx(1000.0 / calculations.settings.INITIAL_BALANCE)
+        assert calculations.calculate_metrics(TradeBatch.from_trades(trades))["max_drawdown"] == calculations.calculate_max_drawdown(trades)
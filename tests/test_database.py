@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.core.config import settings
+from app.db.database import apply_sqlite_pragmas, async_database_url, connect_args, pool_options
+
+
+@pytest.mark.parametrize("url", ["sqlite://", "sqlite:///:memory:"])
+def test_in_memory_sqlite_keeps_the_default_pool(url):
+    assert pool_options(make_url(url)) == {}
+    assert pool_options(make_url(url), asynchronous=True) == {}
+
+
+def test_pool_is_sized_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 4)
+    monkeypatch.setattr(settings, "DB_POOL_RECYCLE", 60)
+    sized = {"pool_size": 3, "max_overflow": 4, "pool_recycle": 60, "pool_pre_ping": True}
+
+    assert pool_options(make_url("postgresql://risk@db/risk")) == sized
+    assert pool_options(make_url("postgresql://risk@db/risk"), asynchronous=True) == sized
+    assert pool_options(make_url("sqlite:///risk.db")) == sized
+    # aiosqlite would otherwise open a connection per request
+    assert pool_options(make_url("sqlite:///risk.db"), asynchronous=True) == {**sized, "poolclass": AsyncAdaptedQueuePool}
+
+
+def test_sqlite_connections_are_shared_across_threads():
+    assert connect_args(make_url("sqlite:///risk.db")) == {"check_same_thread": False}
+    assert connect_args(make_url("postgresql://risk@db/risk")) == {}
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("sqlite:///risk.db", "sqlite+aiosqlite:///risk.db"),
+    ("postgresql://risk@db/risk", "postgresql+asyncpg://risk@db/risk"),
+    ("postgresql+psycopg2://risk@db/risk", "postgresql+asyncpg://risk@db/risk"),
+    ("mysql://risk@db/risk", "mysql://risk@db/risk"),
+])
+def test_async_url_swaps_in_the_async_driver(url, expected):
+    assert async_database_url(make_url(url)).render_as_string(hide_password=False) == expected
+
+
+def test_sqlite_pragmas_follow_settings(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "SQLITE_SYNCHRONOUS", "OFF")
+    monkeypatch.setattr(settings, "SQLITE_MMAP_SIZE", 1048576)
+    monkeypatch.setattr(settings, "SQLITE_CACHE_SIZE", -2048)
+    monkeypatch.setattr(settings, "SQLITE_TEMP_STORE", "MEMORY")
+
+    connection = sqlite3.connect(tmp_path / "pragmas.db")
+    try:
+        apply_sqlite_pragmas(connection)
+        pragmas = {name: connection.execute(f"PRAGMA {name}").fetchone()[0]
+                   for name in ("synchronous", "mmap_size", "cache_size", "temp_store")}
+    finally:
+        connection.close()
+
+    # synchronous OFF = 0, temp_store MEMORY = 2
+    assert pragmas == {"synchronous": 0, "mmap_size": 1048576, "cache_size": -2048, "temp_store": 2}
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import Account, RiskMetric
+from app.services import report_export
+
+NOW = datetime(2024, 3, 1, 12)
+LOGINS = list(range(1, 8))
+
+
+@pytest.fixture(autouse=True)
+def metrics(tables, monkeypatch):
+    # Pages and IN (…) chunks smaller than the data, so both are crossed
+    monkeypatch.setattr(settings, "RISK_EXPORT_PAGE_SIZE", 3)
+    monkeypatch.setattr(settings, "RISK_REPORT_BATCH_CHUNK", 2)
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": login} for login in LOGINS])
+        db.execute(insert(RiskMetric), [
+            {
+                "account_login": login, "timestamp": NOW, "win_ratio": 0.5, "profit_factor": float("inf") if login == 1 else 1.5,
+                "max_drawdown": 0.1, "stop_loss_used": 1.0, "take_profit_used": 0.0, "hft_count": 0, "max_layering": 1,
+                "risk_score": 10.0 * login, "risk_signals": "high_drawdown,hft_signal" if login % 2 else "", "last_trade_at": NOW,
+            }
+            for login in LOGINS
+        ])
+        db.commit()
+
+
+def test_batch_reports_in_request_order_with_not_found(risk_client):
+    response = risk_client.post("/risk-report/batch", json={"account_logins": [5, 42, 2, 5, 7]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [report["trading_account_login"] for report in body["reports"]] == [5, 2, 7]
+    assert body["reports"][0] == {
+        "trading_account_login": 5, "risk_signals": ["high_drawdown", "hft_signal"], "risk_score": 50.0,
+        "last_trade_at": NOW.isoformat(),
+    }
+    assert body["reports"][1]["risk_signals"] == []
+    assert body["not_found"] == [42]
+
+
+def test_batch_size_is_limited(risk_client, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_REPORT_BATCH_MAX", 3)
+
+    # Duplicates count once
+    assert risk_client.post("/risk-report/batch", json={"account_logins": [1, 2, 3, 3]}).status_code == 200
+    assert risk_client.post("/risk-report/batch", json={"account_logins": [1, 2, 3, 4]}).status_code == 422
+
+
+def test_csv_export(risk_client):
+    response = risk_client.get("/risk-reports/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.headers["content-disposition"] == 'attachment; filename="risk_reports.csv"'
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert tuple(rows[0]) == report_export.EXPORT_COLUMNS
+    assert [int(row[0]) for row in rows[1:]] == LOGINS
+
+
+def test_ndjson_export_streams_one_record_per_line(risk_client):
+    response = risk_client.get("/risk-reports/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["account_login"] for record in records] == LOGINS
+    assert records[0]["profit_factor"] is None  # Infinity has no JSON form
+    assert records[0]["risk_signals"] == ["high_drawdown", "hft_signal"]
+    assert records[0]["timestamp"] == NOW.isoformat()
+
+
+def test_export_yields_one_chunk_per_page(risk_client):
+    async def chunks(export_format):
+        return [chunk async for chunk in report_export.export(export_format, settings.RISK_EXPORT_PAGE_SIZE)]
+
+    # 7 rows in pages of 3; CSV leads with its header
+    ndjson = risk_client.portal.call(chunks, "ndjson")
+    assert [len(chunk.splitlines()) for chunk in ndjson] == [3, 3, 1]
+    assert [len(chunk.splitlines()) for chunk in risk_client.portal.call(chunks, "csv")] == [1, 3, 3, 1]
+
+
+def test_unknown_export_format(risk_client):
+    assert risk_client.get("/risk-reports/export", params={"format": "xml"}).status_code == 422
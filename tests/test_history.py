@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import Account, RiskMetricHistory
+from app.services.history import append_history, compact_history
+from app.services.metrics import build_metric_row
+
+NOW = datetime(2024, 3, 10, 12, 30)
+
+# With 2 raw hours, 2 hourly days and 5 retained days: raw from 10:00 today, hourly from
+# 2024-03-08 00:00, daily from 2024-03-05, older snapshots deleted
+SNAPSHOTS = {
+    datetime(2024, 3, 10, 10, 40): "raw",
+    datetime(2024, 3, 10, 10, 0): "raw",
+    datetime(2024, 3, 10, 9, 50): "hourly",
+    datetime(2024, 3, 10, 9, 10): None,       # Same hour as 9:50
+    datetime(2024, 3, 8, 6, 0): "hourly",
+    datetime(2024, 3, 8, 5, 0): "hourly",
+    datetime(2024, 3, 7, 20, 0): "daily",
+    datetime(2024, 3, 7, 10, 0): None,        # Same day as 20:00
+    datetime(2024, 3, 5, 23, 0): "daily",
+    datetime(2024, 3, 4, 23, 59): None,       # Past retention
+}
+
+METRICS = {
+    "win_ratio": 0.5, "profit_factor": 1.2, "max_drawdown": 0.1, "stop_loss_used": 1.0,
+    "take_profit_used": 1.0, "hft_count": 0, "max_layering": 1, "last_trade_at": None,
+}
+
+
+@pytest.fixture(autouse=True)
+def history(tables, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_HISTORY_ENABLED", True)
+    monkeypatch.setattr(settings, "RISK_HISTORY_RAW_HOURS", 2)
+    monkeypatch.setattr(settings, "RISK_HISTORY_HOURLY_DAYS", 2)
+    monkeypatch.setattr(settings, "RISK_HISTORY_RETENTION_DAYS", 5)
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": 1}, {"login": 2}])
+        # Snapshots are appended in time order, like the scheduled runs write them
+        for score, timestamp in enumerate(sorted(SNAPSHOTS)):
+            append_history(db, [build_metric_row(1, METRICS, float(score), ["high_drawdown"], timestamp)])
+        db.commit()
+
+
+def stored():
+    with SessionLocal() as db:
+        return dict(db.execute(select(RiskMetricHistory.timestamp, RiskMetricHistory.resolution)).all())
+
+
+def test_compaction_downsamples_at_the_retention_boundaries():
+    assert compact_history(NOW) == (1, 1, 1)
+    assert stored() == {timestamp: resolution for timestamp, resolution in SNAPSHOTS.items() if resolution}
+
+    # Already compacted
+    assert compact_history(NOW) == (0, 0, 0)
+
+
+def test_history_by_resolution(risk_client):
+    def points(resolution):
+        response = risk_client.get("/risk-report/1/history", params={"resolution": resolution})
+        assert response.status_code == 200
+        return [point["timestamp"] for point in response.json()["points"]]
+
+    assert len(points("raw")) == len(SNAPSHOTS)
+    assert points("hourly") == [
+        "2024-03-04T23:59:00", "2024-03-05T23:00:00", "2024-03-07T10:00:00", "2024-03-07T20:00:00",
+        "2024-03-08T05:00:00", "2024-03-08T06:00:00", "2024-03-10T09:50:00", "2024-03-10T10:40:00",
+    ]
+    assert points("daily") == [
+        "2024-03-04T23:59:00", "2024-03-05T23:00:00", "2024-03-07T20:00:00",
+        "2024-03-08T06:00:00", "2024-03-10T10:40:00",
+    ]
+
+    ranged = risk_client.get("/risk-report/1/history", params={"from": "2024-03-10T00:00:00", "to": "2024-03-10T10:00:00"})
+    assert [point["timestamp"] for point in ranged.json()["points"]] == [
+        "2024-03-10T09:10:00", "2024-03-10T09:50:00", "2024-03-10T10:00:00",
+    ]
+
+
+def test_history_errors(risk_client):
+    assert risk_client.get("/risk-report/1/history", params={"resolution": "weekly"}).status_code == 422
+    assert risk_client.get("/risk-report/99/history").status_code == 404
+
+    # A known account without snapshots has an empty history
+    response = risk_client.get("/risk-report/2/history")
+    assert response.status_code == 200
+    assert response.json() == {"trading_account_login": 2, "resolution": "raw", "points": []}
@@ -0,0 +1,40 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.risk_utils import horizons
+from app.risk_utils.columnar import TradeBatch
+
+NEWEST = datetime(2024, 3, 8, 12)
+
+
+@pytest.fixture(autouse=True)
+def caps(monkeypatch):
+    monkeypatch.setattr(settings, "WINDOW_SIZE", 3)
+    monkeypatch.setattr(settings, "RISK_HORIZON_MAX_TRADES", 5)
+
+
+def newest_first(count, spacing=timedelta(minutes=10)):
+    closed = [NEWEST - i * spacing for i in range(count)]
+    return TradeBatch.from_rows([(1.0, at - timedelta(minutes=1), at, None, None) for at in closed])
+
+
+def test_fetch_reads_one_trade_past_the_cap():
+    assert horizons.fetch_size([60]) == 6
+    assert horizons.fetch_size([]) == 3
+
+
+def test_horizons_that_fit_are_not_truncated():
+    window, windows = horizons.split_windows(newest_first(6), [25, 45])
+
+    assert len(window) == 3
+    assert [(minutes, len(batch), truncated) for minutes, batch, truncated in windows] == [(25, 3, False), (45, 5, False)]
+
+
+def test_horizons_past_the_cap_are_truncated_to_the_newest_trades():
+    window, windows = horizons.split_windows(newest_first(horizons.fetch_size([1440])), [1440])
+
+    [(minutes, batch, truncated)] = windows
+    assert (minutes, len(batch), truncated) == (1440, 5, True)
+    assert batch.closed_at[0] == window.closed_at[0]
@@ -0,0 +1,22 @@
+from sqlalchemy import text
+
+from app.db.database import engine
+from app.db.indexes import HOT_QUERIES, create_indexes, explain_hot_queries, full_scans
+
+
+def test_hot_queries_use_indexes(tables):
+    with engine.begin() as conn:
+        create_indexes(conn)
+        plans = explain_hot_queries(conn)
+
+    assert set(plans) == set(HOT_QUERIES)
+    assert full_scans(plans) == {}
+
+
+def test_a_dropped_index_is_reported(tables):
+    with engine.begin() as conn:
+        create_indexes(conn)
+        conn.execute(text("DROP INDEX idx_accounts_user"))
+        scans = full_scans(explain_hot_queries(conn))
+
+    assert list(scans) == ["accounts_by_user"]
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.db.database import SessionLocal
+from app.models import Account, ChallengeRiskMetric, Trade, UserRiskMetric
+from app.risk_utils import calculations
+from app.schemas.schemas import TradeCreate
+from app.services import ingest
+from app.services.metrics import refresh_stale_aggregates
+
+START = datetime(2024, 3, 1, 10)
+
+
+def make_trade(login, n, profit=100.0, **fields):
+    values = {
+        "identifier": f"{login}-{n}", "action": 0, "reason": 0, "open_price": 1.1, "close_price": 1.2,
+        "commission": 0.0, "lot_size": 1.0, "opened_at": START + timedelta(minutes=n),
+        "closed_at": START + timedelta(minutes=n, seconds=90), "pips": 10.0, "profit": profit,
+        "swap": 0.0, "symbol": "EURUSD", "contract_size": 100000.0, "profit_rate": 1.0,
+        "platform": 1, "trading_account_login": login,
+    }
+    values.update(fields)
+    return TradeCreate(**values)
+
+
+@pytest.fixture(autouse=True)
+def accounts(tables):
+    ingest._states.clear()
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": login, "user_id": 1, "challenge_id": 1} for login in (1, 2)])
+        db.commit()
+    yield
+    ingest._states.clear()
+
+
+def stored_metrics(login):
+    with SessionLocal() as db:
+        trades = db.execute(
+            select(Trade).where(Trade.trading_account_login == login).order_by(Trade.closed_at)
+        ).scalars().all()
+    return calculations.calculate_metrics(trades)
+
+
+def test_windows_are_kept_between_batches(monkeypatch):
+    seeds = []
+    load_state = ingest._load_state
+    monkeypatch.setattr(ingest, "_load_state", lambda db, login: seeds.append(login) or load_state(db, login))
+
+    ingest.ingest_trades([make_trade(1, 0), make_trade(2, 0)])
+    ingest.ingest_trades([make_trade(1, 1, profit=-50.0)])
+    row = ingest.ingest_trades([make_trade(1, 2)])[0]
+
+    assert sorted(seeds) == [1, 2]
+    assert row["win_ratio"] == stored_metrics(1)["win_ratio"] == 2 / 3
+
+
+def test_window_is_reseeded_after_trades_stored_elsewhere():
+    ingest.ingest_trades([make_trade(1, 0)])
+
+    # Another replica (or load_data) stores a trade this process never saw
+    with SessionLocal() as db:
+        db.execute(insert(Trade), [make_trade(1, 1, profit=-50.0).model_dump()])
+        db.commit()
+
+    row = ingest.ingest_trades([make_trade(1, 2)])[0]
+    expected = stored_metrics(1)
+    assert row["win_ratio"] == expected["win_ratio"] == 2 / 3
+    assert row["profit_factor"] == expected["profit_factor"]
+
+
+def test_failures_after_commit_do_not_reach_the_caller(monkeypatch):
+    def fail(*args):
+        raise RuntimeError("webhook hand-off down")
+
+    monkeypatch.setattr(ingest, "send_webhooks", fail)
+    monkeypatch.setattr(ingest.risk_cache, "invalidate", fail)
+
+    rows = ingest.ingest_trades([make_trade(1, 0)])
+    assert rows[0]["account_login"] == 1
+
+    # A retry of the same trade is a genuine duplicate, not a lost trade
+    with pytest.raises(Exception):
+        ingest.ingest_trades([make_trade(1, 0)])
+
+
+def test_offset_aware_trades_join_the_window():
+    ingest.ingest_trades([make_trade(1, 0)])
+    row = ingest.ingest_trades([make_trade(1, 1, profit=-50.0, closed_at="2024-03-01T10:02:30Z")])[0]
+
+    assert row["win_ratio"] == 0.5
+    assert row["last_trade_at"] == datetime(2024, 3, 1, 10, 2, 30)
+
+
+def test_aggregates_follow_ingested_trades():
+    ingest.ingest_trades([make_trade(1, 0), make_trade(2, 0)])
+    assert refresh_stale_aggregates() == 2
+    assert refresh_stale_aggregates() == 0
+
+    ingest.ingest_trades([make_trade(2, 1, profit=-50.0)])
+    assert refresh_stale_aggregates() == 2
+    with SessionLocal() as db:
+        user = db.scalar(select(UserRiskMetric).where(UserRiskMetric.user_id == 1))
+        challenge = db.scalar(select(ChallengeRiskMetric).where(ChallengeRiskMetric.challenge_id == 1))
+    assert user.win_ratio == challenge.win_ratio == 2 / 3
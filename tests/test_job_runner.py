@@ -0,0 +1,240 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+import random
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import insert, select, update
+
+from app.api.endpoints import admin
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import (
+    Account, ChallengeRiskMetric, JobRun, JobShard, RiskMetric, RiskMetricHorizon, SettingOverride, Trade, UserRiskMetric
+)
+from app.services import job_runner, metrics, setting_overrides
+from tests.test_ingest import START, make_trade
+
+
+@pytest.fixture
+def client(tables, monkeypatch):
+    monkeypatch.setenv("TOKEN", "secret")
+    monkeypatch.setattr(settings, "RISK_JOB_MODE", "batch")
+    # Restored after the test, whatever the endpoint sets
+    monkeypatch.setattr(settings, "WINDOW_SIZE", settings.WINDOW_SIZE)
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": login, "user_id": 1, "challenge_id": 1} for login in (1, 2)])
+        db.commit()
+
+    app = FastAPI()
+    app.include_router(admin.router)
+    return TestClient(app)
+
+
+def runs():
+    with SessionLocal() as db:
+        return [(run.status, run.full_rebuild) for run in db.execute(select(JobRun).order_by(JobRun.id)).scalars()]
+
+
+def update_window(client, size):
+    return client.post("/admin/update-config", params={"admin_token": "secret"}, json={"window_size": size}).json()
+
+
+def test_full_rebuild_is_planned_when_no_run_is_active(client):
+    response = update_window(client, settings.WINDOW_SIZE + 1)
+
+    assert response["recompute"] == "full"
+    assert runs() == [("done", True)]
+
+
+def test_changed_settings_are_stored_for_other_replicas(client):
+    update_window(client, settings.WINDOW_SIZE + 1)
+
+    with SessionLocal() as db:
+        assert db.execute(select(SettingOverride.name, SettingOverride.value)).all() == [
+            ("WINDOW_SIZE", str(settings.WINDOW_SIZE))
+        ]
+
+
+def test_settings_changed_on_another_replica_apply_before_claiming(client, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_THRESHOLD", settings.RISK_THRESHOLD)
+    with SessionLocal() as db:
+        db.execute(insert(Trade), [make_trade(1, n, profit=profit).model_dump() for n, profit in enumerate((100.0, 100.0, -50.0))])
+        # Written by the replica that received /admin/update-config, which planned the rebuild
+        setting_overrides.save(db, {"WINDOW_SIZE": 1, "RISK_THRESHOLD": 42.0})
+        job_runner._create_run(db, full_rebuild=True)
+
+    job_runner.work()
+
+    assert (settings.WINDOW_SIZE, settings.RISK_THRESHOLD) == (1, 42.0)
+    with SessionLocal() as db:
+        # Only the newest trade, a loss
+        assert db.scalar(select(RiskMetric.win_ratio).where(RiskMetric.account_login == 1)) == 0.0
+
+
+def test_full_rebuild_waits_for_the_run_in_progress(client):
+    with SessionLocal() as db:
+        active = job_runner._create_run(db, full_rebuild=False)
+
+    # The background task works the active run, whose finalizer plans the rebuild, then works that too
+    response = update_window(client, settings.WINDOW_SIZE + 1)
+
+    assert (response["recompute"], response["run_id"]) == ("full_queued", active)
+    assert runs() == [("done", False), ("done", True)]
+
+
+def test_scoring_processes_are_kept_across_claims_and_runs(client, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_JOB_WORKERS", 2)
+    monkeypatch.setattr(settings, "RISK_JOB_CLAIM_SIZE", 1)
+    with SessionLocal() as db:
+        db.execute(insert(Trade), [make_trade(login, n).model_dump() for login in (1, 2) for n in range(3)])
+        db.commit()
+
+    started = []
+    monkeypatch.setattr(metrics, "ProcessPoolExecutor", lambda **kwargs: started.append(1) or ProcessPoolExecutor(**kwargs))
+    try:
+        # Two claims per run
+        assert job_runner.schedule_run(full_rebuild=True, force=True) == 2
+        assert job_runner.schedule_run(full_rebuild=True, force=True) == 2
+    finally:
+        metrics.shutdown_pool()
+    assert started == [1]
+
+
+def test_shards_are_sized_for_the_workers(monkeypatch):
+    monkeypatch.setattr(settings, "RISK_JOB_SHARD_SIZE", 1000)
+    monkeypatch.setattr(settings, "RISK_JOB_CLAIM_SIZE", 5000)
+
+    assert metrics._shard_size(0) == metrics._shard_size(1) == 1000
+    assert metrics._shard_size(4) == 313   # 16 shards per claim, 4 per worker
+
+
+def scored_rows():
+    """Stored account, horizon and aggregate metrics without ids and scoring times"""
+    def rows(model, *key):
+        columns = [column for column in model.__table__.columns if column.name not in ("id", "timestamp")]
+        with SessionLocal() as db:
+            return [tuple(row) for row in db.execute(select(*columns).order_by(*(getattr(model, k) for k in key)))]
+    return (
+        rows(RiskMetric, "account_login"), rows(RiskMetricHorizon, "account_login", "horizon_minutes"),
+        rows(UserRiskMetric, "user_id"), rows(ChallengeRiskMetric, "challenge_id"),
+    )
+
+
+def test_job_modes_and_workers_store_the_same_metrics(tables, monkeypatch):
+    rng = random.Random(7)
+    trades = []
+    for login in range(1, 13):
+        for n in range(rng.randint(0, 40)):
+            # Whole minutes, so closed_at ties are common; bursts of short trades for HFT and layering
+            opened = START + timedelta(minutes=rng.randint(0, 3000))
+            trades.append(make_trade(
+                login, n, profit=round(rng.uniform(-100, 100), 2), opened_at=opened,
+                closed_at=opened + timedelta(minutes=rng.choice((0, 1, 30, 600))),
+                price_sl=rng.choice((None, 1.0)), price_tp=rng.choice((None, 1.3)),
+            ).model_dump())
+    with SessionLocal() as db:
+        db.execute(insert(Account), [
+            {"login": login, "user_id": login % 3, "challenge_id": login % 4} for login in range(1, 13)
+        ])
+        db.execute(insert(Trade), trades)
+        db.commit()
+
+    monkeypatch.setattr(settings, "RISK_JOB_CLAIM_SIZE", 5)
+    results = {}
+    try:
+        for mode, workers in (("per_account", 0), ("batch", 0), ("batch", 2)):
+            monkeypatch.setattr(settings, "RISK_JOB_MODE", mode)
+            monkeypatch.setattr(settings, "RISK_JOB_WORKERS", workers)
+            with SessionLocal() as db:
+                for model in (RiskMetric, RiskMetricHorizon, UserRiskMetric, ChallengeRiskMetric):
+                    db.query(model).delete()
+                db.commit()
+            assert job_runner.schedule_run(full_rebuild=True, force=True) == 12
+            results[mode, workers] = scored_rows()
+    finally:
+        metrics.shutdown_pool()
+
+    expected = results["per_account", 0]
+    assert all(expected)
+    assert results["batch", 0] == expected
+    assert results["batch", 2] == results["batch", 0]
+
+
+@pytest.fixture
+def planned(tables, monkeypatch):
+    """A run of three one-account shards, with the claim lease at 60s"""
+    monkeypatch.setattr(settings, "RISK_JOB_CLAIM_SIZE", 1)
+    monkeypatch.setattr(settings, "RISK_JOB_LEASE_SECONDS", 60)
+    monkeypatch.setattr(settings, "RISK_JOB_MAX_ATTEMPTS", 2)
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": login} for login in (1, 2, 3)])
+        db.commit()
+        return job_runner._create_run(db, full_rebuild=True)
+
+
+def expire_claims():
+    with SessionLocal() as db:
+        db.execute(update(JobShard).values(claim_expires_at=datetime.now() - timedelta(seconds=1)))
+        db.commit()
+
+
+def claim(run_id, holder, monkeypatch):
+    monkeypatch.setattr(job_runner, "HOLDER", holder)
+    with SessionLocal() as db:
+        shard = job_runner._claim_shard(db, run_id)
+        return None if shard is None else (shard.shard_no, shard.claimed_by, shard.attempts)
+
+
+def test_expired_claims_are_taken_over(planned, monkeypatch):
+    assert claim(planned, "a", monkeypatch) == (0, "a", 1)
+    # Live claims are skipped
+    assert claim(planned, "b", monkeypatch) == (1, "b", 1)
+
+    expire_claims()
+    assert claim(planned, "c", monkeypatch) == (0, "c", 2)
+
+    # The first worker finds out when it renews
+    monkeypatch.setattr(job_runner, "HOLDER", "a")
+    with SessionLocal() as db:
+        shard_id = db.scalar(select(JobShard.id).where(JobShard.shard_no == 0))
+    with pytest.raises(job_runner.ClaimLost):
+        job_runner._renew_claim(shard_id)
+
+
+def test_shards_fail_after_max_attempts(planned, monkeypatch):
+    for holder in ("a", "b"):
+        assert claim(planned, holder, monkeypatch)[0] == 0
+        expire_claims()
+
+    # Shard 0 used up its attempts; the next claim skips it and marks it failed
+    assert claim(planned, "c", monkeypatch) == (1, "c", 1)
+    with SessionLocal() as db:
+        assert db.execute(select(JobShard.status, JobShard.claimed_by).where(JobShard.shard_no == 0)).one() == ("failed", None)
+
+
+def test_concurrent_workers_never_claim_the_same_shard(planned, monkeypatch):
+    barrier = threading.Barrier(4)
+    claimed = []
+
+    def worker():
+        barrier.wait()
+        while True:
+            with SessionLocal() as db:
+                shard = job_runner._claim_shard(db, planned)
+                if shard is None:
+                    return
+                claimed.append(shard.shard_no)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(claimed) == [0, 1, 2]
+    # Claims lost to another worker do not count as attempts
+    with SessionLocal() as db:
+        assert db.scalars(select(JobShard.attempts)).all() == [1, 1, 1]
@@ -0,0 +1,116 @@
+import pandas as pd
+import pytest
+from sqlalchemy import select
+
+import load_data
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import Account, RiskMetric, Trade
+from app.services import job_runner
+
+ACCOUNTS = [
+    {"login": 1, "account_size": 10000.0, "platform": 1, "phase": 1, "user_id": 10, "challenge_id": 100},
+    {"login": 2, "account_size": 25000.0, "platform": 1, "phase": 2, "user_id": 10, "challenge_id": 200},
+]
+
+
+def trade(identifier, login, profit, price_sl=None):
+    return {
+        "identifier": identifier, "trading_account_login": login, "action": 0, "reason": 0,
+        "opened_at": "2024-03-01 10:00:00", "closed_at": "2024-03-01 10:05:00", "open_price": 1.1,
+        "close_price": 1.2, "lot_size": 1.0, "profit": profit, "symbol": "EURUSD", "price_sl": price_sl,
+    }
+
+
+def write(tmp_path, name, rows):
+    path = tmp_path / name
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.fixture
+def load(tables, tmp_path, monkeypatch):
+    """Loads the given trades (and ACCOUNTS) in `mode`, two rows per chunk"""
+    monkeypatch.setattr(load_data, "ACCOUNTS_CSV", write(tmp_path, "accounts.csv", ACCOUNTS))
+
+    def run(mode, trades):
+        monkeypatch.setattr(load_data, "TRADES_CSV", write(tmp_path, f"trades-{mode}.csv", trades))
+        load_data.load_data(mode=mode, chunk_size=2)
+        with SessionLocal() as db:
+            return dict(db.execute(select(Trade.identifier, Trade.profit)).all())
+    return run
+
+
+FIRST = [trade("T1", 1, 10.0), trade("T2", 1, -5.0, price_sl=1.05), trade("T3", 2, 7.5)]
+SECOND = [trade("T2", 1, -50.0), trade("T4", 2, 3.0)]
+
+
+def test_replace_recreates_the_tables(load):
+    # Duplicate keys in the file: the first row wins
+    assert load("replace", FIRST + [trade("T1", 1, 99.0)]) == {"T1": 10.0, "T2": -5.0, "T3": 7.5}
+    assert load("replace", SECOND) == {"T2": -50.0, "T4": 3.0}
+
+    with SessionLocal() as db:
+        stored = db.execute(select(Trade).where(Trade.identifier == "T2")).scalar_one()
+        assert (stored.price_sl, str(stored.closed_at)) == (None, "2024-03-01 10:05:00")
+        assert db.execute(select(Account.login, Account.user_id)).all() == [(1, 10), (2, 10)]
+
+
+def test_append_keeps_existing_rows(load):
+    load("replace", FIRST)
+
+    assert load("append", SECOND) == {"T1": 10.0, "T2": -5.0, "T3": 7.5, "T4": 3.0}
+    assert load("append", SECOND) == {"T1": 10.0, "T2": -5.0, "T3": 7.5, "T4": 3.0}
+
+
+def test_upsert_overwrites_existing_rows(load):
+    load("replace", FIRST)
+
+    assert load("upsert", SECOND) == {"T1": 10.0, "T2": -50.0, "T3": 7.5, "T4": 3.0}
+    # Idempotent
+    assert load("upsert", SECOND) == {"T1": 10.0, "T2": -50.0, "T3": 7.5, "T4": 3.0}
+
+
+def test_backfills_and_upserts_rescore_their_accounts(load, monkeypatch):
+    monkeypatch.setattr(settings, "RISK_JOB_MODE", "batch")
+    monkeypatch.setattr(settings, "RISK_JOB_INCREMENTAL", True)
+    load("replace", FIRST)
+    assert job_runner.schedule_run(force=True) == 2
+    assert job_runner.schedule_run(force=True) == 0
+
+    # Neither change is newer than the accounts' last scored trade
+    backfill = {**trade("T0", 2, -20.0), "opened_at": "2024-02-01 10:00:00", "closed_at": "2024-02-01 10:05:00"}
+    load("append", [backfill])
+    assert job_runner.schedule_run(force=True) == 1
+
+    load("upsert", [trade("T1", 1, -10.0)])
+    assert job_runner.schedule_run(force=True) == 1
+    with SessionLocal() as db:
+        assert db.scalar(select(RiskMetric.win_ratio).where(RiskMetric.account_login == 1)) == 0.0
+
+
+def test_missing_columns_are_rejected(load):
+    with pytest.raises(ValueError, match="missing columns"):
+        load("replace", [{key: value for key, value in trade("T1", 1, 1.0).items() if key != "profit"}])
+
+
+def test_csv_and_parquet_chunks_match(tmp_path):
+    rows = [trade(f"T{i}", 1 + i % 2, float(i)) for i in range(5)]
+    csv_path = write(tmp_path, "trades.csv", rows)
+    parquet_path = str(tmp_path / "trades.parquet")
+    pd.DataFrame(rows).to_parquet(parquet_path, index=False)
+
+    chunks = {
+        path: list(load_data.read_chunks(path, load_data.TRADE_DTYPES, load_data.TRADE_DATES, chunk_size=2))
+        for path in (csv_path, parquet_path)
+    }
+    for path, frames in chunks.items():
+        assert [len(frame) for frame in frames] == [2, 2, 1], path
+        assert str(frames[0]["closed_at"].dtype).startswith("datetime64"), path
+        assert frames[0]["trading_account_login"].dtype == "int64", path
+
+    pd.testing.assert_frame_equal(
+        pd.concat(chunks[csv_path], ignore_index=True)[["identifier", "profit", "closed_at"]],
+        pd.concat(chunks[parquet_path], ignore_index=True)[["identifier", "profit", "closed_at"]],
+        check_dtype=False,
+    )
@@ -0,0 +1,57 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import profiling
+from app.services.telemetry import HTTP_REQUEST_DURATION, TimingMiddleware
+from app.services.profiling import ProfilingMiddleware
+
+
+@pytest.fixture
+def client(monkeypatch, tmp_path):
+    monkeypatch.setenv("TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILE_DIR", str(tmp_path))
+
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((f"{i}\n" for i in range(3)), media_type="text/plain")
+
+    app.add_middleware(TimingMiddleware)
+    app.add_middleware(ProfilingMiddleware)
+    return TestClient(app)
+
+
+def _observed(route, status):
+    return HTTP_REQUEST_DURATION.labels(method="GET", route=route, status=status)._sum.get() > 0
+
+
+def test_requests_are_timed_by_route_template(client):
+    assert client.get("/items/7").json() == {"id": 7}
+    assert client.get("/missing").status_code == 404
+
+    assert _observed("/items/{item_id}", "200")
+    assert _observed("unmatched", "404")
+
+
+def test_responses_pass_through_without_a_profile_token(client):
+    response = client.get("/stream")
+    assert response.text == "0\n1\n2\n"
+    assert "x-profile-id" not in response.headers
+    assert profiling.list_profiles() == []
+
+
+def test_profiled_request_returns_its_profile_id(client):
+    response = client.get("/stream", headers={"X-Profile": "secret"})
+    assert response.text == "0\n1\n2\n"
+
+    profile_id = response.headers["x-profile-id"]
+    assert profiling.load_profile(profile_id)["name"] == "GET /stream"
+    assert client.get("/items/1?profile=wrong").headers.get("x-profile-id") is None
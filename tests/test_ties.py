@@ -0,0 +1,100 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import Account, Trade
+from app.risk_utils import calculations
+from app.risk_utils.columnar import TradeBatch, batch_columns, newest_first
+from app.services import ingest, trade_store
+from app.services.metrics import _iter_shards, _shard_windows, _window_trades_query
+from tests.test_ingest import make_trade
+
+CLOSED = datetime(2024, 3, 1, 12)
+
+# Every trade closes at the same instant, so only the identifier orders them
+PROFITS = [500.0, 400.0, -300.0, 600.0, -100.0, -700.0]
+COMPARED = ("win_ratio", "profit_factor", "max_drawdown", "max_layering")
+
+
+def tied_trades(login):
+    return [
+        make_trade(login, n, profit=profit, opened_at=CLOSED - timedelta(minutes=n), closed_at=CLOSED)
+        for n, profit in enumerate(PROFITS)
+    ]
+
+
+def summary(metrics):
+    return {name: metrics[name] for name in COMPARED}
+
+
+@pytest.fixture(autouse=True)
+def setup(tables, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "WINDOW_SIZE", 4)
+    monkeypatch.setattr(settings, "TRADE_STORE_DIR", str(tmp_path / "store"))
+    ingest._states.clear()
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": login, "user_id": 1, "challenge_id": 1} for login in (1, 2)])
+        db.commit()
+    yield
+    ingest._states.clear()
+
+
+def store_trades(trades):
+    with SessionLocal() as db:
+        db.execute(insert(Trade), [trade.model_dump() for trade in trades])
+        db.commit()
+
+
+def sql_windows(group_column=Trade.trading_account_login):
+    with SessionLocal() as db:
+        result = db.execute(_window_trades_query(settings.WINDOW_SIZE, group_column)).all()
+    return {
+        group_id: summary(calculations.calculate_metrics(batch))
+        for shard in _iter_shards(result, 10) for group_id, batch in _shard_windows(shard)
+    }
+
+
+def store_windows(groups):
+    with SessionLocal() as db:
+        path = trade_store.snapshot(db)
+    return {
+        group_id: summary(calculations.calculate_metrics(batch))
+        for shard in trade_store.iter_shards(path, groups, settings.WINDOW_SIZE, 10)
+        for group_id, batch in trade_store.shard_windows(shard, settings.WINDOW_SIZE)
+    }
+
+
+def test_tied_close_times_cut_the_same_window_everywhere():
+    # Stored out of identifier order, so the table's row order is no tie-break
+    store_trades(tied_trades(1)[::-1])
+
+    with SessionLocal() as db:
+        account = TradeBatch.from_rows(db.execute(
+            select(*batch_columns(Trade)).where(Trade.trading_account_login == 1)
+            .order_by(*newest_first(Trade)).limit(settings.WINDOW_SIZE)
+        ).all())
+    expected = summary(calculations.calculate_metrics(account))
+
+    assert sql_windows() == {1: expected}
+    assert store_windows([(1, [1])]) == {1: expected}
+
+    # The newest identifiers win the tie: 1-2 .. 1-5
+    assert expected["win_ratio"] == 1 / 4
+
+
+def test_ingested_windows_match_the_stored_window():
+    trades = tied_trades(1)
+    ingest.ingest_trades([trades[4], trades[1], trades[5]])
+    row = ingest.ingest_trades([trades[3], trades[0], trades[2]])[0]
+
+    assert summary(row) == sql_windows()[1]
+
+
+def test_tied_groups_break_ties_by_identifier_across_accounts():
+    store_trades(tied_trades(2) + tied_trades(1)[::-1])
+
+    expected = sql_windows(Account.user_id)
+    assert store_windows([(1, [1, 2])]) == expected
@@ -0,0 +1,83 @@
+import pytest
+from sqlalchemy import insert, update
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import Account, Trade
+from app.services import ingest, trade_store
+from tests.test_ingest import make_trade
+
+
+@pytest.fixture(autouse=True)
+def store(tables, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "TRADE_STORE_ENABLED", True)
+    monkeypatch.setattr(settings, "TRADE_STORE_DIR", str(tmp_path / "store"))
+    ingest._states.clear()
+    with SessionLocal() as db:
+        db.execute(insert(Account), [{"login": 1, "user_id": 1, "challenge_id": 1}])
+        db.commit()
+    yield
+    ingest._states.clear()
+
+
+@pytest.fixture
+def rebuilds(monkeypatch):
+    calls = []
+    rebuild_locked = trade_store._rebuild_locked
+    monkeypatch.setattr(trade_store, "_rebuild_locked", lambda *args: calls.append(1) or rebuild_locked(*args))
+    return calls
+
+
+def snapshot_profits():
+    with SessionLocal() as db:
+        path = trade_store.snapshot(db)
+    return list(trade_store._open_file(path)["profit"])
+
+
+def test_ingested_trades_keep_the_store_current(rebuilds):
+    snapshot_profits()
+    ingest.ingest_trades([make_trade(1, 0, profit=12.345, price_sl=1.0), make_trade(1, 1, profit=-0.29)])
+
+    assert snapshot_profits() == [12.345, -0.29]
+    assert len(rebuilds) == 1
+
+
+def test_trades_changed_behind_the_store_rebuild_it(rebuilds):
+    ingest.ingest_trades([make_trade(1, 0), make_trade(1, 1)])
+    snapshot_profits()
+
+    # Same row count, different content
+    with SessionLocal() as db:
+        db.execute(update(Trade).where(Trade.identifier == "1-1").values(profit=-40.0))
+        db.commit()
+
+    assert snapshot_profits() == [100.0, -40.0]
+    assert len(rebuilds) == 2
+
+
+def test_the_table_is_checked_once_per_run(rebuilds, monkeypatch):
+    scans = []
+    table_marker = trade_store._table_marker
+    monkeypatch.setattr(trade_store, "_table_marker", lambda conn: scans.append(1) or table_marker(conn))
+
+    def run_snapshot(run_key):
+        with SessionLocal() as db:
+            return list(trade_store._open_file(trade_store.snapshot(db, run_key))["profit"])
+
+    ingest.ingest_trades([make_trade(1, 0)])
+    assert run_snapshot("1@a") == [100.0]
+    scans.clear()
+
+    # Ingested trades reach later shards of the run through the store, without another scan
+    ingest.ingest_trades([make_trade(1, 1, profit=-5.0)])
+    assert run_snapshot("1@a") == [100.0, -5.0]
+    assert scans == []
+
+    # Changes behind the store are picked up by the next run
+    with SessionLocal() as db:
+        db.execute(update(Trade).where(Trade.identifier == "1-1").values(profit=-40.0))
+        db.commit()
+    assert run_snapshot("1@a") == [100.0, -5.0]
+    assert run_snapshot("2@b") == [100.0, -40.0]
+    # One check by the new run, one read by the rebuild it triggers
+    assert (len(scans), len(rebuilds)) == (2, 2)
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import trades
+from app.services.trade_queue import TradeQueue
+from tests.test_ingest import make_trade
+
+
+def test_offset_timestamps_are_queued_as_naive_utc():
+    app = FastAPI()
+    app.include_router(trades.router)
+    app.state.trade_queue = TradeQueue(max_size=10)
+
+    body = make_trade(1, 0).model_dump(mode="json")
+    body.update(opened_at="2024-03-01T12:00:00+02:00", closed_at="2024-03-01T10:01:30Z")
+    response = TestClient(app).post("/trades", json=body)
+
+    assert response.status_code == 202
+    trade = app.state.trade_queue.queue.get_nowait()
+    assert trade.opened_at == datetime(2024, 3, 1, 10, 0)
+    assert trade.closed_at == datetime(2024, 3, 1, 10, 1, 30)
@@ -0,0 +1,86 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, select, text
+from sqlalchemy.orm import Session
+
+from app.db import upsert
+from app.db.database import SessionLocal
+from app.db.indexes import create_indexes
+from app.db.upsert import bulk_upsert, upsert_statement
+from app.models import Account, RiskMetric
+
+NOW = datetime(2024, 3, 1, 12)
+
+
+def metric(login, score):
+    return {"account_login": login, "timestamp": NOW, "risk_score": score, "risk_signals": f"score {score}"}
+
+
+def stored(db):
+    return dict(db.execute(select(RiskMetric.account_login, RiskMetric.risk_score)).all())
+
+
+def ids(db):
+    return dict(db.execute(select(RiskMetric.account_login, RiskMetric.id)).all())
+
+
+def check_upsert(db):
+    db.execute(insert(Account), [{"login": login} for login in range(1, 6)])
+    bulk_upsert(db, RiskMetric, "account_login", [metric(1, 10.0), metric(2, 20.0)])
+    db.commit()
+    before = ids(db)
+
+    # Batches of two, so the overwrite of 1 lands in a later statement than its first write
+    bulk_upsert(db, RiskMetric, "account_login", [metric(3, 30.0), metric(2, 25.0), metric(4, 40.0), metric(1, 15.0)], batch_size=2)
+    db.commit()
+
+    assert stored(db) == {1: 15.0, 2: 25.0, 3: 30.0, 4: 40.0}
+    # Overwritten rows keep their primary key
+    assert {login: ids(db)[login] for login in before} == before
+
+
+@pytest.fixture
+def db(tables):
+    with SessionLocal() as session:
+        yield session
+
+
+def test_upsert_on_conflict(db):
+    check_upsert(db)
+
+
+def test_upsert_without_on_conflict(db, monkeypatch):
+    # Dialects without ON CONFLICT take the lookup, UPDATE and INSERT path
+    monkeypatch.setattr(upsert, "UPSERT_DIALECTS", {})
+    check_upsert(db)
+
+
+def test_empty_upsert_does_nothing(db):
+    bulk_upsert(db, RiskMetric, "account_login", [])
+    assert stored(db) == {}
+
+
+def test_statement_overwrites_every_column_but_the_keys():
+    sql = str(upsert_statement(RiskMetric, "account_login", "sqlite").compile())
+    overwritten = {assignment.split(" = ")[0] for assignment in sql.split("DO UPDATE SET ")[1].split(", ")}
+
+    assert overwritten == {column.name for column in RiskMetric.__table__.columns} - {"id", "account_login"}
+    assert upsert_statement(RiskMetric, "account_login", "mssql") is None
+
+
+@pytest.mark.postgres
+def test_upsert_on_postgres(postgres_engine):
+    with Session(postgres_engine) as session:
+        check_upsert(session)
+
+
+@pytest.mark.postgres
+def test_indexes_apply_on_postgres(postgres_engine):
+    try:
+        with postgres_engine.begin() as conn:
+            create_indexes(conn)
+            create_indexes(conn)  # Idempotent
+    finally:
+        with postgres_engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS schema_meta"))
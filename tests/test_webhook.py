@@ -0,0 +1,176 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import asyncio
+import pytest
+from sqlalchemy import select, update
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import WebhookOutbox
+from app.services import webhook
+from app.services.telemetry import WEBHOOK_DELIVERIES
+
+
+class StubReceiver:
+    """Local webhook endpoint answering every POST with `status` and recording the bodies"""
+
+    def __init__(self):
+        self.status = 200
+        self.bodies = []
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                receiver.bodies.append(json.loads(self.rfile.read(length)))
+                self.send_response(receiver.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hook"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def wait_for(self, count, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.bodies) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return len(self.bodies) >= count
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    stub = StubReceiver()
+    monkeypatch.setattr(settings, "WEBHOOK_URL", stub.url)
+    monkeypatch.setattr(settings, "WEBHOOK_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "WEBHOOK_MAX_RETRIES", 2)
+    monkeypatch.setattr(settings, "WEBHOOK_BACKOFF_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "WEBHOOK_OUTBOX_RETRY_SECONDS", 3600)
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+@pytest.fixture
+def dispatcher(monkeypatch, tables, receiver):
+    instance = webhook.WebhookDispatcher()
+    monkeypatch.setattr(webhook, "dispatcher", instance)
+    instance.start()
+    yield instance
+    instance.stop(timeout=1)
+
+
+def _stage(*logins):
+    with SessionLocal() as db:
+        staged = webhook.stage_webhooks(db, [(login, 90.0, ["HFT"], datetime(2024, 3, 1, 10)) for login in logins])
+        db.commit()
+    return staged
+
+
+def _outbox():
+    with SessionLocal() as db:
+        return db.execute(select(WebhookOutbox).order_by(WebhookOutbox.id)).scalars().all()
+
+
+def _count(outcome):
+    return WEBHOOK_DELIVERIES.labels(outcome=outcome)._value.get()
+
+
+def test_stage_writes_claimed_rows_in_the_callers_transaction(tables, receiver):
+    with SessionLocal() as db:
+        staged = webhook.stage_webhooks(db, [(1, 90.0, ["HFT"], datetime(2024, 3, 1, 10))])
+        db.rollback()
+    assert staged and _outbox() == []
+
+    staged = _stage(1, 2)
+    rows = _outbox()
+    assert [row_id for row_id, _ in staged] == [row.id for row in rows]
+    assert all(row.claimed_by == webhook.HOLDER and row.claimed_until > datetime.now() for row in rows)
+    assert staged[0][1]["trading_account_login"] == 1
+
+
+def test_stage_skips_without_webhook_url(tables, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_URL", None)
+    assert _stage(1) == []
+    assert _outbox() == []
+
+
+def test_delivered_rows_are_deleted(dispatcher, receiver):
+    webhook.send_webhooks(_stage(1, 2, 3))
+    assert receiver.wait_for(3)
+    dispatcher.stop(timeout=5)
+
+    assert sorted(body["trading_account_login"] for body in receiver.bodies) == [1, 2, 3]
+    assert _outbox() == []
+
+
+def test_failed_delivery_stays_in_outbox_and_counts_only_retries(dispatcher, receiver):
+    receiver.status = 500
+    retried, outbox = _count("retried"), _count("outbox")
+
+    webhook.send_webhooks(_stage(1))
+    assert receiver.wait_for(3)
+    dispatcher.stop(timeout=5)
+
+    # Three attempts: two retries, then the final failure leaves the row in the outbox
+    assert len(receiver.bodies) == 3
+    assert _count("retried") - retried == 2
+    assert _count("outbox") - outbox == 1
+    [row] = _outbox()
+    assert row.attempts == 1 and row.claimed_by is None and "500" in row.last_error
+
+
+def test_shutdown_releases_notifications_in_backoff(dispatcher, receiver, monkeypatch):
+    receiver.status = 503
+    monkeypatch.setattr(settings, "WEBHOOK_BACKOFF_SECONDS", 60)
+
+    webhook.send_webhooks(_stage(1, 2))
+    assert receiver.wait_for(2)
+    dispatcher.stop(timeout=0.1)
+
+    rows = _outbox()
+    assert [json.loads(row.payload)["trading_account_login"] for row in rows] == [1, 2]
+    assert all(row.claimed_by is None and row.claimed_until is None for row in rows)
+
+
+def test_replicas_never_claim_the_same_rows(tables, receiver, monkeypatch):
+    ids = [row_id for row_id, _ in _stage(1, 2, 3)]
+    webhook._release_outbox()
+
+    assert [row_id for row_id, _ in webhook._claim_outbox(2)] == ids[:2]
+    assert [row_id for row_id, _ in webhook._claim_outbox(10)] == ids[2:]
+
+    monkeypatch.setattr(webhook, "HOLDER", "other-replica:1")
+    assert webhook._claim_outbox(10) == []
+
+    # Claims of a replica that died expire
+    with SessionLocal() as db:
+        db.execute(update(WebhookOutbox).values(claimed_until=datetime.now() - timedelta(seconds=1)))
+        db.commit()
+    assert [row_id for row_id, _ in webhook._claim_outbox(10)] == ids
+
+
+def test_rows_over_max_attempts_are_not_replayed(tables, receiver, monkeypatch):
+    monkeypatch.setattr(settings, "WEBHOOK_OUTBOX_MAX_ATTEMPTS", 2)
+    [(row_id, _)] = _stage(1)
+    webhook._mark_outbox([], [row_id], "HTTPStatusError")
+    assert len(webhook._claim_outbox(10)) == 1
+    webhook._mark_outbox([], [row_id], "HTTPStatusError")
+    assert webhook._claim_outbox(10) == []
+
+
+def test_replay_delivers_released_rows(dispatcher, receiver):
+    _stage(1, 2)
+    webhook._release_outbox()
+
+    delivered = asyncio.run_coroutine_threadsafe(dispatcher.replay_once(), dispatcher._loop).result()
+    assert delivered == (2, 0)
+    assert sorted(body["trading_account_login"] for body in receiver.bodies) == [1, 2]
+    assert _outbox() == []